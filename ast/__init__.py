@@ -1,5 +1,6 @@
 from ast.base import *
 from ast.blocks import *
+from ast.common import *
 from ast.flowcontrol import *
 from ast.functions import *
 from ast.lists import *
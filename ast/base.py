@@ -14,37 +14,149 @@ def union(sets: typing.Iterable[frozenset]) -> set:
 
 EvaluationScope = typing.Dict[str, 'Expression']
 TypeScope = typing.Dict[str, typesystem.Type]
+# Values are kept in frames, lists indexed by the slots resolve() assigns.
+Frame = typing.List['Expression']
+# Where resolve() put each name that's in scope.
+SlotScope = typing.Dict[str, int]
+CompiledExpression = typing.Callable[[Frame], 'Expression']
 
 
 class ParseException(Exception):
     pass
 
 
+class Layout:
+    """Counts the slots in a frame while it's being resolved."""
+    __slots__ = ('size',)
+
+    def __init__(self, size: int = 0):
+        self.size = size
+
+    def allocate(self, count: int = 1) -> int:
+        self.size += count
+        return self.size - count
+
+
+class Root:
+    """What's needed to evaluate the root of a tree: its frame's layout and how parse() said to evaluate it."""
+    __slots__ = ('names', 'size', 'evaluator')
+
+    def __init__(self, names: typing.List[str], size: int):
+        self.names = names
+        self.size = size
+        self.evaluator = None  # type: typing.Optional[typing.Callable[[EvaluationScope], 'Expression']]
+
+
+# Most nodes have no names, they can all share one empty set.
+_NO_NAMES = frozenset()
+
+
 class Node:
+    # Nodes don't have a __dict__, we keep a lot of them.
+    __slots__ = ('names', '_children')
+
     def __init__(self, names: typing.Iterable[str], children: typing.Sequence['Node']):
-        self.names = frozenset(names)
+        names = frozenset(names)
+        # Share the set with a child if they're the same, which they often are.
+        for child in children:
+            if child.names == names:
+                names = child.names
+                break
+        self.names = names or _NO_NAMES
         assert isinstance(children, list)
-        self._children = children
+        self._children = tuple(children)
 
     def initialize_type(self, scope: TypeScope) -> None:
         for child in self._children:
             child.initialize_type(scope)
 
+    def quicken(self) -> None:
+        """Swap typed nodes in this tree for subclasses specialized to their types."""
+        for child in self._children:
+            child.quicken()
+
+    def resolve(self, scope: SlotScope, layout: Layout) -> None:
+        """Give the names used in this tree slots in the frames they'll be evaluated in."""
+        for child in self._children:
+            child.resolve(scope, layout)
+
     def source(self, indent) -> str:
         raise Exception('source() not implemented in %s' % self.__class__.__name__)
 
+    def walk(self) -> typing.Iterator['Node']:
+        """Yield every node in this tree, visiting nodes that appear more than once only once."""
+        seen = set()
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            yield node
+            stack.extend(reversed(node._children))
+
 
 class Expression(Node):
+    __slots__ = ('type', '_root')
+    # Whether source() needs parentheses around this expression when it's an operand.
+    compound = True
+
     def __init__(self, names: typing.Iterable[str], children: typing.Sequence[Node]):
         super().__init__(names, children)
         self.type = None
+        self._root = None  # type: Root
 
     def initialize_type(self, scope: TypeScope):
         if self.type is None:
             super().initialize_type(scope)
 
+    def resolve_root(self):
+        """Resolve this expression as the root of a tree. Its free names come first in its frame."""
+        names = sorted(self.names)
+        layout = Layout(len(names))
+        self.resolve({name: slot for slot, name in enumerate(names)}, layout)
+        self._root = Root(names, layout.size)
+
+    def use_evaluator(self, evaluator: typing.Callable[[EvaluationScope], 'Expression']):
+        """Make evaluate() call evaluator rather than interpret()."""
+        self._root.evaluator = evaluator
+
+    def frame(self, scope: EvaluationScope) -> Frame:
+        """Make the frame to evaluate this root expression in from the values of its free names."""
+        root = self._root
+        frame = [scope[name] for name in root.names]
+        frame.extend([None] * (root.size - len(frame)))
+        return frame
+
     def evaluate(self, scope: EvaluationScope) -> 'Expression':
-        raise Exception('evaluate() not implemented in %s' % self.__class__.__name__)
+        evaluator = self._root.evaluator
+        if evaluator is not None:
+            return evaluator(scope)
+        return self.interpret(scope)
+
+    def interpret(self, scope: EvaluationScope) -> 'Expression':
+        """Evaluate by walking the tree."""
+        return self.run(self.frame(scope))
+
+    def compile(self) -> typing.Callable[[EvaluationScope], 'Expression']:
+        """Turn this typed expression into a closure equivalent to evaluate()."""
+        run = self.compile_run()
+        return lambda scope: run(self.frame(scope))
+
+    def run(self, frame: Frame) -> 'Expression':
+        raise Exception('run() not implemented in %s' % self.__class__.__name__)
+
+    def run_tail(self, frame: Frame):
+        """Run in tail position: calls are returned as a TailCall for the caller to make."""
+        return self.run(frame)
+
+    def compile_run(self) -> CompiledExpression:
+        """Turn this resolved expression into a closure equivalent to run()."""
+        return self.run
+
+    def compile_run_tail(self) -> CompiledExpression:
+        """Compile for tail position, like run_tail()."""
+        return self.compile_run()
 
     def print(self, indent='', parents=None):
         parents = parents or []
@@ -1,24 +1,35 @@
+import operator
 import typing
 
 import typesystem
-from ast.base import Expression, union, ParseException
-from ast.functions import FunctionPiece
+from ast.base import Expression, union, ParseException, Frame
+from ast.functions import FunctionPiece, Function, BoundFunction
 
 __all__ = ['Reference', 'Let', 'Block']
 
 
 class Reference(Expression):
+    __slots__ = ('name', 'slot')
+    compound = False
+
     def __init__(self, name):
         super().__init__([name], [])
         self.name = name
+        self.slot = None
 
     def source(self, indent):
         return self.name
 
-    def evaluate(self, scope):
-        value = scope[self.name]
+    def resolve(self, scope, layout):
+        self.slot = scope[self.name]
+
+    def run(self, frame):
+        value = frame[self.slot]
         return value
 
+    def compile_run(self):
+        return operator.itemgetter(self.slot)
+
     def initialize_type(self, scope):
         super().initialize_type(scope)
         self.type = scope[self.name]
@@ -28,13 +39,18 @@ class Reference(Expression):
 
 
 class Let(Expression):
+    __slots__ = ('name', 'specified_type', 'slot', '_recursive')
+
     def __init__(self, name: str, specified_type: typesystem.Type, expression: Expression):
         super().__init__(expression.names - {name}, [expression])
         if name in expression.names and specified_type is None:
             raise ParseException('Recursive function %s must have type specified.' % name)
         self.name = name
         self.specified_type = specified_type
-        self._fix_up(expression)
+        self.slot = None
+        # For functions defined by this let that capture it, where it goes in their closures.
+        self._recursive = None  # type: typing.Dict[Function, typing.List[int]]
+        self._check_recursion(expression)
 
     def source(self, indent):
         type_specification = ''
@@ -49,34 +65,60 @@ class Let(Expression):
     def __repr__(self):
         return 'Let<%s>' % (self.name,)
 
-    def _fix_up(self, expression: Expression):
-        """Fix up references to this let in sub-expressions to point here."""
-        # Remove this let's name from the expression's name list
-        expression.names -= {self.name}
-
-        for i, sub in enumerate(expression._children):
-            if self.name not in sub.names:
-                # This sub expression doesn't reference this. Cool.
+    def _check_recursion(self, node: Expression):
+        """A let can only refer to itself from inside a function, anything else would need its value to compute it."""
+        if self.name not in node.names or isinstance(node, FunctionPiece):
+            return
+        if isinstance(node, Reference):
+            raise ParseException('%s refers to itself outside a function' % self.name)
+        if isinstance(node, Let) and node.name == self.name:
+            # This sub let hides this let
+            return
+        children = node._children
+        if isinstance(node, Block) and self.name in {let.name for let in node._lets}:
+            children = node._lets
+        for child in children:
+            self._check_recursion(child)
+
+    def resolve(self, scope, layout):
+        self.slot = layout.allocate()
+        inner_scope = dict(scope)
+        inner_scope[self.name] = self.slot
+        self.expression.resolve(inner_scope, layout)
+        recursive = {}
+        for function in _functions(self.expression):
+            captures = [i for i, slot in enumerate(function.captures) if slot == self.slot]
+            if captures:
+                recursive[function] = captures
+        self._recursive = recursive or None
+
+    def run(self, frame):
+        return self.expression.run(frame)
+
+    def compile_run(self):
+        return self.expression.compile_run()
+
+    def bind(self, frame: Frame, value: Expression):
+        """Put the value of this let in its slot."""
+        frame[self.slot] = value
+        if self._recursive:
+            self._patch(value)
+
+    def _patch(self, value: Expression):
+        # Functions made while evaluating this let captured it before it had a value. Point them at it so it can
+        # call itself, including functions that are only reachable through other functions' closures.
+        pending = [value]
+        seen = set()
+        while pending:
+            bound_function = pending.pop()
+            if not isinstance(bound_function, BoundFunction) or id(bound_function) in seen:
                 continue
-
-            if isinstance(sub, Reference):
-                if sub.name == self.name:
-                    # This is a reference to this let. Replace it.
-                    expression._children[i] = self.expression
-                    continue
-            elif isinstance(sub, Let):
-                if sub.name == self.name:
-                    # This sub let hides this let - don't recurse
-                    continue
-            elif isinstance(sub, FunctionPiece):
-                if {arg.name for arg in sub.arguments}:
-                    # A function argument hides this let - don't recurse
-                    continue
-            # Recurse into the sub-expression
-            self._fix_up(sub)
-
-    def evaluate(self, scope):
-        return self.expression.evaluate(scope)
+            seen.add(id(bound_function))
+            closure = bound_function.closure
+            for i in self._recursive.get(bound_function.function, ()):
+                if closure[i] is None:
+                    closure[i] = value
+            pending.extend(closure)
 
     def initialize_type(self, scope):
         inner_scope = dict(scope)
@@ -87,15 +129,19 @@ class Let(Expression):
 
 
 class Block(Expression):
+    __slots__ = ()
+    compound = False
+
     def __init__(self, lets: typing.List[Let], expression: Expression):
         names = union(l.names for l in lets) | (expression.names - {l.name for l in lets})
         # noinspection PyTypeChecker
         super().__init__(names, lets + [expression])
 
-        let_names = [let.name for let in lets]
-        for name in let_names:
-            if let_names.count(name) > 1:
-                raise ParseException('Repeated let name %r: ' % name)
+        let_names = set()
+        for let in lets:
+            if let.name in let_names:
+                raise ParseException('Repeated let name %r: ' % let.name)
+            let_names.add(let.name)
 
     @property
     def _lets(self) -> typing.List[Let]:
@@ -111,10 +157,41 @@ class Block(Expression):
                 indent + '  return ' + self._expression.source(indent + '    ') + ';\n' +
                 indent + '}')
 
-    def evaluate(self, scope):
+    def resolve(self, scope, layout):
+        for let in self._lets:
+            let.resolve(scope, layout)
         inner_scope = dict(scope)
-        inner_scope.update({let.name: let.evaluate(scope) for let in self._lets})
-        return self._expression.evaluate(inner_scope)
+        inner_scope.update({let.name: let.slot for let in self._lets})
+        self._expression.resolve(inner_scope, layout)
+
+    def run(self, frame):
+        self._bind(frame)
+        return self._expression.run(frame)
+
+    def run_tail(self, frame):
+        self._bind(frame)
+        return self._expression.run_tail(frame)
+
+    def _bind(self, frame):
+        # Lets can't see each other so they all go straight into their slots.
+        for let in self._lets:
+            let.bind(frame, let.run(frame))
+
+    def compile_run(self):
+        return self._compile(self._expression.compile_run())
+
+    def compile_run_tail(self):
+        return self._compile(self._expression.compile_run_tail())
+
+    def _compile(self, expression):
+        lets = [(let.bind, let.compile_run()) for let in self._lets]
+
+        def run(frame):
+            for bind, let in lets:
+                bind(frame, let(frame))
+            return expression(frame)
+
+        return run
 
     def initialize_type(self, scope):
         for let in self._lets:
@@ -128,3 +205,12 @@ class Block(Expression):
 
     def __repr__(self):
         return 'Block<%r>' % self._lets
+
+
+def _functions(node):
+    """Functions node evaluates to or creates in its own frame."""
+    if isinstance(node, Function):
+        yield node
+        return
+    for child in node._children:
+        yield from _functions(child)
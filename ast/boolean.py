@@ -2,13 +2,20 @@ from ast.literals import Value
 from singleton import Singleton
 from typesystem import Type, Operator, TypeException
 
-__all__ = ['BooleanValue', 'Boolean']
+__all__ = ['BooleanValue', 'Boolean', 'TRUE', 'FALSE']
 
 
 class BooleanValue(Value):
+    __slots__ = ()
+
     def __init__(self, value: bool):
         assert isinstance(value, bool)
-        super().__init__(value, Boolean())
+        self.value = value
+
+    @staticmethod
+    def of(value: bool) -> 'BooleanValue':
+        """TRUE or FALSE, without making a new value."""
+        return TRUE if value else FALSE
 
     def source(self, indent):
         if self.value:
@@ -25,6 +32,8 @@ class BooleanValue(Value):
     def __eq__(self, other):
         return isinstance(other, BooleanValue) and (self.value == other.value)
 
+    __hash__ = Value.__hash__
+
 
 class Boolean(Type, metaclass=Singleton):
     def supports_operator(self, operator: Operator):
@@ -32,11 +41,16 @@ class Boolean(Type, metaclass=Singleton):
 
     def binary_operator(self, operator: Operator, a: BooleanValue, b: BooleanValue):
         if operator == Operator.logical_and:
-            return BooleanValue(a.value and b.value)
+            return BooleanValue.of(a.value and b.value)
         if operator == Operator.logical_or:
-            return BooleanValue(a.value or b.value)
+            return BooleanValue.of(a.value or b.value)
 
         raise TypeException('Operator %r not implemented for booleans' % operator)
 
     def __str__(self):
         return 'Boolean'
+
+
+BooleanValue.type = Boolean()
+TRUE = BooleanValue(True)
+FALSE = BooleanValue(False)
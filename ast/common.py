@@ -0,0 +1,53 @@
+from ast.base import Expression
+
+__all__ = ['Common']
+
+
+class Common(Expression):
+    """An expression that appears more than once in a frame, evaluated the first time and then read from its slot.
+
+    Every place it appears is the same Common node. Made by sharing.common_subexpressions().
+    """
+    __slots__ = ('slot',)
+
+    def __init__(self, expression: Expression):
+        super().__init__(expression.names, [expression])
+        self.type = expression.type
+        self.slot = None
+
+    @property
+    def expression(self) -> Expression:
+        return self._children[0]
+
+    @property
+    def compound(self):
+        return self.expression.compound
+
+    def source(self, indent):
+        return self.expression.source(indent)
+
+    def resolve(self, scope, layout):
+        # Resolved once for each place it appears, the last slot is the one they all use.
+        self.slot = layout.allocate()
+        self.expression.resolve(scope, layout)
+
+    def run(self, frame):
+        value = frame[self.slot]
+        if value is None:
+            value = frame[self.slot] = self.expression.run(frame)
+        return value
+
+    def compile_run(self):
+        slot = self.slot
+        expression = self.expression.compile_run()
+
+        def run(frame):
+            value = frame[slot]
+            if value is None:
+                value = frame[slot] = expression(frame)
+            return value
+
+        return run
+
+    def __repr__(self):
+        return 'Common<%r>' % self.expression
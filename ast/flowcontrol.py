@@ -5,9 +5,15 @@ __all__ = ['IfElse']
 
 
 class IfElse(Expression):
+    __slots__ = ()
+
     def __init__(self, condition: Expression, true: Expression, false: Expression):
         super().__init__(condition.names | true.names | false.names, [condition, true, false])
 
+    def source(self, indent):
+        return 'if (' + self._condition.source(indent + '  ') + ') ' + self._true.source(indent + '  ') + \
+               ' else ' + self._false.source(indent + '  ')
+
     @property
     def _condition(self):
         return self._children[0]
@@ -25,14 +31,31 @@ class IfElse(Expression):
         assert self._condition.type == ast.boolean.Boolean()
         # TODO: actually we want a type union here
         assert self._true.type == self._false.type
-        return self._true.type
+        self.type = self._true.type
+        return self.type
 
-    def evaluate(self, scope):
-        condition = self._condition.evaluate(scope)
+    def run(self, frame):
+        condition = self._condition.run(frame)
         if condition:
-            return self._true.evaluate(scope)
+            return self._true.run(frame)
+        else:
+            return self._false.run(frame)
+
+    def run_tail(self, frame):
+        if self._condition.run(frame):
+            return self._true.run_tail(frame)
         else:
-            return self._false.evaluate(scope)
+            return self._false.run_tail(frame)
+
+    def compile_run(self):
+        return self._compile(self._true.compile_run(), self._false.compile_run())
+
+    def compile_run_tail(self):
+        return self._compile(self._true.compile_run_tail(), self._false.compile_run_tail())
+
+    def _compile(self, true, false):
+        condition = self._condition.compile_run()
+        return lambda frame: true(frame) if condition(frame).value else false(frame)
 
     def __repr__(self):
         return 'IfElse<>'
@@ -1,24 +1,41 @@
 import typing
 
 import typesystem
-from ast.base import Expression, union, TypeScope, Node, EvaluationScope
+from ast.base import Expression, union, TypeScope, Node, Frame, CompiledExpression, Layout
+from ast.literals import Value
 
 __all__ = ['FunctionArgument', 'BasicFunctionArgument', 'ComparisonPatternMatch', 'FunctionPiece', 'Function',
-           'FunctionCall', 'BoundFunction']
+           'FunctionCall', 'BoundFunction', 'CompiledFunction', 'TailCall', 'Dispatch']
+
+
+def element_source(expression: Expression, indent: str) -> str:
+    """Source for an item in a comma separated list. A comma after a function would start another piece."""
+    if isinstance(expression, Function):
+        return '(' + expression.source(indent) + ')'
+    return expression.source(indent)
 
 
 class FunctionArgument(Node):
+    __slots__ = ('name', 'type', 'slot')
+
     def __init__(self, name: str, names: typing.Sequence[str], children: typing.Sequence[Node]):
         super().__init__(names, children)
         self.name = name
         self.type = None
+        self.slot = None  # set by the Function
 
-    def matches(self, argument: Expression, scope: EvaluationScope) -> bool:
+    def matches(self, argument: Expression, frame: Frame) -> bool:
         # TODO: is the argument a Value not an expression?
         raise Exception('matches() not implemented by %s' % self.__class__.__name__)
 
+    def compile_pattern(self) -> typing.Optional[CompiledExpression]:
+        """Compile the value this argument must equal, or None if it matches anything."""
+        return None
+
 
 class BasicFunctionArgument(FunctionArgument):
+    __slots__ = ()
+
     def __init__(self, name: str, specified_type: typesystem.Type):
         super().__init__(name, [], [])
         self.type = specified_type
@@ -34,7 +51,7 @@ class BasicFunctionArgument(FunctionArgument):
         # TODO: handle arguments whose types aren't specified up front.
         pass
 
-    def matches(self, argument: Expression, scope: EvaluationScope):
+    def matches(self, argument: Expression, frame: Frame):
         # TODO: check type? do we do that?
         return True
 
@@ -43,10 +60,12 @@ class BasicFunctionArgument(FunctionArgument):
 
 
 class PatternMatch(FunctionArgument):
-    pass
+    __slots__ = ()
 
 
 class ComparisonPatternMatch(PatternMatch):
+    __slots__ = ('operator',)
+
     def __init__(self, name: str, operator: str, expression: Expression):
         super().__init__(name, expression.names, [expression])
         self.operator = operator
@@ -62,13 +81,32 @@ class ComparisonPatternMatch(PatternMatch):
         super().initialize_type(scope)
         self.type = self.expression.type
 
-    def matches(self, argument: Expression, scope: EvaluationScope):
-        value = self.expression.evaluate(scope)
+    def matches(self, argument: Expression, frame: Frame):
+        value = self.expression.run(frame)
         assert self.operator == '=='
         return argument == value
 
+    def compile_pattern(self):
+        assert self.operator == '=='
+        return self.expression.compile_run()
+
+    def constant(self) -> typing.Optional[Value]:
+        """The value this argument must equal if it's known before the function is called."""
+        if self.expression.names or any(isinstance(node, FunctionCall) for node in self.expression.walk()):
+            return None
+        try:
+            # Without names there's nothing in the frame to look at. Expressions with lets fail here.
+            value = self.expression.run([])
+            hash(value)
+        except Exception:
+            # Leave it to fail (or not) when the function is called.
+            return None
+        return value
+
 
 class FunctionPiece(Expression):
+    __slots__ = ()
+
     def __init__(self, arguments: typing.List[FunctionArgument], expression: Expression):
         names = (expression.names | union(arg.names for arg in arguments)) - {arg.name for arg in arguments}
         children = arguments  # type: typing.List[Expression]
@@ -97,21 +135,42 @@ class FunctionPiece(Expression):
         self.expression.initialize_type(inner_scope)
         self.type = typesystem.Function([arg.type for arg in self.arguments], self.expression.type)
 
-    def matches(self, arguments, scope) -> bool:
-        return all(x.matches(y, scope) for x, y in zip(self.arguments, arguments))
-
-    def call(self, arguments, scope):
+    def resolve(self, scope, layout):
+        # Patterns only see the function's closure, the body sees the arguments too.
+        for arg in self.arguments:
+            arg.resolve(scope, layout)
         inner_scope = dict(scope)
-        inner_scope.update(dict(zip((arg.name for arg in self.arguments), arguments)))
-        return self.expression.evaluate(inner_scope)
+        inner_scope.update({arg.name: arg.slot for arg in self.arguments})
+        self.expression.resolve(inner_scope, layout)
+
+    def matches(self, arguments, frame) -> bool:
+        return all(x.matches(y, frame) for x, y in zip(self.arguments, arguments))
+
+    def call(self, frame):
+        return self.expression.run_tail(frame)
+
+    def compile_piece(self):
+        patterns = [(i, pattern) for i, pattern in enumerate(arg.compile_pattern() for arg in self.arguments)
+                    if pattern is not None]
+        return patterns, self.expression.compile_run_tail()
 
     def __repr__(self):
         return 'Function<(%s)>' % (', '.join('%r' % arg for arg in self.arguments))
 
 
 class Function(Expression):
+    __slots__ = ('_compiled_pieces', 'dispatch', 'captures', 'padding', 'cache')
+
     def __init__(self, pieces: typing.List[FunctionPiece]):
         super().__init__(union(piece.names for piece in pieces), pieces)
+        self._compiled_pieces = None
+        self.dispatch = None  # type: Dispatch
+        # Set by resolve(): the slots this function's closure is copied from, in the frame it's created in, and
+        # the padding that makes its closure and arguments up to a frame.
+        self.captures = None  # type: typing.List[int]
+        self.padding = None  # type: typing.List[None]
+        # A memoization.FunctionCache for calls to this function, if they're memoized.
+        self.cache = None
 
     def source(self, indent):
         return (',\n' + indent).join(piece.source(indent) for piece in self.pieces)
@@ -120,15 +179,38 @@ class Function(Expression):
     def pieces(self) -> typing.List[FunctionPiece]:
         return self._children
 
-    def evaluate(self, scope):
-        return BoundFunction(self, scope)
-
-    def call(self, arguments, scope):
+    def resolve(self, scope, layout):
+        # A flat closure: the function's frame starts with the values of its free names, then its arguments.
+        free_names = sorted(union(piece.names for piece in self.pieces))
+        self.captures = [scope[name] for name in free_names]
+        function_layout = Layout(len(free_names))
+        arity = len(self.pieces[0].arguments)
+        first_argument = function_layout.allocate(arity)
+        function_scope = {name: slot for slot, name in enumerate(free_names)}
         for piece in self.pieces:
-            if piece.matches(arguments, scope):
-                return piece.call(arguments, scope)
-        raise Exception(
-            'No matching function implementation for arguments=%r scope=%r in %r' % (arguments, scope, self.pieces))
+            for slot, arg in enumerate(piece.arguments, first_argument):
+                arg.slot = slot
+            piece.resolve(function_scope, function_layout)
+        self.padding = [None] * (function_layout.size - first_argument - arity)
+
+    def run(self, frame):
+        return BoundFunction(self, [frame[slot] for slot in self.captures])
+
+    def call(self, frame, arguments):
+        index = self.dispatch.select(arguments, lambda i: self.pieces[i].matches(arguments, frame))
+        if index is None:
+            raise Exception('No matching function implementation for arguments=%r in %r' % (arguments, self.pieces))
+        return self.pieces[index].call(frame)
+
+    def compile_run(self):
+        captures = self.captures
+        return lambda frame: CompiledFunction(self, [frame[slot] for slot in captures])
+
+    def compiled_pieces(self):
+        # Compiled on first call and shared by every BoundFunction of this function.
+        if self._compiled_pieces is None:
+            self._compiled_pieces = [piece.compile_piece() for piece in self.pieces]
+        return self._compiled_pieces
 
     def initialize_type(self, scope):
         super().initialize_type(scope)
@@ -136,24 +218,123 @@ class Function(Expression):
         if len(self.pieces) > 1:
             assert(all(p.type == self.pieces[0].type for p in self.pieces[1:]))
         self.type = self.pieces[0].type
+        self.dispatch = Dispatch(self.pieces)
+
+
+class Dispatch:
+    """Picks the piece of a function to call.
+
+    Pieces whose patterns are all constants, like (n == 1), are found with a hash lookup on the
+    arguments. Only the other pieces with patterns have to be checked one by one.
+    """
+    __slots__ = ('guarded', '_tables')
+
+    def __init__(self, pieces: typing.List[FunctionPiece]):
+        # For each set of pattern positions, the first piece for each tuple of argument values.
+        tables = {}  # type: typing.Dict[typing.Tuple[int, ...], typing.Dict[tuple, int]]
+        self.guarded = []  # type: typing.List[int]
+        for index, piece in enumerate(pieces):
+            patterns = [(i, arg.constant()) for i, arg in enumerate(piece.arguments) if isinstance(arg, PatternMatch)]
+            if any(value is None for i, value in patterns):
+                self.guarded.append(index)
+                continue
+            table = tables.setdefault(tuple(i for i, value in patterns), {})
+            table.setdefault(tuple(value for i, value in patterns), index)
+        self._tables = list(tables.items())
+
+    def lookup(self, arguments: typing.List[Expression]) -> typing.Optional[int]:
+        """The first piece with constant patterns that matches arguments."""
+        best = None
+        for positions, table in self._tables:
+            try:
+                index = table.get(tuple(arguments[i] for i in positions))
+            except (TypeError, IndexError):
+                # Unhashable arguments can't equal any constant, missing ones can't match.
+                continue
+            if index is not None and (best is None or index < best):
+                best = index
+        return best
+
+    def select(self, arguments: typing.List[Expression], matches: typing.Callable[[int], bool]) -> typing.Optional[int]:
+        """The first piece that matches arguments. matches(index) checks the guards of a piece."""
+        best = self.lookup(arguments)
+        for index in self.guarded:
+            if best is not None and index > best:
+                break
+            if matches(index):
+                return index
+        return best
 
 
 class BoundFunction(Expression):
-    def __init__(self, function: Function, scope: EvaluationScope):
+    __slots__ = ('closure',)
+
+    def __init__(self, function: Function, closure: typing.List[Expression]):
         super().__init__((), [function])
-        self.closure = {name: scope[name] for name in function.names}
+        # The values of the function's free names, in the order of function.captures.
+        self.closure = closure
 
     @property
     def function(self) -> Function:
         return self._children[0]
 
-    def call(self, arguments, scope):
-        inner_scope = dict(self.closure)
-        inner_scope.update(scope)
-        return self.function.call(arguments, inner_scope)
+    def call(self, arguments):
+        cache = self.function.cache
+        if cache is not None:
+            key = self.cache_key(arguments)
+            if key is not None:
+                result = cache.get(key)
+                if result is None:
+                    result = self._call(arguments)
+                    cache.put(key, result)
+                return result
+        return self._call(arguments)
+
+    def _call(self, arguments):
+        result = self.call_once(arguments)
+        # Calls in tail position come back as TailCalls, make them here so the stack doesn't grow.
+        while isinstance(result, TailCall):
+            result = result.function.call_once(result.arguments)
+        return result
+
+    def frame(self, arguments: typing.List[Expression]) -> Frame:
+        return self.closure + arguments + self.function.padding
+
+    def call_once(self, arguments):
+        """Call this function, returning a TailCall if the result is a call in tail position."""
+        return self.function.call(self.frame(arguments), arguments)
+
+    def cache_key(self, arguments: typing.List[Expression]) -> typing.Optional[tuple]:
+        """The key for memoizing a call, or None if the arguments or closure can't be hashed."""
+        # Steph is pure so the result only depends on the function, what it captured and the arguments.
+        # A recursive function captures itself, which would make every BoundFunction's key different.
+        closure = tuple(None if value is self else value for value in self.closure)
+        key = (self.function, closure, tuple(arguments))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+
+class CompiledFunction(BoundFunction):
+    __slots__ = ()
+
+    def call_once(self, arguments):
+        frame = self.frame(arguments)
+        pieces = self.function.compiled_pieces()
+        index = self.function.dispatch.select(
+            arguments, lambda i: all(arguments[j] == pattern(frame) for j, pattern in pieces[i][0]))
+        if index is None:
+            raise Exception('No matching function implementation for arguments=%r in %r' %
+                            (arguments, self.function.pieces))
+        return pieces[index][1](frame)
 
 
 class FunctionCall(Expression):
+    __slots__ = ()
+    compound = False
+
     def __init__(self, expression: Expression, arguments: typing.List[Expression]):
         super().__init__(union(arg.names for arg in arguments) | expression.names, [expression] + arguments)
 
@@ -163,19 +344,36 @@ class FunctionCall(Expression):
 
     @property
     def _arguments(self) -> typing.List[Expression]:
-        return self._children[1:]
+        return list(self._children[1:])
 
     def source(self, indent):
-        return self._function_expression.source(indent) + '(' + \
-               ', '.join(arg.source(indent + '  ') for arg in self._arguments) + ')'
+        function_source = self._function_expression.source(indent)
+        if self._function_expression.compound:
+            function_source = '(' + function_source + ')'
+        return function_source + '(' + ', '.join(element_source(arg, indent + '  ') for arg in self._arguments) + ')'
 
-    def evaluate(self, scope):
-        bound_function = self._function_expression.evaluate(scope)
+    def run(self, frame):
+        bound_function = self._function_expression.run(frame)
         assert isinstance(bound_function, BoundFunction)
-        arguments = [argument.evaluate(scope) for argument in self._arguments]
-        result = bound_function.call(arguments, scope)
+        arguments = [argument.run(frame) for argument in self._arguments]
+        result = bound_function.call(arguments)
         return result
 
+    def run_tail(self, frame):
+        bound_function = self._function_expression.run(frame)
+        assert isinstance(bound_function, BoundFunction)
+        return TailCall(bound_function, [argument.run(frame) for argument in self._arguments])
+
+    def compile_run(self):
+        function = self._function_expression.compile_run()
+        arguments = [argument.compile_run() for argument in self._arguments]
+        return lambda frame: function(frame).call([argument(frame) for argument in arguments])
+
+    def compile_run_tail(self):
+        function = self._function_expression.compile_run()
+        arguments = [argument.compile_run() for argument in self._arguments]
+        return lambda frame: TailCall(function(frame), [argument(frame) for argument in arguments])
+
     def initialize_type(self, scope):
         super().initialize_type(scope)
         function_type = self._function_expression.type
@@ -184,3 +382,12 @@ class FunctionCall(Expression):
 
     def __repr__(self):
         return 'FunctionCall<>'
+
+
+class TailCall:
+    """A call in tail position, waiting to be made by BoundFunction.call()."""
+    __slots__ = ('function', 'arguments')
+
+    def __init__(self, function: BoundFunction, arguments: typing.List[Expression]):
+        self.function = function
+        self.arguments = arguments
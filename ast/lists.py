@@ -1,6 +1,7 @@
 import typing
 
 from ast.base import Expression, union
+from ast.functions import element_source
 from typesystem import Type, NOTHING
 
 __all__ = ['ListValue', 'ListType', 'EmptyListType']
@@ -8,6 +9,9 @@ __all__ = ['ListValue', 'ListType', 'EmptyListType']
 
 # TODO: should this be a Value subclass?
 class ListValue(Expression):
+    __slots__ = ()
+    compound = False
+
     def __init__(self, elements: typing.List[Expression]):
         super().__init__(union(element.names for element in elements), elements)
 
@@ -15,6 +19,9 @@ class ListValue(Expression):
     def items(self) -> typing.List[Expression]:
         return self._children
 
+    def source(self, indent):
+        return '[' + ', '.join(element_source(item, indent + '  ') for item in self.items) + ']'
+
     def __repr__(self):
         return 'ListValue<length=%d>' % len(self.items)
 
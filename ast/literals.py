@@ -5,13 +5,32 @@ __all__ = []
 
 
 class Value(Expression):
+    __slots__ = ('value',)
+    # Values are leaves without names. They're made for every operation, so rather than building these for each
+    # one in Node.__init__ they're shared.
+    names = frozenset()
+    _children = ()
+    compound = False
+
     def __init__(self, value, value_type: typesystem.Type):
-        super().__init__([], [])
         self.value = value
         self.type = value_type
 
     def evaluate(self, scope):
         return self
 
+    def run(self, frame):
+        return self
+
+    def compile_run(self):
+        return lambda frame: self
+
     def __eq__(self, other: 'Value'):
         return self.type == other.type and self.value == other.value
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __reduce__(self):
+        # Subclasses are made from just their Python value, their type is a class attribute.
+        return self.__class__, (self.value,)
@@ -1,5 +1,8 @@
+import operator as python_operator
+
 from ast.boolean import BooleanValue
 from ast.literals import Value
+from ast.operators import ArithmeticOperator, Comparison, Negate, specialize_binary, specialize_unary
 from singleton import Singleton
 from typesystem import Type, Operator, TypeException
 
@@ -7,8 +10,17 @@ __all__ = ['NumberValue', 'NumberType']
 
 
 class NumberValue(Value):
+    __slots__ = ()
+
     def __init__(self, value: int):
-        super().__init__(value, NumberType())
+        self.value = value
+
+    @staticmethod
+    def of(value: int) -> 'NumberValue':
+        """A NumberValue for value, shared with other users of small integers."""
+        if type(value) is int and _SMALLEST <= value <= _LARGEST:
+            return _small_numbers[value - _SMALLEST]
+        return NumberValue(value)
 
     def source(self, indent):
         return '%d' % self.value
@@ -21,6 +33,39 @@ class NumberValue(Value):
             return super().__eq__(other)
         return self.value == other.value
 
+    __hash__ = Value.__hash__
+
+
+_arithmetic_operators = {
+    Operator.add: python_operator.add,
+    Operator.subtract: python_operator.sub,
+    Operator.multiply: python_operator.mul,
+    Operator.divide: python_operator.truediv,
+}
+
+_comparison_operators = {
+    Operator.equals: python_operator.eq,
+    Operator.not_equals: python_operator.ne,
+    Operator.less_than: python_operator.lt,
+    Operator.greater_than: python_operator.gt,
+    Operator.less_or_equal: python_operator.le,
+    Operator.greater_or_equal: python_operator.ge,
+}
+
+
+def _node_name(operator: Operator) -> str:
+    return 'Number' + operator.name.title().replace('_', '')
+
+
+_specialized_nodes = {(ArithmeticOperator, operator): specialize_binary(ArithmeticOperator, _node_name(operator),
+                                                                        function, NumberValue.of)
+                      for operator, function in _arithmetic_operators.items()}
+_specialized_nodes.update({(Comparison, operator): specialize_binary(Comparison, _node_name(operator), function,
+                                                                     BooleanValue.of)
+                           for operator, function in _comparison_operators.items()})
+_specialized_nodes[Negate, Operator.negate] = specialize_unary(Negate, 'NumberNegate', python_operator.neg,
+                                                               NumberValue.of)
+
 
 class NumberType(Type, metaclass=Singleton):
     def supports_operator(self, operator: Operator):
@@ -31,34 +76,60 @@ class NumberType(Type, metaclass=Singleton):
 
     def binary_operator(self, operator: Operator, a: NumberValue, b: NumberValue):
         if operator == Operator.add:
-            return NumberValue(a.value + b.value)
+            return NumberValue.of(a.value + b.value)
         if operator == Operator.subtract:
-            return NumberValue(a.value - b.value)
+            return NumberValue.of(a.value - b.value)
         if operator == Operator.multiply:
-            return NumberValue(a.value * b.value)
+            return NumberValue.of(a.value * b.value)
         if operator == Operator.divide:
-            return NumberValue(a.value / b.value)
+            return NumberValue.of(a.value / b.value)
 
         if operator == Operator.equals:
-            return BooleanValue(a.value == b.value)
+            return BooleanValue.of(a.value == b.value)
         if operator == Operator.not_equals:
-            return BooleanValue(a.value != b.value)
+            return BooleanValue.of(a.value != b.value)
         if operator == Operator.less_than:
-            return BooleanValue(a.value < b.value)
+            return BooleanValue.of(a.value < b.value)
         if operator == Operator.greater_than:
-            return BooleanValue(a.value > b.value)
+            return BooleanValue.of(a.value > b.value)
         if operator == Operator.less_or_equal:
-            return BooleanValue(a.value <= b.value)
+            return BooleanValue.of(a.value <= b.value)
         if operator == Operator.greater_or_equal:
-            return BooleanValue(a.value >= b.value)
+            return BooleanValue.of(a.value >= b.value)
+
+        raise TypeException('Operator %r not implemented for numbers' % operator)
+
+    def binary_operator_function(self, operator: Operator):
+        if operator in _arithmetic_operators:
+            function = _arithmetic_operators[operator]
+            return lambda a, b: NumberValue.of(function(a.value, b.value))
+        if operator in _comparison_operators:
+            function = _comparison_operators[operator]
+            return lambda a, b: BooleanValue.of(function(a.value, b.value))
 
         raise TypeException('Operator %r not implemented for numbers' % operator)
 
     def unary_operator(self, operator: Operator, a: NumberValue):
         if operator == Operator.negate:
-            return NumberValue(-a.value)
+            return NumberValue.of(-a.value)
+
+        raise TypeException('Operator %r not implemented for numbers' % operator)
+
+    def unary_operator_function(self, operator: Operator):
+        if operator == Operator.negate:
+            return lambda a: NumberValue.of(-a.value)
 
         raise TypeException('Operator %r not implemented for numbers' % operator)
 
+    def specialized_node(self, node_class: type, operator: Operator):
+        return _specialized_nodes.get((node_class, operator))
+
     def __str__(self):
         return 'NumberType'
+
+
+NumberValue.type = NumberType()
+# Shared values for the integers programs use most.
+_SMALLEST = -128
+_LARGEST = 1024
+_small_numbers = [NumberValue(value) for value in range(_SMALLEST, _LARGEST + 1)]
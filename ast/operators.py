@@ -1,12 +1,50 @@
+import typing
+
 import ast.boolean
 import typesystem
-from ast.base import Expression, TypeScope, EvaluationScope, ParseException
+from ast.base import Expression, TypeScope, Frame, ParseException
+from ast.blocks import Reference
 from typesystem import Operator, TypeException
 
 __all__ = ['ArithmeticOperator', 'Comparison', 'Negate']
 
 
+def specialize_binary(base: type, name: str, function: typing.Callable, result: type) -> type:
+    """Make a subclass of base that applies function to the values of its operands without any dispatch."""
+    def run(self, frame):
+        lhs, rhs = self._children
+        return result(function(lhs.run(frame).value, rhs.run(frame).value))
+
+    # No __slots__ of their own, so nodes can change to them.
+    return type(name, (base,), {'__slots__': (), 'run': run})
+
+
+def specialize_unary(base: type, name: str, function: typing.Callable, result: type) -> type:
+    def run(self, frame):
+        return result(function(self._children[0].run(frame).value))
+
+    return type(name, (base,), {'__slots__': (), 'run': run})
+
+
+def _operand_source(operand: Expression, indent: str) -> str:
+    source = operand.source(indent)
+    if not operand.compound:
+        return source
+    if isinstance(operand, Comparison) and operand.op is Operator.equals and isinstance(operand.lhs, Reference):
+        # `(name ==` starts a function, so the name needs parentheses of its own.
+        return '((%s) == %s)' % (operand.lhs.source(indent), _operand_source(operand.rhs, indent))
+    return '(' + source + ')'
+
+
+def _quicken(node: Expression, operand_type: typesystem.Type, operator: Operator, base: type):
+    specialized = operand_type.specialized_node(base, operator)
+    if specialized is not None:
+        node.__class__ = specialized
+
+
 class ArithmeticOperator(Expression):
+    __slots__ = ('op',)
+
     def __init__(self, lhs: Expression, op: str, rhs: Expression):
         super().__init__(lhs.names | rhs.names, [lhs, rhs])
         self.op = Operator.lookup(op, 2)
@@ -21,11 +59,24 @@ class ArithmeticOperator(Expression):
     def rhs(self) -> Expression:
         return self._children[1]
 
-    def evaluate(self, scope):
-        lhs = self.lhs.evaluate(scope)
-        rhs = self.rhs.evaluate(scope)
+    def source(self, indent):
+        return _operand_source(self.lhs, indent) + ' ' + self.op.symbol + ' ' + _operand_source(self.rhs, indent)
+
+    def run(self, frame):
+        lhs = self.lhs.run(frame)
+        rhs = self.rhs.run(frame)
         return self.type.binary_operator(self.op, lhs, rhs)
 
+    def compile_run(self):
+        function = self.type.binary_operator_function(self.op)
+        lhs = self.lhs.compile_run()
+        rhs = self.rhs.compile_run()
+        return lambda frame: function(lhs(frame), rhs(frame))
+
+    def quicken(self):
+        super().quicken()
+        _quicken(self, self.type, self.op, ArithmeticOperator)
+
     def initialize_type(self, scope):
         super().initialize_type(scope)
         self.type = typesystem.type_union(self.lhs.type, self.rhs.type)
@@ -39,6 +90,8 @@ class ArithmeticOperator(Expression):
 
 
 class Comparison(Expression):
+    __slots__ = ('op', 'argument_type')
+
     def __init__(self, lhs: Expression, op: str, rhs: Expression):
         super().__init__(lhs.names | rhs.names, [lhs, rhs])
         self.op = Operator.lookup(op, 2)
@@ -53,6 +106,9 @@ class Comparison(Expression):
     def rhs(self) -> Expression:
         return self._children[1]
 
+    def source(self, indent):
+        return _operand_source(self.lhs, indent) + ' ' + self.op.symbol + ' ' + _operand_source(self.rhs, indent)
+
     def initialize_type(self, scope):
         self.lhs.initialize_type(scope)
         self.rhs.initialize_type(scope)
@@ -62,14 +118,26 @@ class Comparison(Expression):
         if not self.argument_type.supports_operator(self.op):
             raise TypeException('Comparison %s not supported by type %s' % (self.op.symbol, self.argument_type))
 
-    def evaluate(self, scope):
-        return self.argument_type.binary_operator(self.op, self.lhs.evaluate(scope), self.rhs.evaluate(scope))
+    def run(self, frame):
+        return self.argument_type.binary_operator(self.op, self.lhs.run(frame), self.rhs.run(frame))
+
+    def compile_run(self):
+        function = self.argument_type.binary_operator_function(self.op)
+        lhs = self.lhs.compile_run()
+        rhs = self.rhs.compile_run()
+        return lambda frame: function(lhs(frame), rhs(frame))
+
+    def quicken(self):
+        super().quicken()
+        _quicken(self, self.argument_type, self.op, Comparison)
 
     def __repr__(self):
         return 'Comparison<%s>' % self.op.symbol
 
 
 class Negate(Expression):
+    __slots__ = ()
+
     def __init__(self, expression: Expression):
         super().__init__(expression.names, [expression])
 
@@ -77,11 +145,23 @@ class Negate(Expression):
     def expression(self) -> Expression:
         return self._children[0]
 
+    def source(self, indent):
+        return '-' + _operand_source(self.expression, indent)
+
     def initialize_type(self, scope: TypeScope):
         self.expression.initialize_type(scope)
         self.type = self.expression.type
         assert self.type.supports_operator(Operator.negate)
 
-    def evaluate(self, scope: EvaluationScope):
-        value = self.expression.evaluate(scope)
+    def run(self, frame: Frame):
+        value = self.expression.run(frame)
         return self.type.unary_operator(Operator.negate, value)
+
+    def compile_run(self):
+        function = self.type.unary_operator_function(Operator.negate)
+        expression = self.expression.compile_run()
+        return lambda frame: function(expression(frame))
+
+    def quicken(self):
+        super().quicken()
+        _quicken(self, self.type, Operator.negate, Negate)
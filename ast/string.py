@@ -1,19 +1,30 @@
+import operator as python_operator
+
 from ast.literals import Value
+from ast.operators import ArithmeticOperator, specialize_binary
 from singleton import Singleton
 from typesystem import Type, Operator, TypeException
 
 
 class StringValue(Value):
+    __slots__ = ()
+
     def __init__(self, value: str):
-        super().__init__(value, StringType())
+        self.value = value
 
     def __str__(self):
         return repr(self.value)
 
+    def source(self, indent):
+        return '"' + self.value + '"'
+
     def __repr__(self):
         return 'StringType<%r>' % self.value
 
 
+StringConcat = specialize_binary(ArithmeticOperator, 'StringConcat', python_operator.add, StringValue)
+
+
 class StringType(Type, metaclass=Singleton):
     def supports_operator(self, operator: Operator):
         return operator in (Operator.add,)
@@ -23,5 +34,18 @@ class StringType(Type, metaclass=Singleton):
             return StringValue(a.value + b.value)
         raise TypeException('Operator %r not implemented for strings' % operator)
 
+    def binary_operator_function(self, operator: Operator):
+        if operator == Operator.add:
+            return lambda a, b: StringValue(a.value + b.value)
+        raise TypeException('Operator %r not implemented for strings' % operator)
+
+    def specialized_node(self, node_class: type, operator: Operator):
+        if node_class is ArithmeticOperator and operator == Operator.add:
+            return StringConcat
+        return None
+
     def __str__(self):
         return 'StringType'
+
+
+StringValue.type = StringType()
@@ -0,0 +1,96 @@
+"""Evaluating one program with many input scopes.
+
+evaluate_many(tree, scopes) yields tree.evaluate(scope) for each scope, in
+order, as scopes come in. Scopes can come from a generator and results are
+yielded as they're ready, so a batch never has to fit in memory.
+
+With executor='thread' or 'process' scopes are evaluated in chunks on a pool
+of workers. At most a few chunks per worker are in flight, so the input is
+only read ahead that far. Threads only run in parallel with evaluators that
+release the GIL, like 'native'. Processes get the program in the format from
+serialization.py and evaluate it with the evaluator named by evaluator, so
+scopes and results have to be Values that can be pickled.
+"""
+
+import collections
+import concurrent.futures
+import functools
+import itertools
+import os
+import typing
+
+import ast
+from ast.base import EvaluationScope
+import parser
+import serialization
+
+__all__ = ['evaluate_many']
+
+# Chunks submitted to each worker ahead of the results being read.
+_CHUNKS_PER_WORKER = 2
+
+
+def _evaluate_chunk(evaluate: typing.Callable[[EvaluationScope], ast.Expression],
+                    scopes: typing.List[EvaluationScope]) -> typing.List[ast.Expression]:
+    return [evaluate(scope) for scope in scopes]
+
+
+# The program in a worker process, loaded once by _load().
+_tree = None  # type: ast.Expression
+
+
+def _load(data: bytes, evaluator: str):
+    global _tree
+    _tree = serialization.loads(data)
+    if evaluator != 'tree':
+        _tree.use_evaluator(parser.evaluators[evaluator](_tree))
+
+
+def _evaluate_loaded(scopes: typing.List[EvaluationScope]) -> typing.List[ast.Expression]:
+    return _evaluate_chunk(_tree.evaluate, scopes)
+
+
+def evaluate_many(tree: ast.Expression, scopes: typing.Iterable[EvaluationScope], executor: str = None,
+                  workers: int = None, chunk_size: int = 256,
+                  evaluator: str = 'tree') -> typing.Iterator[ast.Expression]:
+    """Evaluate tree in each of scopes, yielding the results in order.
+
+    executor is None to evaluate in this thread, or 'thread' or 'process' for a
+    pool of workers, os.cpu_count() by default. evaluator names the entry in
+    parser.evaluators that worker processes use. Threads share tree, and the
+    FunctionCache it's memoized with, which locks itself. Processes each have
+    their own copy of tree, without memoization.
+    """
+    if executor is None:
+        for scope in scopes:
+            yield tree.evaluate(scope)
+        return
+    if chunk_size < 1:
+        raise Exception('chunk_size must be at least 1, not %r' % chunk_size)
+    workers = workers or os.cpu_count() or 1
+    if executor == 'thread':
+        pool = concurrent.futures.ThreadPoolExecutor(workers)
+        function = functools.partial(_evaluate_chunk, tree.evaluate)
+    elif executor == 'process':
+        if evaluator not in parser.evaluators:
+            raise Exception('Unknown evaluator %r' % evaluator)
+        pool = concurrent.futures.ProcessPoolExecutor(workers, initializer=_load,
+                                                      initargs=(serialization.dumps(tree), evaluator))
+        function = _evaluate_loaded
+    else:
+        raise Exception('Unknown executor %r' % executor)
+
+    scopes = iter(scopes)
+    pending = collections.deque()
+    try:
+        while True:
+            while len(pending) < workers * _CHUNKS_PER_WORKER:
+                chunk = list(itertools.islice(scopes, chunk_size))
+                if not chunk:
+                    break
+                pending.append(pool.submit(function, chunk))
+            if not pending:
+                return
+            yield from pending.popleft().result()
+    finally:
+        pool.shutdown(cancel_futures=True)
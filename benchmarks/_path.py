@@ -0,0 +1,27 @@
+"""Lets the benchmarks import a Steph tree.
+
+The tree's ast package shadows the standard library's, which inspect (imported
+by PLY) needs. use() imports inspect first, then forgets the standard ast so
+`import ast` finds the tree's.
+"""
+
+import inspect  # noqa: F401
+import os
+import subprocess
+import sys
+
+# The tree these benchmarks are in.
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def use(directory: str = root):
+    """Import Steph from directory."""
+    sys.modules.pop('ast', None)
+    sys.path.insert(0, directory)
+
+
+def export(revision: str, destination: str):
+    """Write the tree at a git revision to destination."""
+    os.makedirs(destination)
+    archive = subprocess.run(['git', 'archive', revision], cwd=root, check=True, stdout=subprocess.PIPE)
+    subprocess.run(['tar', '-x', '-C', destination], input=archive.stdout, check=True)
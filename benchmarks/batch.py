@@ -0,0 +1,51 @@
+"""Throughput of evaluate_many() with each executor, in evaluations per second.
+
+Evaluates a small program for a stream of generated scopes, without keeping
+the scopes or the results, and reports the peak memory of this process.
+"""
+
+import argparse
+import resource
+import time
+
+import _path
+_path.use()
+
+from batch import evaluate_many
+from parser import parse
+import ast.number
+
+source = '''
+{
+  let fib : (NumberType)=>NumberType =
+    (n == 0) => 0,
+    (n == 1) => 1,
+    (n : NumberType) => fib(n-1) + fib(n-2);
+  return fib(x) * 2 + x;
+}
+'''
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argument_parser.add_argument('--inputs', type=int, default=100000, help='scopes to evaluate')
+    argument_parser.add_argument('--workers', type=int, default=None, help='pool size, defaults to the CPU count')
+    argument_parser.add_argument('--chunk-size', type=int, default=256)
+    argument_parser.add_argument('--evaluator', default='compiled')
+    arguments = argument_parser.parse_args()
+
+    tree = parse(source, {'x': ast.number.NumberType()}, evaluator=arguments.evaluator)
+    print('%-10s %12s %10s' % ('executor', 'evals/s', 'max RSS'))
+    for executor in (None, 'thread', 'process'):
+        scopes = ({'x': ast.number.NumberValue(i % 10)} for i in range(arguments.inputs))
+        start = time.perf_counter()
+        for _ in evaluate_many(tree, scopes, executor=executor, workers=arguments.workers,
+                               chunk_size=arguments.chunk_size, evaluator=arguments.evaluator):
+            pass
+        elapsed = time.perf_counter() - start
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        print('%-10s %12.0f %8dMB' % (executor or 'none', arguments.inputs / elapsed, rss // 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""How long `import parser` and the first parse take in a fresh interpreter.
+
+Copies the source tree to a temporary directory, compiles it, optionally makes
+it read-only like a system-wide install, then times imports in new processes.
+With --compare, a git revision is measured the same way.
+"""
+
+import argparse
+import os
+import shutil
+import stat
+import statistics
+import subprocess
+import sys
+import tempfile
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# inspect (imported by PLY) needs the standard library's ast, which the tree's ast package shadows.
+child = '''
+import inspect, sys, time
+del sys.modules['ast']
+sys.path.insert(0, sys.argv[1])
+start = time.perf_counter()
+import parser
+imported = time.perf_counter()
+parser.parse('1 + 2')
+parsed = time.perf_counter()
+print(imported - start, parsed - imported)
+'''
+
+
+def copy_tree(destination: str, revision: str = None):
+    if revision is None:
+        shutil.copytree(root, destination, ignore=shutil.ignore_patterns(
+            '.git', 'generated', '__pycache__', 'parser.out', 'parsetab.py'))
+    else:
+        os.makedirs(destination)
+        archive = subprocess.run(['git', 'archive', revision], cwd=root, check=True, stdout=subprocess.PIPE)
+        subprocess.run(['tar', '-x', '-C', destination], input=archive.stdout, check=True)
+    subprocess.run([sys.executable, '-m', 'compileall', '-q', destination], check=True)
+
+
+def make_read_only(directory: str):
+    for path, directories, files in os.walk(directory):
+        for name in files + directories:
+            full_path = os.path.join(path, name)
+            os.chmod(full_path, os.stat(full_path).st_mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+    os.chmod(directory, os.stat(directory).st_mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+
+
+def make_writable(directory: str):
+    for path, directories, files in os.walk(directory):
+        os.chmod(path, os.stat(path).st_mode | stat.S_IWUSR)
+        for name in files:
+            full_path = os.path.join(path, name)
+            os.chmod(full_path, os.stat(full_path).st_mode | stat.S_IWUSR)
+
+
+def list_files(directory: str) -> set:
+    return {os.path.join(path, name) for path, _, files in os.walk(directory) for name in files}
+
+
+def measure(directory: str, runs: int):
+    """Median seconds to import and to parse the first expression, or the error that stopped the import."""
+    imports = []
+    parses = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', child, directory], cwd=tempfile.gettempdir(),
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        if result.returncode != 0:
+            return result.stderr.strip().splitlines()[-1]
+        import_time, parse_time = map(float, result.stdout.split())
+        imports.append(import_time)
+        parses.append(parse_time)
+    return statistics.median(imports), statistics.median(parses)
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argument_parser.add_argument('--runs', type=int, default=10, help='processes to time for each tree')
+    argument_parser.add_argument('--writable', action='store_true', help="don't make the copied trees read-only")
+    argument_parser.add_argument('--compare', metavar='REVISION', help='also measure this git revision')
+    arguments = argument_parser.parse_args()
+
+    trees = [('working tree', None)]
+    if arguments.compare:
+        trees.append((arguments.compare, arguments.compare))
+
+    print('%-16s %12s %15s %14s' % ('tree', 'import ms', 'first parse ms', 'files written'))
+    with tempfile.TemporaryDirectory() as scratch:
+        for index, (name, revision) in enumerate(trees):
+            directory = os.path.join(scratch, str(index))
+            copy_tree(directory, revision)
+            if not arguments.writable:
+                make_read_only(directory)
+            before = list_files(directory)
+            try:
+                result = measure(directory, arguments.runs)
+            finally:
+                make_writable(directory)
+            # Processes running as root can write to read-only trees, so count what they wrote too.
+            written = len(list_files(directory) - before)
+            if isinstance(result, str):
+                print('%-16s failed: %s' % (name, result))
+            else:
+                print('%-16s %12.1f %15.1f %14d' % (name, result[0] * 1000, result[1] * 1000, written))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""How much memory parsed programs keep alive.
+
+Parses each program many times, keeping every tree, and reports the memory
+still allocated per program and per node. With --compare, a git revision is
+measured the same way, in its own process, for before and after figures.
+"""
+
+import argparse
+import gc
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+
+import _path
+
+programs = {
+    'arithmetic': '1 + 2 * 3 - x / 4',
+    'fibonacci': '''
+    {
+      let fib : (NumberType)=>NumberType =
+        (n == 0) => 0,
+        (n == 1) => 1,
+        (n : NumberType) => fib(n-1) + fib(n-2);
+      return fib(x);
+    }
+    ''',
+    'closures': '''
+    {
+      let adder = (m : NumberType) => (n : NumberType) => m + n;
+      let twice = (f : (NumberType)=>NumberType, n : NumberType) => f(f(n));
+      return twice(adder(x), 10);
+    }
+    ''',
+    'strings': '''
+    {
+      let greeting = "hello";
+      let name = "world";
+      return if (x > 0) greeting + ", " + name else name;
+    }
+    ''',
+    # Lots of small expressions, like a generated program.
+    'generated': '{\n%s\n  return x;\n}' % '\n'.join(
+        '  let v%d = (x + %d) * %d < %d;' % (i, i, i + 1, i * 7) for i in range(200)),
+}
+
+
+def count_nodes(node) -> int:
+    # Every revision's nodes have _children, walk() came later.
+    return 1 + sum(count_nodes(child) for child in node._children)
+
+
+def retained(source: str, copies: int) -> float:
+    """Bytes still allocated per parsed copy of source."""
+    from parser import parse
+    import ast.number
+    scope = {'x': ast.number.NumberType()}
+    parse(source, scope)  # parser tables and other one off allocations
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    trees = [parse(source, scope) for _ in range(copies)]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del trees
+    return (after - before) / copies
+
+
+def measure(copies: int):
+    """Yield the name, node count and bytes per copy of each program, with the tree being measured."""
+    from parser import parse
+    import ast.number
+    for name, source in programs.items():
+        nodes = count_nodes(parse(source, {'x': ast.number.NumberType()}))
+        yield name, nodes, retained(source, copies)
+
+
+def measure_tree(directory: str, copies: int) -> dict:
+    """Programs' node counts and bytes per copy for the tree in directory, measured in a new process."""
+    result = subprocess.run([sys.executable, __file__, '--copies', str(copies), '--tree', directory],
+                            check=True, stdout=subprocess.PIPE, universal_newlines=True)
+    rows = (line.split() for line in result.stdout.splitlines())
+    return {name: (int(nodes), float(size)) for name, nodes, size in rows}
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argument_parser.add_argument('--copies', type=int, default=200, help='trees to keep of each program')
+    argument_parser.add_argument('--compare', metavar='REVISION', help='also measure this git revision')
+    # Measure the tree in this directory and print the results for measure_tree().
+    argument_parser.add_argument('--tree', help=argparse.SUPPRESS)
+    arguments = argument_parser.parse_args()
+
+    if arguments.tree:
+        _path.use(arguments.tree)
+        for name, nodes, size in measure(arguments.copies):
+            print(name, nodes, size)
+        return
+
+    trees = [('working tree', measure_tree(_path.root, arguments.copies))]
+    if arguments.compare:
+        with tempfile.TemporaryDirectory() as scratch:
+            _path.export(arguments.compare, scratch + '/tree')
+            trees.append((arguments.compare, measure_tree(scratch + '/tree', arguments.copies)))
+
+    for tree, results in trees:
+        print(tree)
+        print('  %-12s %8s %14s %10s' % ('program', 'nodes', 'bytes/program', 'bytes/node'))
+        total_nodes = total_bytes = 0
+        for name, (nodes, size) in results.items():
+            total_nodes += nodes
+            total_bytes += size
+            print('  %-12s %8d %14.0f %10.1f' % (name, nodes, size, size / nodes))
+        print('  %-12s %8d %14.0f %10.1f' % ('total', total_nodes, total_bytes, total_bytes / total_nodes))
+    if len(trees) == 2:
+        (_, after), (before_name, before) = trees
+        print('bytes/program change from %s' % before_name)
+        for name in programs:
+            if name in before:
+                print('  %-12s %+13.1f%%' % (name, (after[name][1] / before[name][1] - 1) * 100))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""How parse time grows with the length of lists, argument lists and blocks.
+
+Parses generated programs of increasing size and reports the time per element.
+If parsing is linear the time per element stays about the same as size grows.
+"""
+
+import argparse
+import time
+
+import _path
+_path.use()
+
+from parser import parse
+import ast.number
+import typesystem
+
+shapes = {
+    'list': lambda size: '[%s]' % ', '.join(str(i) for i in range(size)),
+    'arguments': lambda size: 'f(%s)' % ', '.join(str(i) for i in range(size)),
+    'lets': lambda size: '{\n%s\n  return v0;\n}' % '\n'.join('  let v%d = %d;' % (i, i) for i in range(size)),
+    'types': lambda size: '(f : (%s)=>NumberType) => 1' % ', '.join(['NumberType'] * size),
+}
+
+
+def time_parse(source: str, scope: dict, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(source, scope)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argument_parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                                 help='elements in each generated program')
+    argument_parser.add_argument('--repeat', type=int, default=3, help='parses of each program, the best is kept')
+    arguments = argument_parser.parse_args()
+
+    parse('1')  # build the parser
+    print('%-10s %8s %10s %12s' % ('shape', 'size', 'seconds', 'us/element'))
+    for name, shape in shapes.items():
+        for size in arguments.sizes:
+            number = ast.number.NumberType()
+            scope = {'f': typesystem.Function([number] * size, number)}
+            seconds = time_parse(shape(size), scope, arguments.repeat)
+            print('%-10s %8d %10.3f %12.2f' % (name, size, seconds, seconds / size * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Parse throughput of each parser backend, in tokens per second.
+
+Times building the syntax tree alone and the whole of parse(), which also
+checks types and resolves names, for a mix of small and generated programs.
+"""
+
+import argparse
+import time
+
+import _path
+_path.use()
+
+import parser
+import pratt
+
+programs = [
+    '1 + 2 * 3 - x / 4',
+    '''
+    {
+      let fib : (NumberType)=>NumberType =
+        (n == 0) => 0,
+        (n == 1) => 1,
+        (n : NumberType) => fib(n-1) + fib(n-2);
+      return fib(x);
+    }
+    ''',
+    '''
+    {
+      let adder = (m : NumberType) => (n : NumberType) => m + n;
+      let twice = (f : (NumberType)=>NumberType, n : NumberType) => f(f(n));
+      return twice(adder(x), 10);
+    }
+    ''',
+    '''
+    {
+      let greeting = "hello";
+      let name = "world";
+      return if (x > 0) greeting + ", " + name else name;
+    }
+    ''',
+    '{\n%s\n  return x;\n}' % '\n'.join(
+        '  let v%d = if ((x + %d) * %d < %d) -x else x - %d;' % (i, i, i + 1, i * 7, i) for i in range(500)),
+    '[%s]' % ', '.join('x * %d' % i for i in range(2000)),
+]
+
+
+def throughput(parse, tokens: int, seconds: float) -> float:
+    """Tokens per second parsing every program for at least seconds."""
+    elapsed = 0
+    parsed = 0
+    while elapsed < seconds:
+        start = time.perf_counter()
+        for source in programs:
+            parse(source)
+        elapsed += time.perf_counter() - start
+        parsed += tokens
+    return parsed / elapsed
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    argument_parser.add_argument('--seconds', type=float, default=2, help='time to spend on each measurement')
+    arguments = argument_parser.parse_args()
+
+    scope = {'x': parser.ast.number.NumberType()}
+    tokens = sum(len(pratt.tokenize(source)) - 1 for source in programs)
+    print('%d tokens in %d programs' % (tokens, len(programs)))
+    print('%-8s %16s %16s' % ('backend', 'syntax tokens/s', 'parse tokens/s'))
+    for backend in parser.backends:
+        p = parser.Parser(backend)
+        syntax = throughput(p.syntax_tree, tokens, arguments.seconds)
+        full = throughput(lambda source: p.parse(source, scope), tokens, arguments.seconds)
+        print('%-8s %16.0f %16.0f' % (backend, syntax, full))
+
+
+if __name__ == '__main__':
+    main()
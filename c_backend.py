@@ -0,0 +1,321 @@
+"""Native code for the Number/Boolean subset of Steph.
+
+Programs that only use numbers, booleans, if/else, arithmetic, comparisons and
+calls to functions bound by let are translated to C, built with the system cc
+into a shared library and called through ctypes. Functions are lambda lifted:
+the names they capture become extra parameters.
+
+Anything outside the subset runs in the interpreter instead. So does any
+evaluation that overflows 64 bit integers or recurses too deeply, since Steph
+numbers are arbitrary precision.
+"""
+
+import ctypes
+import hashlib
+import os
+import shutil
+import stat
+import subprocess
+import tempfile
+import typing
+
+import ast
+import ast.boolean
+import ast.number
+
+__all__ = ['Unsupported', 'translate', 'NativeProgram']
+
+PRELUDE = r'''#include <limits.h>
+#include <setjmp.h>
+
+typedef long long steph_value;
+
+#define STEPH_MAX_DEPTH 10000
+
+static _Thread_local jmp_buf steph_abort;
+static _Thread_local int steph_depth;
+
+static void steph_fail(void) {
+    longjmp(steph_abort, 1);
+}
+
+static inline steph_value steph_add(steph_value a, steph_value b) {
+    steph_value result;
+    if (__builtin_add_overflow(a, b, &result)) steph_fail();
+    return result;
+}
+
+static inline steph_value steph_subtract(steph_value a, steph_value b) {
+    steph_value result;
+    if (__builtin_sub_overflow(a, b, &result)) steph_fail();
+    return result;
+}
+
+static inline steph_value steph_multiply(steph_value a, steph_value b) {
+    steph_value result;
+    if (__builtin_mul_overflow(a, b, &result)) steph_fail();
+    return result;
+}
+
+static inline steph_value steph_negate(steph_value a) {
+    if (a == LLONG_MIN) steph_fail();
+    return -a;
+}
+
+static inline void steph_enter(void) {
+    if (++steph_depth > STEPH_MAX_DEPTH) steph_fail();
+}
+'''
+
+_arithmetic = {'+': 'steph_add', '-': 'steph_subtract', '*': 'steph_multiply'}
+_value_types = (ast.number.NumberType(), ast.boolean.Boolean())
+
+
+class Unsupported(Exception):
+    pass
+
+
+class _LiftedFunction:
+    def __init__(self, name: str, captured: typing.List[str]):
+        self.name = name
+        self.captured = captured
+
+
+class CTranslator:
+    def __init__(self):
+        self._counter = 0
+        self._prototypes = []  # type: typing.List[str]
+        self._functions = []  # type: typing.List[str]
+
+    def fresh(self, name: str) -> str:
+        self._counter += 1
+        return 's_%s_%d' % (name, self._counter)
+
+    def program(self, tree: ast.Expression) -> typing.Tuple[str, typing.List[str]]:
+        """Return the C source for tree and the order its free names are passed in."""
+        self._check_value_type(tree.type)
+        names = sorted(tree.names)
+        env = {name: self.fresh(name) for name in names}
+        body = self.expression(tree, env)
+        entry = ['int steph_main(const steph_value *scope, steph_value *result) {',
+                 '    if (setjmp(steph_abort)) return 1;',
+                 '    steph_depth = 0;']
+        entry += ['    steph_value %s = scope[%d];' % (env[name], i) for i, name in enumerate(names)]
+        entry += ['    *result = %s;' % body,
+                  '    return 0;',
+                  '}']
+        source = '\n'.join([PRELUDE] + self._prototypes + [''] + self._functions + entry) + '\n'
+        return source, names
+
+    @staticmethod
+    def _check_value_type(value_type):
+        if value_type not in _value_types:
+            raise Unsupported('Type %s is not a number or boolean' % value_type)
+
+    def expression(self, node: ast.Expression, env: dict) -> str:
+        if isinstance(node, ast.boolean.BooleanValue):
+            return '1' if node.value else '0'
+        if isinstance(node, ast.number.NumberValue):
+            if not -2 ** 63 < node.value < 2 ** 63:
+                raise Unsupported('Number %d does not fit in 64 bits' % node.value)
+            return '%dLL' % node.value
+        if isinstance(node, ast.Reference):
+            return self._value(node.name, env, node.type)
+        if isinstance(node, ast.ArithmeticOperator):
+            self._check_value_type(node.type)
+            if node.op.symbol not in _arithmetic:
+                raise Unsupported('Operator %s is not supported' % node.op.symbol)
+            return '%s(%s, %s)' % (_arithmetic[node.op.symbol], self.expression(node.lhs, env),
+                                   self.expression(node.rhs, env))
+        if isinstance(node, ast.Comparison):
+            self._check_value_type(node.argument_type)
+            return '(%s %s %s)' % (self.expression(node.lhs, env), node.op.symbol, self.expression(node.rhs, env))
+        if isinstance(node, ast.Negate):
+            return 'steph_negate(%s)' % self.expression(node.expression, env)
+        if isinstance(node, ast.IfElse):
+            return '(%s ? %s : %s)' % (self.expression(node._condition, env), self.expression(node._true, env),
+                                       self.expression(node._false, env))
+        if isinstance(node, ast.Block):
+            return self.block(node, env)
+        if isinstance(node, ast.FunctionCall):
+            return self.call(node, env)
+        if isinstance(node, ast.Common):
+            # Native code is fast enough to just evaluate it again.
+            return self.expression(node.expression, env)
+        raise Unsupported('%r is not supported' % node)
+
+    def _value(self, name: str, env: dict, value_type) -> str:
+        binding = env.get(name)
+        if not isinstance(binding, str):
+            raise Unsupported('%s is not a number or boolean' % name)
+        self._check_value_type(value_type)
+        return binding
+
+    def block(self, block: ast.Block, env: dict) -> str:
+        # A GNU statement expression, so blocks can stay expressions.
+        statements = []
+        inner_env = dict(env)
+        for let in block._lets:
+            if isinstance(let.expression, ast.Function):
+                inner_env[let.name] = self.function(let, env)
+            else:
+                self._check_value_type(let.type)
+                name = self.fresh(let.name)
+                statements.append('steph_value %s = %s;' % (name, self.expression(let.expression, env)))
+                inner_env[let.name] = name
+        statements.append(self.expression(block._expression, inner_env) + ';')
+        return '({ %s })' % ' '.join(statements)
+
+    def function(self, let: ast.Let, env: dict) -> _LiftedFunction:
+        function = let.expression  # type: ast.Function
+        free_names = ast.base.union(piece.names for piece in function.pieces) - {let.name}
+        captured = []
+        for name in sorted(free_names):
+            binding = env.get(name)
+            if isinstance(binding, _LiftedFunction):
+                captured += [c for c in binding.captured if c not in captured]
+            elif binding is not None and binding not in captured:
+                captured.append(binding)
+        lifted = _LiftedFunction(self.fresh(let.name), captured)
+
+        function_env = {name: binding for name, binding in env.items() if name in free_names}
+        function_env[let.name] = lifted
+        arguments = function.pieces[0].arguments
+        for arg in arguments:
+            self._check_value_type(arg.type)
+        parameters = [self.fresh(arg.name) for arg in arguments]
+        signature = 'static steph_value %s(%s)' % (
+            lifted.name, ', '.join('steph_value %s' % p for p in parameters + captured) or 'void')
+        self._prototypes.append(signature + ';')
+
+        lines = [signature + ' {', '    steph_value result;', '    steph_enter();']
+        otherwise = ''
+        for piece in function.pieces:
+            if len(piece.arguments) != len(parameters):
+                raise Unsupported('Function pieces of %s take different numbers of arguments' % let.name)
+            self._check_value_type(piece.expression.type)
+            guards = ['%s == %s' % (parameter, self.expression(arg.expression, function_env))
+                      for parameter, arg in zip(parameters, piece.arguments)
+                      if isinstance(arg, ast.ComparisonPatternMatch)]
+            piece_env = dict(function_env)
+            piece_env.update(zip((arg.name for arg in piece.arguments), parameters))
+            body = 'result = %s;' % self.expression(piece.expression, piece_env)
+            if not guards:
+                lines.append('    %s{ %s }' % (otherwise, body))
+                break
+            lines.append('    %sif (%s) { %s }' % (otherwise, ' && '.join(guards), body))
+            otherwise = 'else '
+        else:
+            # The interpreter raises when no piece matches, let it.
+            lines.append('    else steph_fail();')
+        lines += ['    steph_depth--;', '    return result;', '}', '']
+        self._functions += lines
+        return lifted
+
+    def call(self, call: ast.FunctionCall, env: dict) -> str:
+        function = call._function_expression
+        lifted = env.get(function.name) if isinstance(function, ast.Reference) else None
+        if not isinstance(lifted, _LiftedFunction):
+            raise Unsupported('Only functions bound by let can be called')
+        arguments = [self.expression(arg, env) for arg in call._arguments] + lifted.captured
+        return '%s(%s)' % (lifted.name, ', '.join(arguments))
+
+
+def translate(tree: ast.Expression) -> typing.Tuple[str, typing.List[str]]:
+    """Translate tree to C, raising Unsupported if it's outside the native subset."""
+    return CTranslator().program(tree)
+
+
+def _private(path: str, is_type: typing.Callable[[int], bool]) -> bool:
+    """Whether path is what is_type checks for, owned by this user and not writable by anyone else."""
+    status = os.lstat(path)
+    return is_type(status.st_mode) and status.st_uid == os.getuid() and \
+        not status.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def _cache_directory() -> typing.Optional[str]:
+    """This user's directory for built libraries, or None if another user could have put libraries in it."""
+    directory = os.path.join(tempfile.gettempdir(), 'steph-native-%d' % os.getuid())
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    except OSError:
+        return None
+    return directory if _private(directory, stat.S_ISDIR) else None
+
+
+def build(source: str, directory: str) -> str:
+    """Build C source into a shared library in directory, reusing an earlier build of the same source."""
+    library = os.path.join(directory, hashlib.sha256(source.encode()).hexdigest() + '.so')
+    if os.path.lexists(library) and _private(library, stat.S_ISREG):
+        return library
+    with tempfile.TemporaryDirectory(dir=directory) as build_directory:
+        c_file = os.path.join(build_directory, 'program.c')
+        with open(c_file, 'w') as f:
+            f.write(source)
+        output = os.path.join(build_directory, 'program.so')
+        subprocess.run(['cc', '-O2', '-shared', '-fPIC', '-o', output, c_file],
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        os.replace(output, library)
+    return library
+
+
+def load(source: str) -> ctypes.CDLL:
+    """Build C source and load it, keeping builds in a directory only this user can write to."""
+    directory = _cache_directory()
+    if directory is not None:
+        return ctypes.CDLL(build(source, directory))
+    # Nowhere safe to keep builds, so build in a new private directory and remove it once it's loaded.
+    directory = tempfile.mkdtemp(prefix='steph-native-')
+    try:
+        return ctypes.CDLL(build(source, directory))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class NativeProgram:
+    """Evaluates a tree natively when possible and through the interpreter otherwise."""
+
+    def __init__(self, tree: ast.Expression):
+        self.tree = tree
+        self._interpret = tree.interpret
+        self.reason = None  # why the tree isn't running natively
+        self._main = None
+        try:
+            source, self._names = translate(tree)
+            library = load(source)
+        except Unsupported as e:
+            self.reason = str(e)
+            return
+        except (OSError, subprocess.CalledProcessError) as e:
+            self.reason = 'Building native code failed: %s' % e
+            return
+        self._main = library.steph_main
+        self._main.argtypes = [ctypes.POINTER(ctypes.c_longlong), ctypes.POINTER(ctypes.c_longlong)]
+        self._main.restype = ctypes.c_int
+        self._boolean = tree.type == ast.boolean.Boolean()
+
+    @property
+    def native(self) -> bool:
+        return self._main is not None
+
+    def evaluate(self, scope: ast.base.EvaluationScope) -> ast.Expression:
+        if self._main is not None:
+            result = self._evaluate_native(scope)
+            if result is not None:
+                return result
+        return self._interpret(scope)
+
+    def _evaluate_native(self, scope):
+        values = [scope[name].value for name in self._names]
+        # Native code only has 64 bit integers, the interpreter handles anything else.
+        if not all(isinstance(value, int) and -2 ** 63 <= value < 2 ** 63 for value in values):
+            return None
+        result = ctypes.c_longlong()
+        if self._main((ctypes.c_longlong * len(values))(*values), ctypes.byref(result)):
+            # Overflow, too deep or no matching function piece.
+            return None
+        if self._boolean:
+            return ast.boolean.BooleanValue.of(bool(result.value))
+        return ast.number.NumberValue.of(result.value)
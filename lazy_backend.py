@@ -0,0 +1,151 @@
+"""A call-by-need evaluator.
+
+Lets and function arguments aren't evaluated when they're bound. Their slots
+hold Thunks that evaluate them the first time they're used and remember the
+value, so lets the result never reaches, like ones only used in the branch of
+an if that isn't taken, are never evaluated and the rest are evaluated once.
+
+Arguments a function pattern matches on are evaluated before the piece to call
+is picked, the others stay thunks. Arithmetic and comparisons that can't fail
+and only use values that are already known are evaluated straight away, a
+Thunk would cost more, and an accumulator passed down a loop would otherwise
+grow a chain of Thunks as long as the loop. Calls in tail position, including
+through blocks and ifs, don't grow the Python stack.
+
+Functions made here are LazyFunctions, BoundFunctions that can be called by
+the rest of the interpreter with ordinary arguments. Memoization doesn't apply
+to calls made here.
+"""
+
+import typing
+
+import ast
+import ast.literals
+from ast.base import EvaluationScope, Frame
+from ast.functions import PatternMatch
+from typesystem import Operator
+
+__all__ = ['evaluate', 'LazyFunction', 'Thunk']
+
+
+class Thunk:
+    """An expression waiting to be evaluated in a frame, then its value."""
+    __slots__ = ('node', 'frame', 'value')
+
+    def __init__(self, node: ast.Expression, frame: Frame):
+        self.node = node
+        self.frame = frame
+        self.value = None
+
+    def force(self) -> ast.Expression:
+        if self.node is not None:
+            self.value = _run(self.node, self.frame)
+            # The frame isn't needed any more, let it go.
+            self.node = self.frame = None
+        return self.value
+
+    def __repr__(self):
+        return 'Thunk<%r>' % (self.value if self.node is None else self.node)
+
+
+def _force(value):
+    return value.force() if type(value) is Thunk else value
+
+
+def _cheap(node: ast.Expression, frame: Frame) -> bool:
+    """Whether evaluating node now is quick and can't fail."""
+    if isinstance(node, ast.literals.Value):
+        return True
+    if isinstance(node, ast.Reference):
+        value = frame[node.slot]
+        return type(value) is not Thunk or value.node is None
+    if isinstance(node, (ast.ArithmeticOperator, ast.Comparison)):
+        return node.op is not Operator.divide and _cheap(node.lhs, frame) and _cheap(node.rhs, frame)
+    if isinstance(node, ast.Negate):
+        return _cheap(node.expression, frame)
+    return False
+
+
+def _delay(node: ast.Expression, frame: Frame):
+    """What goes in a slot for node, a Thunk unless it's as cheap to just evaluate it."""
+    if isinstance(node, ast.literals.Value):
+        return node
+    if isinstance(node, ast.Reference):
+        # Shares the Thunk, so it's still only evaluated once.
+        return frame[node.slot]
+    if isinstance(node, ast.Function):
+        return LazyFunction(node, [frame[slot] for slot in node.captures])
+    if _cheap(node, frame):
+        return _run(node, frame)
+    return Thunk(node, frame)
+
+
+class LazyFunction(ast.BoundFunction):
+    __slots__ = ()
+
+    def enter(self, arguments: typing.List[typing.Any]) -> typing.Tuple[ast.Expression, Frame]:
+        """The body to evaluate, and the frame to evaluate it in, for a call with arguments that may be Thunks."""
+        function = self.function
+        for piece in function.pieces:
+            for i, arg in enumerate(piece.arguments):
+                if isinstance(arg, PatternMatch):
+                    arguments[i] = _force(arguments[i])
+        frame = self.frame(arguments)
+
+        def matches(index):
+            return all(frame[arg.slot] == _run(arg.expression, frame)
+                       for arg in function.pieces[index].arguments if isinstance(arg, PatternMatch))
+
+        index = function.dispatch.select(arguments, matches)
+        if index is None:
+            raise Exception('No matching function implementation for arguments=%r in %r' %
+                            (arguments, function.pieces))
+        return function.pieces[index].expression, frame
+
+    def call_once(self, arguments):
+        return _run(*self.enter(list(arguments)))
+
+
+def _run(node: ast.Expression, frame: Frame) -> ast.Expression:
+    """Evaluate node, following blocks, ifs and calls in tail position in a loop."""
+    while True:
+        if isinstance(node, ast.Block):
+            for let in node._lets:
+                let.bind(frame, _delay(let.expression, frame))
+            node = node._expression
+        elif isinstance(node, ast.IfElse):
+            node = node._true if _run(node._condition, frame) else node._false
+        elif isinstance(node, ast.FunctionCall):
+            bound_function = _run(node._function_expression, frame)
+            assert isinstance(bound_function, ast.BoundFunction)
+            arguments = [_delay(argument, frame) for argument in node._arguments]
+            if type(bound_function) is not LazyFunction:
+                return bound_function.call([_force(argument) for argument in arguments])
+            node, frame = bound_function.enter(arguments)
+        elif isinstance(node, ast.Reference):
+            value = frame[node.slot]
+            if type(value) is Thunk:
+                value = frame[node.slot] = value.force()
+            return value
+        elif isinstance(node, ast.literals.Value):
+            return node
+        elif isinstance(node, ast.ArithmeticOperator):
+            return node.type.binary_operator(node.op, _run(node.lhs, frame), _run(node.rhs, frame))
+        elif isinstance(node, ast.Comparison):
+            return node.argument_type.binary_operator(node.op, _run(node.lhs, frame), _run(node.rhs, frame))
+        elif isinstance(node, ast.Negate):
+            return node.type.unary_operator(Operator.negate, _run(node.expression, frame))
+        elif isinstance(node, ast.Function):
+            return LazyFunction(node, [frame[slot] for slot in node.captures])
+        elif isinstance(node, ast.Common):
+            value = frame[node.slot]
+            if value is None:
+                value = frame[node.slot] = _run(node.expression, frame)
+            return value
+        else:
+            # Nodes that can't be evaluated (like ListValue) raise the interpreter's error.
+            return node.run(frame)
+
+
+def evaluate(tree: ast.Expression, scope: EvaluationScope) -> ast.Expression:
+    return _run(tree, tree.frame(scope))
@@ -1,3 +1,5 @@
+import sys
+
 import ply.lex as lex
 
 keywords = (
@@ -70,6 +72,5 @@ def t_error(t):
     t.lexer.skip(1)
 
 
-# Build the lexer
-
-lex.lex()
+def build() -> lex.Lexer:
+    return lex.lex(module=sys.modules[__name__])
@@ -0,0 +1,92 @@
+"""Memoization of calls to Steph functions.
+
+Steph is pure, so calling a function with the same captured values and the same
+arguments always gives the same result. A FunctionCache remembers those results
+and evicts the least recently used ones when it goes over its budget of entries
+or bytes. Byte sizes are estimates from sys.getsizeof().
+
+A FunctionCache is locked around each lookup and store, so threads evaluating
+trees memoized with the same cache, like evaluate_many(..., executor='thread'),
+can share it.
+"""
+
+import collections
+import sys
+import threading
+import typing
+
+import ast
+
+__all__ = ['FunctionCache', 'memoize']
+
+
+def _size(value) -> int:
+    if isinstance(value, tuple):
+        return sys.getsizeof(value) + sum(_size(item) for item in value)
+    if isinstance(value, ast.literals.Value):
+        return sys.getsizeof(value) + sys.getsizeof(value.value)
+    # Functions are shared with the program so only count the reference.
+    return sys.getsizeof(value)
+
+
+class FunctionCache:
+    def __init__(self, max_entries: int = None, max_bytes: int = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._entries = collections.OrderedDict()  # type: typing.Dict[tuple, typing.Tuple[ast.Expression, int]]
+        # Looking up moves the entry, storing can evict others, neither can be interleaved.
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key: tuple) -> typing.Optional[ast.Expression]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: tuple, result: ast.Expression):
+        size = _size(key) + _size(result)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (result, size)
+            self.bytes += size
+            while (self.max_entries is not None and len(self._entries) > self.max_entries) or \
+                    (self.max_bytes is not None and self.bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> typing.Dict[str, int]:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self._entries), 'bytes': self.bytes}
+
+    def __repr__(self):
+        return 'FunctionCache<%s>' % ', '.join('%s=%d' % item for item in sorted(self.stats().items()))
+
+
+def memoize(tree: ast.Node, cache: FunctionCache) -> FunctionCache:
+    """Memoize calls to every function in tree with cache."""
+    for node in tree.walk():
+        if isinstance(node, ast.Function):
+            node.cache = cache
+    return cache
@@ -0,0 +1,337 @@
+"""An optimizer for type checked trees.
+
+Optimizer.optimize() runs after initialize_type() and before the tree is
+quickened and resolved:
+
+* Closed subexpressions, ones with no names, that don't call functions are
+  evaluated once, here, and replaced by their values. That folds operators on
+  values, and computes closed parts of function bodies once rather than on
+  every call. Closed expressions that call functions are left alone, they
+  might not finish.
+* Ifs whose conditions are constant are replaced by the branch they take.
+* Lets that a block's expression doesn't use are dropped, and blocks left
+  without lets are replaced by their expressions.
+* With Optimizer(inline=size), calls to functions bound by lets are replaced
+  by the body of the piece they call, if the arguments that patterns check
+  are values, and the body is at most size nodes. Arguments that are values
+  or names, or that the body only uses once, go straight into the body,
+  others are bound by lets around it, and the result is optimized again so
+  constant arguments fold. Helpers whose calls are all inlined are then
+  dropped like any other unused let. Functions that call themselves are only
+  inlined with unfold, at most that many times for each tree, and when some
+  of the arguments are values.
+* With calls=True, calls whose arguments are all values and whose functions
+  don't use any other names are evaluated too. They might not finish.
+
+Optimizer.specialize(tree, known) optimizes a copy of a tree with the values
+of some of its names in it, which is what parser.specialize() uses to make
+residual trees for the rest of the names.
+
+Steph is pure so none of this changes what a program evaluates to, except
+that errors in code that's never used, like an unused let that divides by
+zero, go away with it. Subexpressions that fail when they're evaluated here
+are kept, to fail when the program runs.
+"""
+
+import typing
+
+import ast
+import ast.boolean
+import ast.functions
+import typesystem
+from ast.base import union, EvaluationScope
+from ast.literals import Value
+
+__all__ = ['Optimizer']
+
+
+def _count(tree: ast.Node) -> int:
+    return sum(1 for _ in tree.walk())
+
+
+def _bindings(node: ast.Node) -> typing.Iterator[typing.Tuple[ast.Node, typing.List[ast.Node]]]:
+    """node's children, each with the lets and arguments node puts in scope for it, like resolve() does."""
+    children = node._children
+    if isinstance(node, ast.Let):
+        yield children[0], [node]
+    elif isinstance(node, (ast.Block, ast.FunctionPiece)):
+        for child in children[:-1]:
+            yield child, []
+        yield children[-1], children[:-1]
+    else:
+        for child in children:
+            yield child, []
+
+
+def _names(node: ast.Node) -> typing.FrozenSet[str]:
+    """node's free names worked out from its children, like its constructor does."""
+    children = node._children
+    if isinstance(node, ast.Let):
+        return children[0].names - {node.name}
+    if isinstance(node, ast.Block):
+        lets = children[:-1]
+        return frozenset(union(let.names for let in lets) | (children[-1].names - {let.name for let in lets}))
+    if isinstance(node, ast.FunctionPiece):
+        arguments = children[:-1]
+        return frozenset((children[-1].names | union(arg.names for arg in arguments)) -
+                         {arg.name for arg in arguments})
+    return frozenset(union(child.names for child in children))
+
+
+def _slots(cls: type) -> typing.List[str]:
+    return [name for base in cls.__mro__ for name in base.__dict__.get('__slots__', ())]
+
+
+def _reference(name: str, type_: typesystem.Type) -> ast.Reference:
+    reference = ast.Reference(name)
+    reference.type = type_
+    return reference
+
+
+def _copy(node: ast.Node, arguments: typing.Dict[str, ast.Expression]) -> ast.Node:
+    """A copy of typed tree node with the free references to names in arguments replaced by their values."""
+    if isinstance(node, Value):
+        return node
+    if isinstance(node, ast.Reference) and node.name in arguments:
+        argument = arguments[node.name]
+        if isinstance(argument, ast.Reference):
+            # References get slots when they're resolved, each one needs its own.
+            return _reference(argument.name, argument.type)
+        return argument
+    copy = object.__new__(type(node))
+    for name in _slots(type(node)):
+        if hasattr(node, name):
+            setattr(copy, name, getattr(node, name))
+    children = []
+    for child, binders in _bindings(node):
+        hidden = {binder.name for binder in binders}
+        children.append(_copy(child, {name: value for name, value in arguments.items() if name not in hidden}))
+    if children:
+        copy._children = tuple(children)
+        copy.names = _names(copy)
+    return copy
+
+
+def _uses(node: ast.Node, name: str) -> int:
+    """About how many times evaluating node evaluates references to name: 0, 1 or more than that."""
+    if isinstance(node, ast.Reference):
+        return int(node.name == name)
+    if isinstance(node, ast.Function):
+        # Once for every call.
+        return 2 if name in node.names else 0
+    return min(2, sum(_uses(child, name) for child in node._children))
+
+
+class _Inlinable:
+    """What's in scope for the name of a let whose function can be inlined."""
+    __slots__ = ('let', 'captured')
+
+    def __init__(self, let: ast.Let, captured: typing.Dict[str, object]):
+        self.let = let
+        # What the function's free names, other than the let's, referred to where it was defined.
+        self.captured = captured
+
+    @property
+    def function(self) -> ast.Function:
+        return self.let.expression
+
+    @property
+    def recursive(self) -> bool:
+        return self.let.name in self.function.names
+
+
+def _select(function: ast.Function, arguments: typing.List[ast.Expression]) -> typing.Optional[ast.FunctionPiece]:
+    """The piece of function that a call with arguments calls, or None if that depends on what isn't known yet."""
+    for piece in function.pieces:
+        for parameter, argument in zip(piece.arguments, arguments):
+            if isinstance(parameter, ast.functions.PatternMatch):
+                value = parameter.constant()
+                if value is None or not isinstance(argument, Value):
+                    return None
+                if argument != value:
+                    break
+        else:
+            return piece
+    return None
+
+
+class Optimizer:
+    """Optimizes trees and counts what it did to them, over every tree it's used for."""
+
+    def __init__(self, inline: int = 0, unfold: int = 0, calls: bool = False):
+        # The biggest function body, in nodes, to inline. 0 doesn't inline.
+        self.inline = inline
+        # How many calls to recursive functions to inline in each tree.
+        self.unfold = unfold
+        # Whether to evaluate calls whose arguments and functions are known. They might not finish.
+        self.calls = calls
+        self._unfolds = 0
+        # Closed subexpressions replaced by their values.
+        self.folded = 0
+        # Ifs replaced by one of their branches.
+        self.pruned = 0
+        # Lets dropped because nothing used them.
+        self.dropped = 0
+        # Calls replaced by the bodies of the functions they called.
+        self.inlined = 0
+        # Nodes in the trees before optimizing them, less the nodes after.
+        self.removed = 0
+
+    def optimize(self, tree: ast.Expression) -> ast.Expression:
+        """An optimized version of tree, which must be type checked. tree itself can change too."""
+        before = _count(tree)
+        self._unfolds = self.unfold
+        tree = self._optimize(tree, {})
+        self.removed += before - _count(tree)
+        return tree
+
+    def specialize(self, tree: ast.Expression, known: EvaluationScope) -> ast.Expression:
+        """A tree for what's left of type checked tree once the names in known have their values.
+
+        tree isn't changed. Names in known whose values aren't Values, like functions, stay names.
+        """
+        values = {name: value for name, value in known.items() if isinstance(value, Value) and name in tree.names}
+        residual = self.optimize(_copy(tree, values))
+        for node in residual.walk():
+            if isinstance(node, ast.Function):
+                # Patterns might be constant now, and anything compiled is for the old tree.
+                node.dispatch = ast.Dispatch(node.pieces)
+                node._compiled_pieces = None
+                node.cache = None
+        return residual
+
+    def _optimize(self, node: ast.Node, scope: typing.Dict[str, object]) -> ast.Node:
+        """Optimize node, where scope has what each name refers to: a let, an argument or an _Inlinable."""
+        if isinstance(node, Value):
+            return node
+        children = []
+        for child, binders in _bindings(node):
+            inner_scope = scope
+            if binders:
+                inner_scope = dict(scope)
+                inner_scope.update({binder.name: self._binding(binder, scope) for binder in binders})
+            children.append(self._optimize(child, inner_scope))
+        if any(new is not old for new, old in zip(children, node._children)):
+            node._children = tuple(children)
+            node.names = _names(node)
+
+        if isinstance(node, ast.FunctionCall):
+            value = self._call(node, scope)
+            if value is not None:
+                self.folded += 1
+                return value
+            inlined = self._inline(node, scope)
+            if inlined is not None:
+                self.inlined += 1
+                return self._optimize(inlined, scope)
+
+        if isinstance(node, ast.IfElse) and isinstance(node._condition, ast.boolean.BooleanValue):
+            self.pruned += 1
+            return node._true if node._condition.value else node._false
+
+        if isinstance(node, ast.Block):
+            lets = node._lets
+            used = [let for let in lets if let.name in node._expression.names]
+            if len(used) < len(lets):
+                self.dropped += len(lets) - len(used)
+                if not used:
+                    return node._expression
+                block = ast.Block(used, node._expression)
+                block.type = node.type
+                node = block
+
+        if not node.names and not isinstance(node, (ast.Let, ast.Function, ast.FunctionPiece)) and \
+                isinstance(node, ast.Expression):
+            value = self._evaluate(node)
+            if value is not None:
+                self.folded += 1
+                return value
+        return node
+
+    def _binding(self, binder: ast.Node, scope: typing.Dict[str, object]) -> object:
+        """What binder's name refers to inside it, given what names refer to outside it."""
+        if not isinstance(binder, ast.Let) or not isinstance(binder.expression, ast.Function):
+            return binder
+        return _Inlinable(binder, {name: scope.get(name) for name in binder.expression.names - {binder.name}})
+
+    @staticmethod
+    def _function(call: ast.FunctionCall, scope: typing.Dict[str, object]) -> typing.Optional[_Inlinable]:
+        """The let bound function that call calls, if it's the one it refers to where it was defined."""
+        function = call._function_expression
+        inlinable = scope.get(function.name) if isinstance(function, ast.Reference) else None
+        if not isinstance(inlinable, _Inlinable) or \
+                any(scope.get(name) is not binding for name, binding in inlinable.captured.items()):
+            # Not a let bound function, or something here hides a name it uses.
+            return None
+        return inlinable
+
+    def _call(self, call: ast.FunctionCall, scope: typing.Dict[str, object]) -> typing.Optional[Value]:
+        """The value of call if everything it depends on is known and evaluating calls is allowed."""
+        if not self.calls or not all(isinstance(argument, Value) for argument in call._arguments):
+            return None
+        if not call.names:
+            return self._evaluate(call, calls=True)
+        inlinable = self._function(call, scope)
+        if inlinable is None or call.names != {inlinable.let.name} or \
+                inlinable.function.names - {inlinable.let.name}:
+            return None
+        # Evaluate it with just the function it calls in scope.
+        let = ast.Let(inlinable.let.name, inlinable.let.specified_type, inlinable.function)
+        let.type = inlinable.let.type
+        block = ast.Block([let], call)
+        block.type = call.type
+        return self._evaluate(block, calls=True)
+
+    def _inline(self, call: ast.FunctionCall, scope: typing.Dict[str, object]) -> typing.Optional[ast.Expression]:
+        """The body of the function call calls with its arguments in, or None if it can't be inlined."""
+        inlinable = self._function(call, scope)
+        if inlinable is None or len(inlinable.function.pieces[0].arguments) != len(call._arguments):
+            return None
+        piece = _select(inlinable.function, call._arguments)
+        if piece is None or _count(piece.expression) > self.inline:
+            return None
+        if inlinable.recursive:
+            # Only unfold recursive functions when some arguments are known, they might be what ends the recursion.
+            if not self._unfolds or not any(isinstance(argument, Value) for argument in call._arguments):
+                return None
+            self._unfolds -= 1
+        parameters = piece.arguments
+        body = piece.expression
+        bound = {node.name for node in body.walk() if isinstance(node, (ast.Let, ast.FunctionArgument))}
+        # Steph is pure, so when the body uses an argument once it can just as well be evaluated there.
+        arguments = {parameter.name: argument for parameter, argument in zip(parameters, call._arguments)
+                     if (isinstance(argument, (Value, ast.Reference)) or _uses(body, parameter.name) < 2) and
+                     not argument.names & bound}
+        substituted = union(argument.names for argument in arguments.values())
+        lets = []
+        for parameter, argument in zip(parameters, call._arguments):
+            if parameter.name in arguments:
+                continue
+            # Lets can't see each other, so the others are evaluated as they were at the call. A let can see itself
+            # though, and the arguments that go straight into the body can't see these lets either, so if they use
+            # the parameter's name it's bound to a name that can't be in the source.
+            name = parameter.name
+            if name in argument.names or name in substituted:
+                name = "%s'%d" % (name, len(lets))
+            let = ast.Let(name, None, argument)
+            let.type = argument.type
+            lets.append(let)
+            arguments[parameter.name] = _reference(name, parameter.type)
+        expression = _copy(body, arguments)
+        if not lets:
+            return expression
+        block = ast.Block(lets, expression)
+        block.type = expression.type
+        return block
+
+    @staticmethod
+    def _evaluate(node: ast.Expression, calls: bool = False) -> typing.Optional[Value]:
+        """The value of closed expression node, or None if it can't be worked out here."""
+        if not calls and any(isinstance(child, ast.FunctionCall) for child in node.walk()):
+            return None
+        try:
+            node.resolve_root()
+            value = node.interpret({})
+        except Exception:
+            return None
+        return value if isinstance(value, Value) else None
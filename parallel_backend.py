@@ -0,0 +1,322 @@
+"""An evaluator that runs the expensive lets of a block in parallel.
+
+Steph is pure and the lets in a block can't see each other, only the names
+around the block, so all of a block's lets can be evaluated at the same time.
+When more than one of a block's lets is expensive they go to a pool of worker
+processes, the rest are evaluated inline while the workers run.
+
+A let's cost is estimated from its tree, counting the body of each function it
+calls, when the function is bound by a let and doesn't call itself, and it's
+expensive if that's at least threshold. When it calls functions that aren't
+known until it runs, like recursive ones, it's evaluated inline and timed, and
+it's expensive once it's taken at least _SLOW seconds.
+
+Each worker is sent the program, in the format from serialization.py, the
+first time it runs one of its lets, and after that just the let and the
+values of the slots it reads. Values and functions defined in the program can
+be sent, when a let needs anything else it's evaluated inline. Everything else
+is evaluated by walking the tree, like interpret().
+"""
+
+import atexit
+import collections
+import concurrent.futures
+import functools
+import os
+import time
+import typing
+import uuid
+
+import ast
+import ast.literals
+import serialization
+from ast.base import EvaluationScope, Frame
+
+__all__ = ['Evaluator']
+
+# The work a call does besides evaluating the function's body.
+_CALL_COST = 10
+# The estimated cost at which a let is worth sending to a worker.
+_THRESHOLD = 1000
+# The time a let whose cost can't be estimated has to take to be worth sending to a worker, in seconds.
+_SLOW = 0.002
+# Trees each worker keeps loaded.
+_WORKER_TREES = 16
+
+# What a name refers to while estimating costs: a function bound by a let with the names around the let, or None if
+# what it is isn't known until the program runs.
+_Binding = typing.Optional[typing.Tuple[ast.Function, typing.Dict[str, typing.Any]]]
+
+
+def _scopes(node: ast.Node, scope: typing.Dict[str, _Binding]) -> typing.Iterator[tuple]:
+    """node's children, each with what the names in scope for it refer to."""
+    if isinstance(node, ast.Let):
+        # Only a recursive function refers to its own let, and what that costs depends on the arguments.
+        yield node.expression, dict(scope, **{node.name: None})
+    elif isinstance(node, ast.Block):
+        inner = dict(scope)
+        for let in node._lets:
+            yield let, scope
+            function = let.expression
+            recursive = not isinstance(function, ast.Function) or let.name in function.names
+            inner[let.name] = None if recursive else (function, scope)
+        yield node._expression, inner
+    elif isinstance(node, ast.FunctionPiece):
+        for argument in node.arguments:
+            yield argument, scope
+        yield node.expression, dict(scope, **{argument.name: None for argument in node.arguments})
+    else:
+        for child in node._children:
+            yield child, scope
+
+
+class _Costs:
+    """Estimates of the work evaluating each let in a tree does, None where that can't be estimated."""
+
+    def __init__(self, tree: ast.Expression):
+        self.lets = {}  # type: typing.Dict[ast.Let, typing.Optional[int]]
+        self._bodies = {}  # type: typing.Dict[int, typing.Optional[int]]
+        # Estimates of every node estimated so far, lets inside lets are estimated along with the outer one.
+        self._nodes = {}  # type: typing.Dict[int, typing.Optional[int]]
+        pending = [(tree, {})]
+        while pending:
+            node, scope = pending.pop()
+            for child, child_scope in _scopes(node, scope):
+                if isinstance(node, ast.Let):
+                    self.lets[node] = self.estimate(child, child_scope)
+                pending.append((child, child_scope))
+
+    def estimate(self, node: ast.Node, scope: typing.Dict[str, _Binding]) -> typing.Optional[int]:
+        """A rough estimate of the work evaluating node does."""
+        if id(node) not in self._nodes:
+            self._nodes[id(node)] = self._estimate(node, scope)
+        return self._nodes[id(node)]
+
+    def _estimate(self, node: ast.Node, scope: typing.Dict[str, _Binding]) -> typing.Optional[int]:
+        if isinstance(node, ast.Function):
+            # Only makes a closure, the body runs when it's called.
+            return 1
+        total = 1
+        if isinstance(node, ast.FunctionCall):
+            function = node._function_expression
+            binding = scope.get(function.name) if isinstance(function, ast.Reference) else None
+            body = self._body(*binding) if binding is not None else None
+            total = None if body is None else total + _CALL_COST + body
+        # Every child is estimated even when the total isn't known, so the lets inside it are only estimated once.
+        for child, child_scope in _scopes(node, scope):
+            cost = self.estimate(child, child_scope)
+            total = None if total is None or cost is None else total + cost
+        return total
+
+    def _body(self, function: ast.Function, scope: typing.Dict[str, _Binding]) -> typing.Optional[int]:
+        """The most work a call to function does, scope being the names around the let that binds it."""
+        if id(function) not in self._bodies:
+            costs = [self.estimate(piece, scope) for piece in function.pieces]
+            self._bodies[id(function)] = None if None in costs else max(costs)
+        return self._bodies[id(function)]
+
+
+def cost(node: ast.Node) -> typing.Optional[int]:
+    """A rough estimate of the work evaluating root node does, or None if it calls functions that aren't known."""
+    return _Costs(node).estimate(node, {})
+
+
+def _slots_read(node: ast.Node) -> typing.Set[int]:
+    """The slots of the frame node is evaluated in that it reads."""
+    slots = set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, ast.Reference):
+            slots.add(node.slot)
+        elif isinstance(node, ast.Function):
+            # Its body reads its own frame.
+            slots.update(node.captures)
+            continue
+        stack.extend(node._children)
+    return slots
+
+
+class _Unsendable(Exception):
+    pass
+
+
+class _FunctionReference:
+    """A BoundFunction in a message, by its position in the message's functions."""
+    __slots__ = ('index',)
+
+    def __init__(self, index: int):
+        self.index = index
+
+    def __reduce__(self):
+        return _FunctionReference, (self.index,)
+
+
+class _Codec:
+    """Turns values into messages a worker can rebuild, naming functions by their position in the tree."""
+
+    def __init__(self, tree: ast.Expression):
+        self.nodes = list(tree.walk())
+        self.indices = {id(node): i for i, node in enumerate(self.nodes)}
+
+    def encode(self, values: list) -> tuple:
+        functions = []
+        seen = {}
+
+        def encode(value):
+            if value is None or isinstance(value, ast.literals.Value):
+                return value
+            if type(value) is not ast.BoundFunction or id(value.function) not in self.indices:
+                raise _Unsendable()
+            index = seen.get(id(value))
+            if index is None:
+                index = seen[id(value)] = len(functions)
+                functions.append(None)
+                functions[index] = (self.indices[id(value.function)], [encode(item) for item in value.closure])
+            return _FunctionReference(index)
+
+        return [encode(value) for value in values], functions
+
+    def decode(self, message: tuple) -> list:
+        values, functions = message
+        bound = [ast.BoundFunction(self.nodes[index], [None] * len(closure)) for index, closure in functions]
+
+        def decode(value):
+            return bound[value.index] if isinstance(value, _FunctionReference) else value
+
+        for bound_function, (_, closure) in zip(bound, functions):
+            bound_function.closure[:] = [decode(item) for item in closure]
+        return [decode(value) for value in values]
+
+
+# In worker processes, codecs for the trees they've been sent by their keys.
+_codecs = collections.OrderedDict()  # type: typing.Dict[str, _Codec]
+
+
+def _run_let(key: str, data: typing.Optional[bytes], index: int, size: int, slots: typing.List[int],
+             message: tuple) -> typing.Optional[typing.Tuple[float, tuple]]:
+    """Evaluate a let in a worker, returning how long it took and its value. Returns None when the worker needs to
+    be sent the tree as data."""
+    codec = _codecs.get(key)
+    if codec is None:
+        if data is None:
+            return None
+        codec = _codecs[key] = _Codec(serialization.loads(data))
+        if len(_codecs) > _WORKER_TREES:
+            _codecs.popitem(last=False)
+    else:
+        _codecs.move_to_end(key)
+    frame = [None] * size
+    for slot, value in zip(slots, codec.decode(message)):
+        frame[slot] = value
+    start = time.perf_counter()
+    value = codec.nodes[index].run(frame)
+    return time.perf_counter() - start, codec.encode([value])
+
+
+@functools.lru_cache(maxsize=None)
+def _pool() -> concurrent.futures.ProcessPoolExecutor:
+    # Shared by every Evaluator, workers load the trees they're sent.
+    pool = concurrent.futures.ProcessPoolExecutor(os.cpu_count() or 1)
+    atexit.register(pool.shutdown)
+    return pool
+
+
+class Evaluator:
+    """evaluate() for a tree, evaluating its blocks' expensive lets in parallel."""
+
+    def __init__(self, tree: ast.Expression, threshold: int = _THRESHOLD):
+        self.tree = tree
+        self.threshold = threshold
+        # Lets evaluated by workers.
+        self.sent = 0
+        self._key = uuid.uuid4().hex
+        self._data = serialization.dumps(tree)
+        self._codec = _Codec(tree)
+        self._classes = {}  # type: typing.Dict[type, type]
+        self._costs = _Costs(tree).lets
+        # How long lets whose cost can't be estimated took the last time they were evaluated.
+        self._times = {}  # type: typing.Dict[ast.Let, float]
+        # The lets that might be sent to workers, and the slots they read, of each block that's parallelized.
+        self._heavy = {}  # type: typing.Dict[int, typing.Dict[ast.Let, typing.List[int]]]
+        for node in self._codec.nodes:
+            if isinstance(node, ast.Block):
+                heavy = {let: sorted(_slots_read(let.expression)) for let in node._lets
+                         if self._costs[let] is None or self._costs[let] >= threshold}
+                if len(heavy) > 1:
+                    self._heavy[id(node)] = heavy
+                    self._parallelize(node)
+
+    def _parallelize(self, block: ast.Block):
+        cls = type(block)
+        parallel = self._classes.get(cls)
+        if parallel is None:
+            evaluator = self
+
+            def _bind(self, frame):
+                evaluator.bind(self, frame)
+
+            # No __slots__ of its own, so the block can change to it.
+            parallel = self._classes[cls] = type('Parallel' + cls.__name__, (cls,), {'__slots__': (), '_bind': _bind})
+        block.__class__ = parallel
+
+    def _expensive(self, let: ast.Let) -> bool:
+        if self._costs[let] is not None:
+            return True
+        return self._times.get(let, 0) >= _SLOW
+
+    def bind(self, block: ast.Block, frame: Frame):
+        """Evaluate block's lets and put their values in frame."""
+        codec = self._codec
+        heavy = self._heavy[id(block)]
+        messages = []
+        inline = []
+        for let in block._lets:
+            slots = heavy.get(let)
+            if slots is None or not self._expensive(let):
+                inline.append(let)
+                continue
+            try:
+                message = codec.encode([frame[slot] for slot in slots])
+            except _Unsendable:
+                inline.append(let)
+                continue
+            messages.append((let, (codec.indices[id(let.expression)], len(frame), slots, message)))
+        if len(messages) < 2:
+            # One let isn't worth sending, it can't run alongside another.
+            inline = block._lets
+            messages = []
+        submitted = [(let, arguments, _pool().submit(_run_let, self._key, None, *arguments))
+                     for let, arguments in messages]
+        values = [(let, self._run(let, frame)) for let in inline]
+        futures = []
+        for let, arguments, future in submitted:
+            if future.result() is None:
+                # The worker that ran it hadn't loaded the tree.
+                future = _pool().submit(_run_let, self._key, self._data, *arguments)
+            futures.append((let, future))
+        for let, future in futures:
+            elapsed, message = future.result()
+            if self._costs[let] is None:
+                # So a let that's cheap this time goes back to being evaluated inline.
+                self._times[let] = elapsed
+            try:
+                value = codec.decode(message)[0]
+            except _Unsendable:
+                # The worker couldn't send the value back.
+                value = let.run(frame)
+            values.append((let, value))
+        self.sent += len(futures)
+        for let, value in values:
+            let.bind(frame, value)
+
+    def _run(self, let: ast.Let, frame: Frame) -> ast.Expression:
+        if self._costs[let] is not None:
+            return let.run(frame)
+        start = time.perf_counter()
+        value = let.run(frame)
+        self._times[let] = time.perf_counter() - start
+        return value
+
+    def __call__(self, scope: EvaluationScope) -> ast.Expression:
+        return self.tree.interpret(scope)
@@ -0,0 +1,168 @@
+"""An on-disk cache of parsed and type checked programs.
+
+parse(..., cache=ParseCache(directory)) loads the tree for a source it has seen
+before instead of parsing and type checking it again, so a new process doesn't
+pay for PLY and initialize_type() on every program.
+
+Entries are keyed by a hash of the source, the TypeScope and a stamp of the
+interpreter, made from the Python version and Steph's own source files. When
+any of them changes the old entries can't be found any more, and the size
+bound evicts them. Entries are in the format from serialization.py, loaded
+through a memory map, and are written atomically so processes can share a
+directory.
+
+The cache never makes a parse fail: a directory that can't be written, like a
+read-only one, is read from but not added to.
+"""
+
+import functools
+import glob
+import hashlib
+import os
+import sys
+import tempfile
+import typing
+
+import ast
+import serialization
+from ast.base import TypeScope
+
+__all__ = ['ParseCache', 'version_stamp']
+
+_SUFFIX = '.tree'
+
+
+@functools.lru_cache(maxsize=None)
+def version_stamp() -> str:
+    """A hash of the Python version and the source of the interpreter."""
+    root = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256(sys.version.encode())
+    for path in sorted(glob.glob(os.path.join(root, '*.py')) + glob.glob(os.path.join(root, 'ast', '*.py'))):
+        digest.update(os.path.relpath(path, root).encode())
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class ParseCache:
+    def __init__(self, directory: str, max_entries: int = None, max_bytes: int = None, stamp: str = None):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.stamp = stamp or version_stamp()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError:
+            # Every load misses and every store does nothing.
+            pass
+
+    def key(self, source: str, scope: TypeScope) -> str:
+        digest = hashlib.sha256(self.stamp.encode())
+        for name, name_type in sorted(scope.items()):
+            digest.update(('\0%s\0%s' % (name, name_type)).encode())
+        digest.update(b'\0\0')
+        digest.update(source.encode())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def load(self, source: str, scope: TypeScope) -> typing.Optional[ast.Expression]:
+        """The tree for source in scope, ready to evaluate, or None if it isn't cached."""
+        path = self._path(self.key(source, scope))
+        try:
+            tree = serialization.load(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception:
+            # Truncated or unreadable, parse it again and replace it.
+            self._remove(path)
+            self.misses += 1
+            return None
+        try:
+            # Loading counts as using it, for eviction.
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return tree
+
+    def store(self, source: str, scope: TypeScope, tree: ast.Expression):
+        """Remember tree, which must be type checked, for source in scope."""
+        data = serialization.dumps(tree)
+        if self.max_bytes is not None and len(data) > self.max_bytes:
+            return
+        try:
+            descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        except OSError:
+            return
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                f.write(data)
+            os.replace(temporary_path, self._path(self.key(source, scope)))
+        except OSError:
+            self._remove(temporary_path)
+            return
+        except BaseException:
+            self._remove(temporary_path)
+            raise
+        self._evict()
+
+    def _entries(self) -> typing.List[typing.Tuple[float, int, str]]:
+        """(last used, size, path) of each entry."""
+        entries = []
+        try:
+            directory = list(os.scandir(self.directory))
+        except OSError:
+            return entries
+        for entry in directory:
+            if entry.name.endswith(_SUFFIX):
+                try:
+                    status = entry.stat()
+                except OSError:
+                    continue
+                entries.append((status.st_mtime, status.st_size, entry.path))
+        return entries
+
+    def _evict(self):
+        if self.max_entries is None and self.max_bytes is None:
+            return
+        entries = sorted(self._entries())
+        count = len(entries)
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if (self.max_entries is None or count <= self.max_entries) and \
+                    (self.max_bytes is None or total <= self.max_bytes):
+                break
+            self._remove(path)
+            count -= 1
+            total -= size
+            self.evictions += 1
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def __len__(self):
+        return len(self._entries())
+
+    def bytes(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def clear(self):
+        for _, _, path in self._entries():
+            self._remove(path)
+
+    def stats(self) -> typing.Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': len(self), 'bytes': self.bytes()}
+
+    def __repr__(self):
+        return 'ParseCache<%s>' % ', '.join('%s=%d' % item for item in sorted(self.stats().items()))
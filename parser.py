@@ -1,14 +1,29 @@
+import collections
+import contextlib
+import copy
+import functools
 import os
+import sys
+import threading
+import typing
 
 import ast
 import ast.boolean
 import ast.lists
 import ast.number
 import ast.string
+import lexer
 import typesystem
+import ply.lex as lex
 import ply.yacc as yacc
 
-from ast.base import TypeScope, ParseException
+from ast.base import TypeScope, EvaluationScope, ParseException
+
+if typing.TYPE_CHECKING:
+    # Only imported when they're used, they aren't needed to parse.
+    import memoization
+    import optimizer
+    import parse_cache
 # noinspection PyUnresolvedReferences
 from lexer import tokens  # need to have `tokens` in this module's scope for PLY to do its magic
 
@@ -30,7 +45,9 @@ def p_type_list_type(p):
 
 def p_type_list_recurse(p):
     """type_list : type_list "," type"""
-    p[0] = p[1] + [p[3]]
+    # Lists are extended in place here and in the other recursive rules, copying them makes parsing quadratic.
+    p[1].append(p[3])
+    p[0] = p[1]
 
 
 def p_type_list_opt_empty(p):
@@ -93,7 +110,8 @@ def p_lets_empty(p):
 
 def p_lets_recurse(p):
     """lets : lets let"""
-    p[0] = p[1] + [p[2]]
+    p[1].append(p[2])
+    p[0] = p[1]
 
 
 def p_expression_arithmetic(p):
@@ -152,7 +170,8 @@ def p_function_call_arguments_expression(p):
 
 def p_function_call_arguments_recurse(p):
     """function_call_arguments : function_call_arguments "," expression"""
-    p[0] = p[1] + [p[3]]
+    p[1].append(p[3])
+    p[0] = p[1]
 
 
 def p_function_call_arguments_opt_none(p):
@@ -193,7 +212,8 @@ def p_function_arguments_one(p):
 
 def p_function_arguments_recurse(p):
     """function_arguments : function_arguments "," function_argument"""
-    p[0] = p[1] + [p[3]]
+    p[1].append(p[3])
+    p[0] = p[1]
 
 
 def p_function_arguments_opt_none(p):
@@ -218,7 +238,8 @@ def p_function_definition(p):
 
 def p_function_definition_recurse(p):
     """function_definition : function_definition ',' function_definition_piece"""
-    p[0] = p[1] + [p[3]]
+    p[1].append(p[3])
+    p[0] = p[1]
 
 
 def p_expression_function_definition(p):
@@ -248,7 +269,8 @@ def p_list_elements_expression(p):
 
 def p_list_elements_recursive(p):
     """list_elements : list_elements ',' expression"""
-    p[0] = p[1] + [p[3]]
+    p[1].append(p[3])
+    p[0] = p[1]
 
 
 def p_expression_list_empty(p):
@@ -270,14 +292,203 @@ def p_error(p):
         print("Syntax error at EOF")
 
 
-output_directory = os.path.join(os.path.dirname(__file__), 'generated')
-os.makedirs(output_directory, exist_ok=True)
-yacc.yacc(start='expression', outputdir=output_directory)
+# The parse tables are generated ahead of time by running this module and checked in as parser_tables.py.
+# If they're missing or out of date PLY builds them in memory instead, so the source tree is never written to.
+tables_module = 'parser_tables'
+
+
+def _build_parser(write_tables: bool = False) -> yacc.LRParser:
+    return yacc.yacc(module=sys.modules[__name__], start='expression', tabmodule=tables_module,
+                     outputdir=os.path.dirname(os.path.abspath(__file__)), write_tables=write_tables,
+                     debug=False)
+
+
+@functools.lru_cache(maxsize=None)
+def _prototype() -> typing.Tuple[yacc.LRParser, lex.Lexer]:
+    """A parser and lexer to copy, built the first time something is parsed."""
+    return _build_parser(), lexer.build()
 
 
-def parse(source: str, scope: TypeScope = None, **kwargs) -> ast.Expression:
-    # noinspection PyUnresolvedReferences
-    parsed = yacc.parse(source, **kwargs)  # type: ast.Expression
-    assert parsed is not None
-    parsed.initialize_type(scope or {})
-    return parsed
+def _native(tree: ast.Expression):
+    # c_backend pulls in ctypes and subprocess, so it's only imported when it's used.
+    import c_backend
+    return c_backend.NativeProgram(tree).evaluate
+
+
+def _stack(tree: ast.Expression):
+    import stack_backend
+    return functools.partial(stack_backend.evaluate, tree)
+
+
+def _lazy(tree: ast.Expression):
+    import lazy_backend
+    return functools.partial(lazy_backend.evaluate, tree)
+
+
+def _parallel(tree: ast.Expression):
+    # parallel_backend pulls in concurrent.futures, uuid and serialization, so it's only imported when it's used.
+    import parallel_backend
+    return parallel_backend.Evaluator(tree)
+
+
+# Ways of evaluating a parsed tree, chosen by parse(..., evaluator=name).
+evaluators = {
+    # Walk the tree with Expression.interpret().
+    'tree': lambda tree: tree.interpret,
+    # Evaluate through a tree of closures.
+    'compiled': lambda tree: tree.compile(),
+    # Run as native code if the program is in the supported subset, walk the tree otherwise.
+    'native': lambda tree: _native(tree),
+    # Walk the tree with an explicit stack, so deep recursion doesn't overflow the Python stack.
+    'stack': lambda tree: _stack(tree),
+    # Call by need: lets and arguments are only evaluated when they're used.
+    'lazy': lambda tree: _lazy(tree),
+    # Walk the tree, evaluating blocks' expensive lets in worker processes at the same time.
+    'parallel': lambda tree: _parallel(tree),
+}
+
+
+class _PlyParser:
+    """PLY's parser with its own lexer and parser state, sharing the parse tables."""
+
+    def __init__(self):
+        prototype_parser, prototype_lexer = _prototype()
+        # LRParser keeps its stacks on the instance and only reads the tables.
+        self.parser = copy.copy(prototype_parser)
+        self.lexer = prototype_lexer.clone()
+
+    def parse(self, source: str, **kwargs) -> ast.Expression:
+        self.lexer.lineno = 1
+        return self.parser.parse(source, lexer=self.lexer, **kwargs)
+
+
+def _pratt():
+    import pratt
+    return pratt.Parser()
+
+
+# Ways of turning source into a tree, chosen by parse(..., backend=name).
+backends = {
+    # The LALR parser PLY builds from the grammar in this module.
+    'ply': _PlyParser,
+    # A hand-written precedence climbing parser for the same grammar, faster than PLY.
+    'pratt': _pratt,
+}
+
+
+class Parser:
+    """Parses Steph source.
+
+    Each Parser has its own lexer and parser state, so it's cheap to make one
+    per thread. A Parser can only parse one source at a time.
+    """
+
+    def __init__(self, backend: str = 'ply'):
+        self.backend = backend
+        self._make_syntax = backends[backend]
+        # Made on first use, programs loaded from a ParseCache don't need it.
+        self._syntax = None
+
+    def syntax_tree(self, source: str, **kwargs) -> ast.Expression:
+        """The tree for source, before its types are checked and its names resolved."""
+        if self._syntax is None:
+            self._syntax = self._make_syntax()
+        parsed = self._syntax.parse(source, **kwargs)  # type: ast.Expression
+        assert parsed is not None
+        return parsed
+
+    def parse(self, source: str, scope: TypeScope = None, evaluator: str = 'tree',
+              memoize: 'memoization.FunctionCache' = None, cache: 'parse_cache.ParseCache' = None,
+              optimize: 'optimizer.Optimizer' = None, share: bool = False, **kwargs) -> ast.Expression:
+        scope = scope or {}
+        if optimize is not None or share:
+            # The cache only holds trees as they're parsed.
+            cache = None
+        parsed = cache.load(source, scope) if cache is not None else None
+        if parsed is None:
+            parsed = self.syntax_tree(source, **kwargs)
+            parsed.initialize_type(scope)
+            if optimize is not None:
+                parsed = optimize.optimize(parsed)
+            parsed.quicken()
+            parsed.resolve_root()
+            if share:
+                import sharing
+                sharing.common_subexpressions(parsed)
+                parsed.resolve_root()
+                sharing.share(parsed)
+            if cache is not None:
+                cache.store(source, scope, parsed)
+        if memoize is not None:
+            import memoization
+            memoization.memoize(parsed, memoize)
+        if evaluator != 'tree':
+            parsed.use_evaluator(evaluators[evaluator](parsed))
+        return parsed
+
+
+class ParserPool:
+    """Parsers for many threads to share.
+
+    parse() takes an idle Parser for the backend, or makes a new one if they're
+    all busy, and puts it back when it's done. At most max_idle Parsers are kept
+    around for each backend.
+    """
+
+    def __init__(self, max_idle: int = None):
+        self.max_idle = max_idle
+        self._idle = collections.defaultdict(list)  # type: typing.Dict[str, typing.List[Parser]]
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def parser(self, backend: str = 'ply') -> typing.Iterator[Parser]:
+        with self._lock:
+            idle = self._idle[backend]
+            parser = idle.pop() if idle else None
+        if parser is None:
+            parser = Parser(backend)
+        try:
+            yield parser
+        finally:
+            with self._lock:
+                if self.max_idle is None or len(idle) < self.max_idle:
+                    idle.append(parser)
+
+    def parse(self, source: str, *args, backend: str = 'ply', **kwargs) -> ast.Expression:
+        with self.parser(backend) as parser:
+            return parser.parse(source, *args, **kwargs)
+
+
+_pool = ParserPool()
+
+
+def parse(source: str, scope: TypeScope = None, evaluator: str = 'tree',
+          memoize: 'memoization.FunctionCache' = None, cache: 'parse_cache.ParseCache' = None,
+          optimize: 'optimizer.Optimizer' = None, share: bool = False, backend: str = 'ply',
+          **kwargs) -> ast.Expression:
+    """Parse with a Parser from a shared pool. Safe to call from many threads at once."""
+    return _pool.parse(source, scope, evaluator, memoize, cache, optimize, share, backend=backend, **kwargs)
+
+
+def specialize(tree: ast.Expression, known: EvaluationScope, evaluator: str = 'tree',
+               optimize: 'optimizer.Optimizer' = None) -> ast.Expression:
+    """A tree for what's left of a parsed tree once the names in known have their values.
+
+    The tree has to be parsed with the types of every name, known or not. The result is evaluated with the values
+    of the rest. By default known values are folded in, calls whose arguments pick a piece of a function are
+    inlined, and calls whose functions and arguments are all known are evaluated, here, so they might not finish.
+    """
+    if optimize is None:
+        import optimizer
+        optimize = optimizer.Optimizer(inline=100, unfold=100, calls=True)
+    residual = optimize.specialize(tree, known)
+    residual.quicken()
+    residual.resolve_root()
+    if evaluator != 'tree':
+        residual.use_evaluator(evaluators[evaluator](residual))
+    return residual
+
+
+if __name__ == '__main__':
+    # Regenerate parser_tables.py after changing the grammar.
+    _build_parser(write_tables=True)
@@ -0,0 +1,82 @@
+
+# parser_tables.py
+# This file is automatically generated. Do not edit.
+# pylint: disable=W,C,R
+_tabversion = '3.10'
+
+_lr_method = 'LALR'
+
+_lr_signature = 'expressionleft+-left+-left*/rightUMINUSright(ARROW ELSE EQ FALSE GE GT ID IF LE LET LT NEQ NUMBER RETURN STRING TRUE TYPENAMEtype_list : typetype_list : type_list "," typetype_list_opt :type_list_opt : type_listtype : "(" type_list_opt ")" ARROW typetype : TYPENAME \'(\' type \')\'type : TYPENAMEtype_spec : ":" typetype_spec_opt :type_spec_opt : type_speclet : LET ID type_spec_opt "=" expression ";" lets : lets : lets letexpression : expression \'+\' expression\n                  | expression \'-\' expression\n                  | expression \'*\' expression\n                  | expression \'/\' expressionexpression : \'-\' expression %prec UMINUSexpression : expression LT expression\n                  | expression GT expression\n                  | expression LE expression\n                  | expression GE expression\n                  | expression EQ expression\n                  | expression NEQ expression\n                  expression : \'(\' expression \')\'expression : NUMBERexpression : TRUEexpression : FALSEexpression : STRINGfunction_call_arguments : expressionfunction_call_arguments : function_call_arguments "," expressionfunction_call_arguments_opt : function_call_arguments_opt : function_call_argumentsfunction_call : expression "(" function_call_arguments_opt ")"expression : function_callfunction_argument : ID type_specfunction_argument : ID EQ expressionfunction_arguments : function_argumentfunction_arguments : function_arguments "," function_argumentfunction_arguments_opt : function_arguments_opt : function_argumentsfunction_definition_piece : "(" function_arguments_opt ")" ARROW expressionfunction_definition : function_definition_piecefunction_definition : function_definition \',\' function_definition_pieceexpression : function_definitionexpression : IDexpression : \'{\' lets RETURN expression \';\' \'}\'expression : IF \'(\' expression \')\' expression ELSE expressionlist_elements : expressionlist_elements : list_elements \',\' expressionexpression : \'[\' \']\'expression : \'[\' list_elements \']\''
+    
+_lr_action_items = {'-':([0,1,2,3,4,5,6,7,8,9,10,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,29,34,35,37,38,39,40,41,42,43,44,45,46,47,48,51,54,57,59,62,63,64,65,66,67,68,74,76,77,78,79,87,91,92,93,97,98,],[2,16,2,2,-26,-27,-28,-29,-35,-45,-46,2,-43,2,2,2,2,2,2,2,2,2,2,2,-18,16,-46,2,-51,16,-14,-15,-16,-17,16,16,16,16,16,16,16,-25,2,-44,2,16,-52,2,-34,2,2,16,16,2,16,16,16,16,-47,2,2,16,16,]),'(':([0,1,2,3,4,5,6,7,8,9,10,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,29,32,34,35,37,38,39,40,41,42,43,44,45,46,47,48,51,54,55,57,59,62,63,64,65,66,67,68,70,71,74,76,77,78,79,83,87,89,91,92,93,94,97,98,],[3,25,3,3,-26,-27,-28,-29,-35,-45,-46,34,3,-43,3,3,3,3,3,3,3,3,3,3,3,25,25,-46,58,3,-51,25,25,25,25,25,25,25,25,25,25,25,25,-25,3,70,-44,3,25,-52,3,-34,3,3,25,70,83,25,3,25,25,25,70,25,70,-47,3,3,70,25,25,]),'NUMBER':([0,2,3,13,15,16,17,18,19,20,21,22,23,24,25,34,54,59,64,66,67,76,92,93,],[4,4,4,4,4,4,4,4,4,4,4,4,4,4,4,4,4,4,4,4,4,4,4,4,]),'TRUE':([0,2,3,13,15,16,17,18,19,20,21,22,23,24,25,34,54,59,64,66,67,76,92,93,],[5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,5,]),'FALSE':([0,2,3,13,15,16,17,18,19,20,21,22,23,24,25,34,54,59,64,66,67,76,92,93,],[6,6,6,6,6,6,6,6,6,6,6,6,6,6,6,6,6,6,6,6,6,6,6,6,]),'STRING':([0,2,3,13,15,16,17,18,19,20,21,22,23,24,25,34,54,59,64,66,67,76,92,93,],[7,7,7,7,7,7,7,7,7,7,7,7,7,7,7,7,7,7,7,7,7,7,7,7,]),'ID':([0,2,3,13,15,16,17,18,19,20,21,22,23,24,25,34,54,56,58,59,61,64,66,67,76,92,93,],[10,10,29,10,10,10,10,10,10,10,10,10,10,10,10,10,10,73,73,10,75,10,10,10,10,10,10,]),'{':([0,2,3,13,15,16,17,18,19,20,21,22,23,24,25,34,54,59,64,66,67,76,92,93,],[11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,]),'IF':([0,2,3,13,15,16,17,18,19,20,21,22,23,24,25,34,54,59,64,66,67,76,92,93,],[12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,]),'[':([0,2,3,13,15,16,17,18,19,20,21,22,23,24,25,34,54,59,64,66,67,76,92,93,],[13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,13,]),'$end':([1,4,5,6,7,8,9,10,14,26,35,38,39,40,41,42,43,44,45,46,47,51,57,63,65,79,91,98,],[0,-26,-27,-28,-29,-35,-45,-46,-43,-18,-51,-14,-15,-16,-17,-19,-20,-21,-22,-23,-24,-25,-44,-52,-34,-42,-47,-48,]),'+':([1,4,5,6,7,8,9,10,14,26,27,29,35,37,38,39,40,41,42,43,44,45,46,47,48,51,57,62,63,65,68,74,77,78,79,87,91,97,98,],[15,-26,-27,-28,-29,-35,-45,-46,-43,-18,15,-46,-51,15,-14,-15,-16,-17,15,15,15,15,15,15,15,-25,-44,15,-52,-34,15,15,15,15,15,15,-47,15,15,]),'*':([1,4,5,6,7,8,9,10,14,26,27,29,35,37,38,39,40,41,42,43,44,45,46,47,48,51,57,62,63,65,68,74,77,78,79,87,91,97,98,],[17,-26,-27,-28,-29,-35,-45,-46,-43,-18,17,-46,-51,17,17,17,-16,-17,17,17,17,17,17,17,17,-25,-44,17,-52,-34,17,17,17,17,17,17,-47,17,17,]),'/':([1,4,5,6,7,8,9,10,14,26,27,29,35,37,38,39,40,41,42,43,44,45,46,47,48,51,57,62,63,65,68,74,77,78,79,87,91,97,98,],[18,-26,-27,-28,-29,-35,-45,-46,-43,-18,18,-46,-51,18,18,18,-16,-17,18,18,18,18,18,18,18,-25,-44,18,-52,-34,18,18,18,18,18,18,-47,18,18,]),'LT':([1,4,5,6,7,8,9,10,14,26,27,29,35,37,38,39,40,41,42,43,44,45,46,47,48,51,57,62,63,65,68,74,77,78,79,87,91,97,98,],[19,-26,-27,-28,-29,-35,-45,-46,-43,-18,19,-46,-51,19,-14,-15,-16,-17,19,19,19,19,19,19,19,-25,-44,19,-52,-34,19,19,19,19,19,19,-47,19,19,]),'GT':([1,4,5,6,7,8,9,10,14,26,27,29,35,37,38,39,40,41,42,43,44,45,46,47,48,51,57,62,63,65,68,74,77,78,79,87,91,97,98,],[20,-26,-27,-28,-29,-35,-45,-46,-43,-18,20,-46,-51,20,-14,-15,-16,-17,20,20,20,20,20,20,20,-25,-44,20,-52,-34,20,20,20,20,20,20,-47,20,20,]),'LE':([1,4,5,6,7,8,9,10,14,26,27,29,35,37,38,39,40,41,42,43,44,45,46,47,48,51,57,62,63,65,68,74,77,78,79,87,91,97,98,],[21,-26,-27,-28,-29,-35,-45,-46,-43,-18,21,-46,-51,21,-14,-15,-16,-17,21,21,21,21,21,21,21,-25,-44,21,-52,-34,21,21,21,21,21,21,-47,21,21,]),'GE':([1,4,5,6,7,8,9,10,14,26,27,29,35,37,38,39,40,41,42,43,44,45,46,47,48,51,57,62,63,65,68,74,77,78,79,87,91,97,98,],[22,-26,-27,-28,-29,-35,-45,-46,-43,-18,22,-46,-51,22,-14,-15,-16,-17,22,22,22,22,22,22,22,-25,-44,22,-52,-34,22,22,22,22,22,22,-47,22,22,]),'EQ':([1,4,5,6,7,8,9,10,14,26,27,29,35,37,38,39,40,41,42,43,44,45,46,47,48,51,57,62,63,65,68,73,74,77,78,79,87,91,97,98,],[23,-26,-27,-28,-29,-35,-45,-46,-43,-18,23,54,-51,23,-14,-15,-16,-17,23,23,23,23,23,23,23,-25,-44,23,-52,-34,23,54,23,23,23,23,23,-47,23,23,]),'NEQ':([1,4,5,6,7,8,9,10,14,26,27,29,35,37,38,39,40,41,42,43,44,45,46,47,48,51,57,62,63,65,68,74,77,78,79,87,91,97,98,],[24,-26,-27,-28,-29,-35,-45,-46,-43,-18,24,-46,-51,24,-14,-15,-16,-17,24,24,24,24,24,24,24,-25,-44,24,-52,-34,24,24,24,24,24,24,-47,24,24,]),')':([3,4,5,6,7,8,9,10,14,25,26,27,28,29,30,31,35,38,39,40,41,42,43,44,45,46,47,48,49,50,51,53,57,58,62,63,65,68,69,70,71,72,78,79,80,81,82,90,91,95,96,98,99,],[-40,-26,-27,-28,-29,-35,-45,-46,-43,-32,-18,51,52,-46,-41,-38,-51,-14,-15,-16,-17,-19,-20,-21,-22,-23,-24,-30,65,-33,-25,-36,-44,-40,76,-52,-34,-37,-8,-3,-7,-39,-31,-42,88,-1,-4,96,-47,-2,-6,-48,-5,]),']':([4,5,6,7,8,9,10,13,14,26,35,36,37,38,39,40,41,42,43,44,45,46,47,51,57,63,65,77,79,91,98,],[-26,-27,-28,-29,-35,-45,-46,35,-43,-18,-51,63,-49,-14,-15,-16,-17,-19,-20,-21,-22,-23,-24,-25,-44,-52,-34,-50,-42,-47,-48,]),',':([4,5,6,7,8,9,10,14,26,30,31,35,36,37,38,39,40,41,42,43,44,45,46,47,48,50,51,53,57,63,65,68,69,71,72,77,78,79,81,82,91,95,96,98,99,],[-26,-27,-28,-29,-35,32,-46,-43,-18,56,-38,-51,64,-49,-14,-15,-16,-17,-19,-20,-21,-22,-23,-24,-30,66,-25,-36,-44,-52,-34,-37,-8,-7,-39,-50,-31,-42,-1,89,-47,-2,-6,-48,-5,]),';':([4,5,6,7,8,9,10,14,26,35,38,39,40,41,42,43,44,45,46,47,51,57,63,65,74,79,91,97,98,],[-26,-27,-28,-29,-35,-45,-46,-43,-18,-51,-14,-15,-16,-17,-19,-20,-21,-22,-23,-24,-25,-44,-52,-34,84,-42,-47,100,-48,]),'ELSE':([4,5,6,7,8,9,10,14,26,35,38,39,40,41,42,43,44,45,46,47,51,57,63,65,79,87,91,98,],[-26,-27,-28,-29,-35,-45,-46,-43,-18,-51,-14,-15,-16,-17,-19,-20,-21,-22,-23,-24,-25,-44,-52,-34,-42,93,-47,-48,]),'RETURN':([11,33,60,100,],[-12,59,-13,-11,]),'LET':([11,33,60,100,],[-12,61,-13,-11,]),':':([29,73,75,],[55,55,55,]),'ARROW':([52,88,],[67,94,]),'TYPENAME':([55,70,83,89,94,],[71,71,71,71,71,]),'=':([69,71,75,85,86,96,99,],[-8,-7,-9,92,-10,-6,-5,]),'}':([84,],[91,]),}
+
+_lr_action = {}
+for _k, _v in _lr_action_items.items():
+   for _x,_y in zip(_v[0],_v[1]):
+      if not _x in _lr_action:  _lr_action[_x] = {}
+      _lr_action[_x][_k] = _y
+del _lr_action_items
+
+_lr_goto_items = {'expression':([0,2,3,13,15,16,17,18,19,20,21,22,23,24,25,34,54,59,64,66,67,76,92,93,],[1,26,27,37,38,39,40,41,42,43,44,45,46,47,48,62,68,74,77,78,79,87,97,98,]),'function_call':([0,2,3,13,15,16,17,18,19,20,21,22,23,24,25,34,54,59,64,66,67,76,92,93,],[8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,8,]),'function_definition':([0,2,3,13,15,16,17,18,19,20,21,22,23,24,25,34,54,59,64,66,67,76,92,93,],[9,9,9,9,9,9,9,9,9,9,9,9,9,9,9,9,9,9,9,9,9,9,9,9,]),'function_definition_piece':([0,2,3,13,15,16,17,18,19,20,21,22,23,24,25,32,34,54,59,64,66,67,76,92,93,],[14,14,14,14,14,14,14,14,14,14,14,14,14,14,14,57,14,14,14,14,14,14,14,14,14,]),'function_arguments_opt':([3,58,],[28,28,]),'function_arguments':([3,58,],[30,30,]),'function_argument':([3,56,58,],[31,72,31,]),'lets':([11,],[33,]),'list_elements':([13,],[36,]),'function_call_arguments_opt':([25,],[49,]),'function_call_arguments':([25,],[50,]),'type_spec':([29,73,75,],[53,53,86,]),'let':([33,],[60,]),'type':([55,70,83,89,94,],[69,81,90,95,99,]),'type_list_opt':([70,],[80,]),'type_list':([70,],[82,]),'type_spec_opt':([75,],[85,]),}
+
+_lr_goto = {}
+for _k, _v in _lr_goto_items.items():
+   for _x, _y in zip(_v[0], _v[1]):
+       if not _x in _lr_goto: _lr_goto[_x] = {}
+       _lr_goto[_x][_k] = _y
+del _lr_goto_items
+_lr_productions = [
+  ("S' -> expression","S'",1,None,None,None),
+  ('type_list -> type','type_list',1,'p_type_list_type','parser.py',35),
+  ('type_list -> type_list , type','type_list',3,'p_type_list_recurse','parser.py',40),
+  ('type_list_opt -> <empty>','type_list_opt',0,'p_type_list_opt_empty','parser.py',45),
+  ('type_list_opt -> type_list','type_list_opt',1,'p_type_list_opt_type_list','parser.py',50),
+  ('type -> ( type_list_opt ) ARROW type','type',5,'p_type_function','parser.py',55),
+  ('type -> TYPENAME ( type )','type',4,'p_type_with_parameter','parser.py',60),
+  ('type -> TYPENAME','type',1,'p_type_name','parser.py',70),
+  ('type_spec -> : type','type_spec',2,'p_type_spec','parser.py',78),
+  ('type_spec_opt -> <empty>','type_spec_opt',0,'p_type_spec_opt_none','parser.py',83),
+  ('type_spec_opt -> type_spec','type_spec_opt',1,'p_type_spec_opt_type_spec','parser.py',88),
+  ('let -> LET ID type_spec_opt = expression ;','let',6,'p_let','parser.py',93),
+  ('lets -> <empty>','lets',0,'p_lets_empty','parser.py',98),
+  ('lets -> lets let','lets',2,'p_lets_recurse','parser.py',103),
+  ('expression -> expression + expression','expression',3,'p_expression_arithmetic','parser.py',108),
+  ('expression -> expression - expression','expression',3,'p_expression_arithmetic','parser.py',109),
+  ('expression -> expression * expression','expression',3,'p_expression_arithmetic','parser.py',110),
+  ('expression -> expression / expression','expression',3,'p_expression_arithmetic','parser.py',111),
+  ('expression -> - expression','expression',2,'p_expression_uminus','parser.py',116),
+  ('expression -> expression LT expression','expression',3,'p_expression_comparison','parser.py',121),
+  ('expression -> expression GT expression','expression',3,'p_expression_comparison','parser.py',122),
+  ('expression -> expression LE expression','expression',3,'p_expression_comparison','parser.py',123),
+  ('expression -> expression GE expression','expression',3,'p_expression_comparison','parser.py',124),
+  ('expression -> expression EQ expression','expression',3,'p_expression_comparison','parser.py',125),
+  ('expression -> expression NEQ expression','expression',3,'p_expression_comparison','parser.py',126),
+  ('expression -> ( expression )','expression',3,'p_expression_group','parser.py',132),
+  ('expression -> NUMBER','expression',1,'p_expression_number','parser.py',137),
+  ('expression -> TRUE','expression',1,'p_expression_true','parser.py',142),
+  ('expression -> FALSE','expression',1,'p_expression_false','parser.py',147),
+  ('expression -> STRING','expression',1,'p_expression_string','parser.py',152),
+  ('function_call_arguments -> expression','function_call_arguments',1,'p_function_call_arguments_expression','parser.py',157),
+  ('function_call_arguments -> function_call_arguments , expression','function_call_arguments',3,'p_function_call_arguments_recurse','parser.py',162),
+  ('function_call_arguments_opt -> <empty>','function_call_arguments_opt',0,'p_function_call_arguments_opt_none','parser.py',167),
+  ('function_call_arguments_opt -> function_call_arguments','function_call_arguments_opt',1,'p_function_call_arguments_opt','parser.py',172),
+  ('function_call -> expression ( function_call_arguments_opt )','function_call',4,'p_function_call','parser.py',177),
+  ('expression -> function_call','expression',1,'p_expression_function_call','parser.py',183),
+  ('function_argument -> ID type_spec','function_argument',2,'p_function_argument_id_type','parser.py',188),
+  ('function_argument -> ID EQ expression','function_argument',3,'p_function_argument_expression','parser.py',193),
+  ('function_arguments -> function_argument','function_arguments',1,'p_function_arguments_one','parser.py',198),
+  ('function_arguments -> function_arguments , function_argument','function_arguments',3,'p_function_arguments_recurse','parser.py',203),
+  ('function_arguments_opt -> <empty>','function_arguments_opt',0,'p_function_arguments_opt_none','parser.py',208),
+  ('function_arguments_opt -> function_arguments','function_arguments_opt',1,'p_function_arguments_opt','parser.py',213),
+  ('function_definition_piece -> ( function_arguments_opt ) ARROW expression','function_definition_piece',5,'p_function_definition_piece','parser.py',218),
+  ('function_definition -> function_definition_piece','function_definition',1,'p_function_definition','parser.py',223),
+  ('function_definition -> function_definition , function_definition_piece','function_definition',3,'p_function_definition_recurse','parser.py',228),
+  ('expression -> function_definition','expression',1,'p_expression_function_definition','parser.py',233),
+  ('expression -> ID','expression',1,'p_expression_name','parser.py',238),
+  ('expression -> { lets RETURN expression ; }','expression',6,'p_expression_block','parser.py',243),
+  ('expression -> IF ( expression ) expression ELSE expression','expression',7,'p_expression_if_else','parser.py',248),
+  ('list_elements -> expression','list_elements',1,'p_list_elements_expression','parser.py',253),
+  ('list_elements -> list_elements , expression','list_elements',3,'p_list_elements_recursive','parser.py',258),
+  ('expression -> [ ]','expression',2,'p_expression_list_empty','parser.py',263),
+  ('expression -> [ list_elements ]','expression',3,'p_expression_list','parser.py',268),
+]
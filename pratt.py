@@ -0,0 +1,272 @@
+"""A hand-written lexer and precedence climbing parser for Steph.
+
+It accepts the same language as the PLY grammar in parser.py and builds the
+same ast nodes, including the way PLY settles the grammar's conflicts: binary
+operators use the precedence table from parser.py, comparisons have the lowest
+precedence and group to the right, calls bind tightest, and `if`, function
+bodies and patterns take as much of the expression after them as they can.
+A comma after a function piece always starts another piece.
+
+PLY calls a Python function per reduction and builds a YaccProduction for
+every rule, this calls one method per construct. Select it with
+parse(..., backend='pratt').
+"""
+
+import re
+import typing
+
+import ast
+import ast.boolean
+import ast.lists
+import ast.number
+import ast.string
+import lexer
+import typesystem
+from ast.base import ParseException
+
+__all__ = ['Parser', 'tokenize']
+
+# The lexer's rules in the order PLY tries them: function rules in the order they're defined, then string rules
+# longest first, then literal characters.
+_rules = [
+    ('ID', lexer.t_ID.__doc__),
+    ('TYPENAME', lexer.t_TYPENAME.__doc__),
+    ('NUMBER', lexer.t_NUMBER.__doc__),
+    ('ESCAPED', lexer.t_ESCAPED.__doc__),
+] + sorted([(name[2:], getattr(lexer, name)) for name in ('t_STRING', 't_ARROW', 't_LT', 't_GT', 't_LE', 't_GE',
+                                                          't_EQ', 't_NEQ')],
+           key=lambda rule: len(rule[1]), reverse=True) + [
+    ('literal', '[%s]' % re.escape(''.join(lexer.literals))),
+]
+_whitespace = '[%s\\n]' % re.escape(lexer.t_ignore)
+# Each match is one token and the whitespace and newlines before it, no rule starts with those. Anything else is
+# an illegal character.
+_token_pattern = re.compile('%s*(?:%s|(?P<error>(?!%s).))' % (
+    _whitespace, '|'.join('(?P<%s>%s)' % rule for rule in _rules), _whitespace), re.DOTALL)
+
+Token = typing.Tuple[str, typing.Any]
+
+_END = ('$end', None)
+
+
+def tokenize(source: str) -> typing.List[Token]:
+    """The (type, value) tokens in source, ending with ('$end', None)."""
+    tokens = []
+    append = tokens.append
+    keyword_tokens = lexer.keyword_tokens
+    for match in _token_pattern.finditer(source):
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'literal':
+            append((value, value))
+        elif kind == 'ID':
+            append((keyword_tokens.get(value, 'ID'), value))
+        elif kind == 'NUMBER':
+            append(('NUMBER', int(value)))
+        elif kind == 'error':
+            print("Illegal character '%s'" % value)
+        elif kind == 'ESCAPED':
+            raise ParseException('Unexpected escape %r' % value)
+        else:
+            append((kind, value))
+    append(_END)
+    return tokens
+
+
+# Precedence levels of binary operators from parser.py's table, and whether rules using them group to the right.
+# Tokens missing from the table, like comparisons, are level 0 and group to the right.
+_binary = {
+    '+': (1, False), '-': (1, False),
+    '*': (3, False), '/': (3, False),
+    'LT': (0, True), 'GT': (0, True), 'LE': (0, True), 'GE': (0, True), 'EQ': (0, True), 'NEQ': (0, True),
+}
+_comparisons = {'LT', 'GT', 'LE', 'GE', 'EQ', 'NEQ'}
+_UMINUS = 4
+# Inside anything that isn't the right hand side of an operator every operator continues the expression.
+_ANY = -1
+
+
+class Parser:
+    """Parses Steph source into an unchecked tree. A Parser can only parse one source at a time."""
+
+    def __init__(self):
+        self._tokens = [_END]
+        self._position = 0
+
+    def parse(self, source: str, **kwargs) -> ast.Expression:
+        # PLY's options, like tracking, don't mean anything here.
+        self._tokens = tokenize(source)
+        self._position = 0
+        try:
+            expression = self._expression(_ANY, False)
+            self._expect('$end')
+            return expression
+        finally:
+            self._tokens = [_END]
+
+    def _peek(self, offset: int = 0) -> str:
+        position = self._position + offset
+        return self._tokens[position][0] if position < len(self._tokens) else '$end'
+
+    def _next(self) -> typing.Any:
+        value = self._tokens[self._position][1]
+        self._position += 1
+        return value
+
+    def _expect(self, kind: str) -> typing.Any:
+        if self._tokens[self._position][0] != kind:
+            self._error()
+        return self._next()
+
+    def _error(self):
+        kind, value = self._tokens[self._position]
+        if kind == '$end':
+            raise ParseException('Syntax error at EOF')
+        raise ParseException("Syntax error at '%s'" % value)
+
+    def _expression(self, level: int, right: bool) -> ast.Expression:
+        """An expression that's the operand of a rule with precedence level, which groups right or left."""
+        left = self._primary()
+        tokens = self._tokens
+        while True:
+            kind = tokens[self._position][0]
+            if kind == '(':
+                # Calls bind tighter than anything else.
+                self._position += 1
+                arguments = [] if tokens[self._position][0] == ')' else self._expressions(')')
+                self._expect(')')
+                left = ast.FunctionCall(left, arguments)
+                continue
+            operator = _binary.get(kind)
+            if operator is None or operator[0] < level or (operator[0] == level and not right):
+                return left
+            op = self._next()
+            rhs = self._expression(*operator)
+            if kind in _comparisons:
+                left = ast.Comparison(left, op, rhs)
+            else:
+                left = ast.ArithmeticOperator(left, op, rhs)
+
+    def _expressions(self, end: str) -> typing.List[ast.Expression]:
+        expressions = [self._expression(_ANY, False)]
+        while self._peek() == ',':
+            self._position += 1
+            expressions.append(self._expression(_ANY, False))
+        if self._peek() != end:
+            self._error()
+        return expressions
+
+    def _primary(self) -> ast.Expression:
+        kind, value = self._tokens[self._position]
+        self._position += 1
+        if kind == 'ID':
+            return ast.Reference(value)
+        if kind == 'NUMBER':
+            return ast.number.NumberValue(value)
+        if kind == 'STRING':
+            return ast.string.StringValue(value[1:-1])
+        if kind == 'TRUE':
+            return ast.boolean.BooleanValue(True)
+        if kind == 'FALSE':
+            return ast.boolean.BooleanValue(False)
+        if kind == '-':
+            return ast.Negate(self._expression(_UMINUS, True))
+        if kind == '(':
+            # `()`, `(name :` and `(name ==` start function definitions, anything else is in parentheses.
+            if self._peek() == ')' or (self._peek() == 'ID' and self._peek(1) in (':', 'EQ')):
+                self._position -= 1
+                return self._function()
+            expression = self._expression(_ANY, False)
+            self._expect(')')
+            return expression
+        if kind == 'IF':
+            self._expect('(')
+            condition = self._expression(_ANY, False)
+            self._expect(')')
+            true = self._expression(_ANY, False)
+            self._expect('ELSE')
+            return ast.IfElse(condition, true, self._expression(_ANY, False))
+        if kind == '{':
+            lets = []
+            while self._peek() == 'LET':
+                lets.append(self._let())
+            self._expect('RETURN')
+            expression = self._expression(_ANY, False)
+            self._expect(';')
+            self._expect('}')
+            return ast.Block(lets, expression)
+        if kind == '[':
+            if self._peek() == ']':
+                self._position += 1
+                return ast.ListValue([])
+            elements = self._expressions(']')
+            self._position += 1
+            return ast.ListValue(elements)
+        self._position -= 1
+        self._error()
+
+    def _let(self) -> ast.Let:
+        self._expect('LET')
+        name = self._expect('ID')
+        specified_type = None
+        if self._peek() == ':':
+            self._position += 1
+            specified_type = self._type()
+        self._expect('=')
+        expression = self._expression(_ANY, False)
+        self._expect(';')
+        return ast.Let(name, specified_type, expression)
+
+    def _function(self) -> ast.Function:
+        pieces = [self._piece()]
+        while self._peek() == ',':
+            self._position += 1
+            pieces.append(self._piece())
+        return ast.Function(pieces)
+
+    def _piece(self) -> ast.FunctionPiece:
+        self._expect('(')
+        arguments = []
+        if self._peek() != ')':
+            arguments.append(self._argument())
+            while self._peek() == ',':
+                self._position += 1
+                arguments.append(self._argument())
+        self._expect(')')
+        self._expect('ARROW')
+        return ast.FunctionPiece(arguments, self._expression(_ANY, False))
+
+    def _argument(self) -> ast.FunctionArgument:
+        name = self._expect('ID')
+        if self._peek() == ':':
+            self._position += 1
+            return ast.BasicFunctionArgument(name, self._type())
+        operator = self._expect('EQ')
+        return ast.ComparisonPatternMatch(name, operator, self._expression(_ANY, False))
+
+    def _type(self) -> typesystem.Type:
+        kind, value = self._tokens[self._position]
+        self._position += 1
+        if kind == '(':
+            arguments = []
+            if self._peek() != ')':
+                arguments.append(self._type())
+                while self._peek() == ',':
+                    self._position += 1
+                    arguments.append(self._type())
+            self._expect(')')
+            self._expect('ARROW')
+            return typesystem.Function(arguments, self._type())
+        if kind == 'TYPENAME':
+            if self._peek() == '(':
+                self._position += 1
+                parameter = self._type()
+                self._expect(')')
+                if value == 'ListValue':
+                    return ast.lists.ListType(parameter)
+                raise ParseException('Unknown type %s' % value)
+            if value == 'NumberType':
+                return ast.number.NumberType()
+            raise ParseException('Unknown type named %r' % value)
+        self._position -= 1
+        self._error()
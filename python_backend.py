@@ -0,0 +1,183 @@
+"""Translate type-checked Steph trees into Python modules.
+
+The generated module doesn't need PLY or the ast package. Numbers, booleans and
+strings are plain Python values and Steph functions are Python functions. It
+exposes evaluate(scope), which takes and returns Python values.
+"""
+
+import builtins
+import keyword
+import types
+import typing
+
+import ast
+import ast.boolean
+import ast.number
+import ast.string
+
+__all__ = ['emit_python', 'load', 'PythonEmitter']
+
+HEADER = '# Generated from Steph source by steph.py --emit-python. Do not edit.\n\n\n'
+
+# The Python name of a function being emitted as a loop, and its parameters.
+_Loop = typing.Optional[typing.Tuple[str, typing.List[str]]]
+
+
+def _calls_in_tail(node: ast.Expression, name: str) -> bool:
+    """Does node call the function bound to name in tail position?"""
+    if isinstance(node, ast.Block):
+        return name not in {let.name for let in node._lets} and _calls_in_tail(node._expression, name)
+    if isinstance(node, ast.IfElse):
+        return _calls_in_tail(node._true, name) or _calls_in_tail(node._false, name)
+    return (isinstance(node, ast.FunctionCall) and isinstance(node._function_expression, ast.Reference) and
+            node._function_expression.name == name)
+
+
+def _creates_functions(node: ast.Node) -> bool:
+    return isinstance(node, ast.Function) or any(_creates_functions(child) for child in node._children)
+
+
+class PythonEmitter:
+    def __init__(self):
+        self._lines = []  # type: typing.List[str]
+        self._used = {'scope', 'evaluate'}
+
+    def module(self, tree: ast.Expression) -> str:
+        names = sorted(tree.names)
+        env = {name: self.fresh(name) for name in names}
+        self._line('', 'def evaluate(scope):')
+        for name in names:
+            self._line('    ', '%s = scope[%r]' % (env[name], name))
+        self.statements(tree, env, '    ')
+        return HEADER + '\n'.join(self._lines) + '\n'
+
+    def fresh(self, name: str) -> str:
+        """Pick a Python name for a Steph binding. Every binding gets its own name so nothing is shadowed."""
+        candidate = name
+        suffix = 0
+        while candidate in self._used or keyword.iskeyword(candidate) or hasattr(builtins, candidate):
+            suffix += 1
+            candidate = '%s_%d' % (name, suffix)
+        self._used.add(candidate)
+        return candidate
+
+    def _line(self, indent: str, line: str):
+        self._lines.append(indent + line)
+
+    def statements(self, node: ast.Expression, env: typing.Dict[str, str], indent: str, loop: _Loop = None):
+        """Emit statements that return the value of node."""
+        if isinstance(node, ast.Block):
+            inner_env = dict(env)
+            for let in node._lets:
+                inner_env[let.name] = self.let(let, env, indent)
+            self.statements(node._expression, inner_env, indent, loop)
+        elif isinstance(node, ast.IfElse) and (self._needs_statements(node._true, env, loop) or
+                                               self._needs_statements(node._false, env, loop)):
+            self._line(indent, 'if %s:' % self.expression(node._condition, env, indent))
+            self.statements(node._true, env, indent + '    ', loop)
+            self._line(indent, 'else:')
+            self.statements(node._false, env, indent + '    ', loop)
+        elif self._is_loop_call(node, env, loop):
+            # A call to the enclosing function in tail position: go round its loop again.
+            name, parameters = loop
+            arguments = [self.expression(arg, env, indent) for arg in node._arguments]
+            if parameters:
+                self._line(indent, '%s = %s' % (', '.join(parameters), ', '.join(arguments)))
+            self._line(indent, 'continue')
+        else:
+            self._line(indent, 'return ' + self.expression(node, env, indent))
+
+    def _needs_statements(self, node: ast.Expression, env: typing.Dict[str, str], loop: _Loop) -> bool:
+        return isinstance(node, ast.Block) or self._is_loop_call(node, env, loop) or (
+            isinstance(node, ast.IfElse) and (self._needs_statements(node._true, env, loop) or
+                                              self._needs_statements(node._false, env, loop)))
+
+    @staticmethod
+    def _is_loop_call(node: ast.Expression, env: typing.Dict[str, str], loop: _Loop) -> bool:
+        return (loop is not None and isinstance(node, ast.FunctionCall) and
+                isinstance(node._function_expression, ast.Reference) and
+                env.get(node._function_expression.name) == loop[0])
+
+    def let(self, let: ast.Let, env: typing.Dict[str, str], indent: str) -> str:
+        name = self.fresh(let.name)
+        # Lets are evaluated in the enclosing scope, but can refer to themselves.
+        let_env = dict(env)
+        let_env[let.name] = name
+        if isinstance(let.expression, ast.Function):
+            self.function(let.expression, name, let_env, indent, let.name)
+        else:
+            self._line(indent, '%s = %s' % (name, self.expression(let.expression, let_env, indent)))
+        return name
+
+    def function(self, function: ast.Function, name: str, env: typing.Dict[str, str], indent: str,
+                 let_name: str = None):
+        parameters = [self.fresh(arg.name) for arg in function.pieces[0].arguments]
+        self._line(indent, 'def %s(%s):' % (name, ', '.join(parameters)))
+        indent += '    '
+        loop = None
+        # Python doesn't eliminate tail calls, so a function that calls itself in tail position becomes a loop.
+        # Closures would see the parameters change, so only functions that don't create any are rewritten.
+        if let_name and any(_calls_in_tail(piece.expression, let_name) for piece in function.pieces) and \
+                not any(_creates_functions(piece) for piece in function.pieces):
+            loop = (name, parameters)
+            self._line(indent, 'while True:')
+            indent += '    '
+        for piece in function.pieces:
+            # Patterns are evaluated in the function's scope, bodies also see the arguments.
+            guards = ['%s == %s' % (parameter, self.expression(arg.expression, env, indent))
+                      for parameter, arg in zip(parameters, piece.arguments)
+                      if isinstance(arg, ast.ComparisonPatternMatch)]
+            inner_env = dict(env)
+            inner_env.update(zip((arg.name for arg in piece.arguments), parameters))
+            if not guards:
+                self.statements(piece.expression, inner_env, indent, loop)
+                return
+            self._line(indent, 'if %s:' % ' and '.join(guards))
+            self.statements(piece.expression, inner_env, indent + '    ', loop)
+        self._line(indent, 'raise Exception(%r)' % 'No matching function implementation')
+
+    def expression(self, node: ast.Expression, env: typing.Dict[str, str], indent: str) -> str:
+        """Return a Python expression for node. Definitions it needs are emitted first at indent."""
+        if isinstance(node, ast.boolean.BooleanValue):
+            return repr(node.value)
+        if isinstance(node, (ast.number.NumberValue, ast.string.StringValue)):
+            return repr(node.value)
+        if isinstance(node, ast.Reference):
+            return env[node.name]
+        if isinstance(node, (ast.ArithmeticOperator, ast.Comparison)):
+            return '(%s %s %s)' % (self.expression(node.lhs, env, indent), node.op.symbol,
+                                   self.expression(node.rhs, env, indent))
+        if isinstance(node, ast.Negate):
+            return '(-%s)' % self.expression(node.expression, env, indent)
+        if isinstance(node, ast.IfElse):
+            return '(%s if %s else %s)' % (self.expression(node._true, env, indent),
+                                           self.expression(node._condition, env, indent),
+                                           self.expression(node._false, env, indent))
+        if isinstance(node, ast.FunctionCall):
+            return '%s(%s)' % (self.expression(node._function_expression, env, indent),
+                               ', '.join(self.expression(arg, env, indent) for arg in node._arguments))
+        if isinstance(node, ast.ListValue):
+            return '[%s]' % ', '.join(self.expression(item, env, indent) for item in node.items)
+        if isinstance(node, ast.Function):
+            name = self.fresh('function')
+            self.function(node, name, env, indent)
+            return name
+        if isinstance(node, ast.Block):
+            name = self.fresh('block')
+            self._line(indent, 'def %s():' % name)
+            self.statements(node, env, indent + '    ')
+            return name + '()'
+        if isinstance(node, ast.Common):
+            return self.expression(node.expression, env, indent)
+        raise Exception("Can't translate %r to Python" % node)
+
+
+def emit_python(tree: ast.Expression) -> str:
+    return PythonEmitter().module(tree)
+
+
+def load(source: str, name: str = 'steph_program') -> types.ModuleType:
+    """Load generated source as a module without writing it to disk."""
+    module = types.ModuleType(name)
+    exec(compile(source, '<%s>' % name, 'exec'), module.__dict__)
+    return module
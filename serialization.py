@@ -0,0 +1,303 @@
+"""A compact binary format for type checked trees.
+
+A tree is written as flat arrays of 32 bit integers: one record per node with
+its class and where its children and fields are, one per type, the children
+and fields those records point into, and a table of strings. Nodes and types
+are numbered in post order and refer to each other by number, so shared nodes,
+types and name sets are written once and stay shared when loaded. Nodes are
+rebuilt in one pass over the arrays without calling their constructors or
+checking types again, and load() reads the arrays straight out of a memory
+mapped file.
+
+Only the type checked tree is kept. Slots that resolve() and the evaluators
+fill in are left empty, and loading quickens and resolves the tree again so
+it's ready to evaluate.
+"""
+
+import array
+import mmap
+import struct
+import sys
+import types
+import typing
+
+import ast
+import ast.lists
+import typesystem
+from ast.base import _NO_NAMES
+
+__all__ = ['dump', 'dumps', 'load', 'loads']
+
+_MAGIC = b'STPH'
+_VERSION = 1
+# Magic, version, root node and the length of each section.
+_HEADER = struct.Struct('<4sHHiiiiiiiiiii')
+
+# Slots worked out after type checking. They're not written and are None when loaded.
+_DERIVED = {'_root', '_compiled_pieces', 'dispatch', 'captures', 'padding', 'cache', 'slot', '_recursive'}
+
+# Tags of field values.
+_NONE, _NODE, _TYPE, _STRING, _BOOLEAN, _INTEGER, _OPERATOR, _NAMES = range(8)
+
+
+def _importable(cls: type) -> type:
+    """The first class in cls's hierarchy that can be found by its name, quickened nodes aren't."""
+    for base in cls.__mro__:
+        if getattr(sys.modules.get(base.__module__), base.__qualname__, None) is base:
+            return base
+    raise Exception("Can't serialize instances of %s" % cls.__name__)
+
+
+_slot_cache = {}  # type: typing.Dict[type, typing.Tuple[typing.List[str], typing.List[str]]]
+
+
+def _slots(cls: type) -> typing.Tuple[typing.List[str], typing.List[str]]:
+    """The names of the slots of cls that are written, and the derived ones that aren't."""
+    slots = _slot_cache.get(cls)
+    if slots is None:
+        fields = []
+        derived = []
+        for base in reversed(cls.__mro__):
+            for name in base.__dict__.get('__slots__', ()):
+                # Some slots, like the type of a value, are hidden by class attributes.
+                if name == '_children' or not isinstance(getattr(cls, name), types.MemberDescriptorType):
+                    continue
+                (derived if name in _DERIVED else fields).append(name)
+        slots = _slot_cache[cls] = fields, derived
+    return slots
+
+
+def _type_fields(t: typesystem.Type) -> typing.List[typesystem.Type]:
+    if isinstance(t, typesystem.Function):
+        return [t.returns] + list(t.arguments)
+    if isinstance(t, ast.lists.ListType) and not isinstance(t, ast.lists.EmptyListType):
+        return [t.item]
+    return []
+
+
+def _make_type(cls: type, fields: typing.List[typesystem.Type]) -> typesystem.Type:
+    if cls is typesystem.Function:
+        return typesystem.Function(fields[1:], fields[0])
+    if cls is ast.lists.ListType:
+        return ast.lists.ListType(fields[0])
+    if cls is typesystem.Unknown:
+        return typesystem.UNKNOWN
+    if cls is typesystem.Nothing:
+        return typesystem.NOTHING
+    return cls()
+
+
+class _Writer:
+    def __init__(self):
+        self.strings = {}  # type: typing.Dict[str, int]
+        self.classes = {}  # type: typing.Dict[type, int]
+        self.names = {}  # type: typing.Dict[int, int]
+        self.name_offsets = array.array('i', [0])
+        self.name_items = array.array('i')
+        self.types = {}  # type: typing.Dict[int, int]
+        self.type_records = array.array('i')
+        self.type_fields = array.array('i')
+        self.nodes = {}  # type: typing.Dict[int, int]
+        self.node_records = array.array('i')
+        self.fields = array.array('i')
+        self.children = array.array('i')
+        # Keeps everything numbered by id() alive until it's written.
+        self._keep = []
+
+    def string(self, value: str) -> int:
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+        return index
+
+    def cls(self, cls: type) -> int:
+        index = self.classes.get(cls)
+        if index is None:
+            index = self.classes[cls] = len(self.classes)
+        return index
+
+    def name_set(self, names: typing.FrozenSet[str]) -> int:
+        index = self.names.get(id(names))
+        if index is None:
+            self._keep.append(names)
+            self.name_items.extend(self.string(name) for name in sorted(names))
+            self.name_offsets.append(len(self.name_items))
+            index = self.names[id(names)] = len(self.names)
+        return index
+
+    def type(self, t: typesystem.Type) -> int:
+        index = self.types.get(id(t))
+        if index is None:
+            fields = [self.type(field) for field in _type_fields(t)]
+            self._keep.append(t)
+            self.type_records.extend((self.cls(_importable(type(t))), len(self.type_fields), len(fields)))
+            self.type_fields.extend(fields)
+            index = self.types[id(t)] = len(self.types)
+        return index
+
+    def value(self, value) -> typing.Tuple[int, int]:
+        if value is None:
+            return _NONE, 0
+        if isinstance(value, ast.Node):
+            return _NODE, self.nodes[id(value)]
+        if isinstance(value, typesystem.Type):
+            return _TYPE, self.type(value)
+        if isinstance(value, str):
+            return _STRING, self.string(value)
+        if isinstance(value, bool):
+            return _BOOLEAN, int(value)
+        if isinstance(value, int):
+            return _INTEGER, self.string(str(value))
+        if isinstance(value, typesystem.Operator):
+            return _OPERATOR, self.string(value.name)
+        if isinstance(value, frozenset):
+            return _NAMES, self.name_set(value)
+        raise Exception("Can't serialize %r" % (value,))
+
+    def tree(self, root: ast.Node) -> int:
+        # Post order without recursion, trees can be deeper than Python's stack.
+        stack = [(root, False)]
+        while stack:
+            node, children_written = stack.pop()
+            if id(node) in self.nodes:
+                continue
+            if not children_written:
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(node._children))
+                continue
+            self._keep.append(node)
+            cls = _importable(type(node))
+            fields, _ = _slots(cls)
+            self.node_records.extend((self.cls(cls), len(self.children), len(node._children), len(self.fields)))
+            self.children.extend(self.nodes[id(child)] for child in node._children)
+            for name in fields:
+                self.fields.extend(self.value(getattr(node, name)))
+            self.nodes[id(node)] = len(self.nodes)
+        return self.nodes[id(root)]
+
+    def bytes(self, root: int) -> bytes:
+        classes = array.array('i', (self.string('%s:%s' % (cls.__module__, cls.__qualname__))
+                                    for cls in sorted(self.classes, key=self.classes.get)))
+        strings = [value.encode() for value in sorted(self.strings, key=self.strings.get)]
+        string_offsets = array.array('i', [0])
+        for value in strings:
+            string_offsets.append(string_offsets[-1] + len(value))
+        sections = [string_offsets, classes, self.name_offsets, self.name_items, self.type_records, self.type_fields,
+                    self.node_records, self.fields, self.children]
+        if sys.byteorder != 'little':
+            for section in sections:
+                section.byteswap()
+        blob = b''.join(strings)
+        header = _HEADER.pack(_MAGIC, _VERSION, 0, root, *([len(section) for section in sections] + [len(blob)]))
+        return header + b''.join(section.tobytes() for section in sections) + blob
+
+
+def dumps(tree: ast.Expression) -> bytes:
+    """Encode a type checked tree."""
+    writer = _Writer()
+    return writer.bytes(writer.tree(tree))
+
+
+def dump(tree: ast.Expression, path: str):
+    with open(path, 'wb') as f:
+        f.write(dumps(tree))
+
+
+def _find_class(name: str, base: type) -> type:
+    # Only classes from modules that are already loaded, a file can't make us import anything.
+    module, qualname = name.split(':')
+    cls = getattr(sys.modules.get(module), qualname, None)
+    if not isinstance(cls, type) or not issubclass(cls, base):
+        raise Exception('Unknown class %s in serialized tree' % name)
+    return cls
+
+
+def _read(data) -> ast.Expression:
+    """Rebuild the type checked tree in data, a bytes-like object."""
+    magic, version, _, root, *lengths = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != _VERSION:
+        raise Exception('Not a serialized tree, or from another version')
+    view = memoryview(data)
+    offset = _HEADER.size
+    sections = []
+    for length in lengths[:-1]:
+        section = view[offset:offset + length * 4]
+        if sys.byteorder == 'little':
+            section = section.cast('i')
+        else:
+            section = array.array('i', section)
+            section.byteswap()
+        sections.append(section)
+        offset += length * 4
+    blob = bytes(view[offset:offset + lengths[-1]])
+    (string_offsets, classes, name_offsets, name_items, type_records, type_fields, node_records, fields,
+     children) = [section.tolist() for section in sections]
+
+    strings = [blob[string_offsets[i]:string_offsets[i + 1]].decode() for i in range(len(string_offsets) - 1)]
+    classes = [strings[index] for index in classes]
+    names = [frozenset(strings[index] for index in name_items[name_offsets[i]:name_offsets[i + 1]]) or _NO_NAMES
+             for i in range(len(name_offsets) - 1)]
+
+    type_list = []
+    for i in range(0, len(type_records), 3):
+        cls = _find_class(classes[type_records[i]], typesystem.Type)
+        first = type_records[i + 1]
+        type_list.append(_make_type(cls, [type_list[index] for index in type_fields[first:first + type_records[i + 2]]]))
+
+    node_classes = {}
+    nodes = []
+    functions = []
+    for i in range(0, len(node_records), 4):
+        class_index, first_child, child_count, first_field = node_records[i:i + 4]
+        cls = node_classes.get(class_index)
+        if cls is None:
+            cls = node_classes[class_index] = _find_class(classes[class_index], ast.Node)
+        node = cls.__new__(cls)
+        slot_names, derived = _slots(cls)
+        if child_count:
+            node._children = tuple([nodes[index] for index in children[first_child:first_child + child_count]])
+        elif isinstance(getattr(cls, '_children'), types.MemberDescriptorType):
+            node._children = ()
+        for name, j in zip(slot_names, range(first_field, first_field + 2 * len(slot_names), 2)):
+            tag = fields[j]
+            payload = fields[j + 1]
+            if tag == _NODE:
+                value = nodes[payload]
+            elif tag == _TYPE:
+                value = type_list[payload]
+            elif tag == _STRING:
+                value = strings[payload]
+            elif tag == _NAMES:
+                value = names[payload]
+            elif tag == _INTEGER:
+                value = int(strings[payload])
+            elif tag == _BOOLEAN:
+                value = bool(payload)
+            elif tag == _OPERATOR:
+                value = typesystem.Operator[strings[payload]]
+            else:
+                value = None
+            setattr(node, name, value)
+        for name in derived:
+            setattr(node, name, None)
+        if isinstance(node, ast.Function):
+            functions.append(node)
+        nodes.append(node)
+    for function in functions:
+        function.dispatch = ast.Dispatch(function.pieces)
+    return nodes[root]
+
+
+def loads(data) -> ast.Expression:
+    """Decode a tree encoded by dumps() and make it ready to evaluate."""
+    tree = _read(data)
+    tree.quicken()
+    tree.resolve_root()
+    return tree
+
+
+def load(path: str) -> ast.Expression:
+    """Load a tree written by dump(), reading the file through a memory map."""
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return loads(mapped)
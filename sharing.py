@@ -0,0 +1,176 @@
+"""Sharing repeated parts of resolved trees.
+
+share(tree) turns subtrees that are the same into one node, and sets of names
+that are the same into one set, so a program that repeats itself takes less
+memory. Nodes are compared after resolve(), with
+their types and slots rather than their names, so two `n - 1`s are only the
+same when their `n`s are the same binding, whatever shadows what.
+
+common_subexpressions(tree) also saves work. When a subexpression that calls
+a function appears more than once in the same frame, every place it appears
+becomes one Common node. A Common evaluates the subexpression the first time
+it's needed and reads it from its slot after that. Calls in tail position are
+left alone so loops still don't grow the stack, and cheaper subexpressions
+aren't worth a slot.
+
+parse(..., share=True) does both.
+"""
+
+import collections
+import typing
+
+import ast
+import typesystem
+from ast.literals import Value
+
+__all__ = ['share', 'common_subexpressions']
+
+# Slots that are worked out from the others or only used while evaluating.
+_IGNORED = {'_children', '_root', '_compiled_pieces', 'dispatch', 'cache', '_recursive'}
+# Nodes that are only ever the same as themselves. Lets and Commons have slots of their own.
+_UNIQUE = (ast.Let, ast.Block, ast.Common)
+
+_field_cache = {}  # type: typing.Dict[type, typing.List[str]]
+
+
+def _fields(cls: type) -> typing.List[str]:
+    fields = _field_cache.get(cls)
+    if fields is None:
+        fields = _field_cache[cls] = [name for base in reversed(cls.__mro__)
+                                      for name in base.__dict__.get('__slots__', ()) if name not in _IGNORED]
+    return fields
+
+
+def _field_key(value):
+    if isinstance(value, list):
+        return tuple(value)
+    if isinstance(value, typesystem.Type):
+        return str(value)
+    return value
+
+
+def _count(tree: ast.Node) -> int:
+    return sum(1 for _ in tree.walk())
+
+
+class _Numbering:
+    """Numbers nodes so that nodes with the same number can be swapped for each other."""
+
+    def __init__(self):
+        self._numbers = {}  # type: typing.Dict[tuple, int]
+        self._nodes = {}  # type: typing.Dict[int, int]
+
+    def __call__(self, node: ast.Node) -> int:
+        number = self._nodes.get(id(node))
+        if number is None:
+            children = tuple(self(child) for child in node._children)
+            if isinstance(node, _UNIQUE):
+                key = (id(node),)
+            else:
+                key = (type(node), children) + tuple(_field_key(getattr(node, name, None))
+                                                     for name in _fields(type(node)))
+            number = self._nodes[id(node)] = self._numbers.setdefault(key, len(self._numbers))
+        return number
+
+
+def share(tree: ast.Expression) -> int:
+    """Make subtrees of resolved tree that are the same one node. Returns how many nodes that saved."""
+    before = _count(tree)
+    number = _Numbering()
+    canonical = {}  # type: typing.Dict[int, ast.Node]
+    names = {}  # type: typing.Dict[typing.FrozenSet[str], typing.FrozenSet[str]]
+
+    def visit(node):
+        kept = canonical.setdefault(number(node), node)
+        if kept is node and not isinstance(node, Value):
+            node.names = names.setdefault(node.names, node.names)
+            children = tuple(visit(child) for child in node._children)
+            if any(new is not old for new, old in zip(children, node._children)):
+                node._children = children
+        return kept
+
+    visit(tree)
+    for node in tree.walk():
+        # Recursive lets find their functions by identity.
+        if isinstance(node, ast.Let) and node._recursive:
+            node._recursive = {canonical[number(function)]: captures
+                               for function, captures in node._recursive.items()}
+    return before - _count(tree)
+
+
+def _contexts(node: ast.Node, frame: typing.Optional[ast.Function],
+              tail: bool) -> typing.Iterator[typing.Tuple[ast.Node, typing.Optional[ast.Function], bool]]:
+    """node's children, each with the function whose frame it's evaluated in and whether it's in tail position."""
+    children = node._children
+    if isinstance(node, ast.Function):
+        for piece in children:
+            yield piece, node, False
+    elif isinstance(node, ast.FunctionPiece):
+        for argument in children[:-1]:
+            yield argument, frame, False
+        yield children[-1], frame, True
+    elif isinstance(node, ast.Block):
+        for let in children[:-1]:
+            yield let, frame, False
+        yield children[-1], frame, tail
+    elif isinstance(node, ast.IfElse):
+        yield children[0], frame, False
+        yield children[1], frame, tail
+        yield children[2], frame, tail
+    else:
+        for child in children:
+            yield child, frame, False
+
+
+def common_subexpressions(tree: ast.Expression) -> int:
+    """Make subexpressions of resolved tree that call functions and are repeated in a frame Commons.
+
+    Returns how many evaluations that saves each time the frames are evaluated. The tree has to be
+    resolved again afterwards.
+    """
+    number = _Numbering()
+    calls = {}  # type: typing.Dict[int, bool]
+
+    def has_call(node):
+        result = calls.get(id(node))
+        if result is None:
+            result = calls[id(node)] = isinstance(node, ast.FunctionCall) or any(
+                has_call(child) for child in node._children)
+        return result
+
+    def candidate(node, tail):
+        return (not tail and isinstance(node, ast.Expression) and has_call(node) and
+                not isinstance(node, (Value, ast.Reference, ast.Function, ast.FunctionPiece) + _UNIQUE))
+
+    counts = collections.Counter()
+    pending = [(tree, None, False)]
+    while pending:
+        node, frame, tail = pending.pop()
+        if candidate(node, tail):
+            counts[frame, number(node)] += 1
+        pending.extend(_contexts(node, frame, tail))
+
+    commons = {}  # type: typing.Dict[tuple, ast.Common]
+    saved = 0
+
+    def rewrite(node, frame, tail):
+        nonlocal saved
+        children = []
+        for child, child_frame, child_tail in _contexts(node, frame, tail):
+            key = child_frame, number(child)
+            if candidate(child, child_tail) and counts[key] > 1:
+                common = commons.get(key)
+                if common is None:
+                    common = commons[key] = ast.Common(child)
+                    rewrite(child, child_frame, False)
+                else:
+                    saved += 1
+                child = common
+            else:
+                rewrite(child, child_frame, child_tail)
+            children.append(child)
+        if any(new is not old for new, old in zip(children, node._children)):
+            node._children = tuple(children)
+
+    rewrite(tree, None, False)
+    return saved
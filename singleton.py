@@ -1,6 +1,14 @@
+import copyreg
+
+
 class Singleton(type):
     _instances = {}
 
+    def __init__(cls, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Unpickling gets the one instance too.
+        copyreg.pickle(cls, lambda instance: (cls, ()))
+
     def __call__(cls, *args, **kwargs):
         if cls not in cls._instances:
             cls._instances[cls] = super(Singleton, cls).__call__(*args, **kwargs)
@@ -0,0 +1,197 @@
+"""An evaluator that keeps its continuations on a heap allocated stack.
+
+Expression.evaluate() recurses on the Python stack, so deep non-tail recursion
+in a Steph program hits Python's recursion limit. This machine instead keeps a
+list of pending work and a list of intermediate values, so recursion depth is
+only bounded by memory.
+
+Functions created here are ordinary BoundFunctions and work with the
+interpreter. Functions from elsewhere, like CompiledFunctions, are called
+normally.
+"""
+
+import typing
+
+import ast
+import ast.literals
+from typesystem import Operator
+
+__all__ = ['evaluate', 'Machine']
+
+
+class Machine:
+    def __init__(self):
+        # Each piece of work is (handler, node, frame). Handlers push more work and values.
+        self._work = []  # type: typing.List[tuple]
+        self._values = []  # type: typing.List[ast.Expression]
+
+    def run(self, tree: ast.Expression, frame: ast.base.Frame) -> ast.Expression:
+        work = self._work
+        work.append((self._evaluate, tree, frame))
+        while work:
+            handler, node, frame = work.pop()
+            handler(node, frame)
+        return self._values.pop()
+
+    def _evaluate(self, node, frame):
+        for cls in type(node).__mro__:
+            evaluator = _evaluators.get(cls)
+            if evaluator is not None:
+                return evaluator(self, node, frame)
+        # Nodes that can't be evaluated (like ListValue) raise the interpreter's error.
+        self._values.append(node.run(frame))
+
+    def _push_evaluate(self, node, frame):
+        self._work.append((self._evaluate, node, frame))
+
+    def _value(self, node, frame):
+        self._values.append(node)
+
+    def _reference(self, node, frame):
+        self._values.append(frame[node.slot])
+
+    def _let(self, node, frame):
+        self._push_evaluate(node.expression, frame)
+
+    def _block(self, node, frame):
+        self._work.append((self._block_expression, node, frame))
+        for let in reversed(node._lets):
+            self._push_evaluate(let, frame)
+
+    def _block_expression(self, node, frame):
+        lets = node._lets
+        if lets:
+            for let, value in zip(lets, self._values[-len(lets):]):
+                let.bind(frame, value)
+            del self._values[-len(lets):]
+        self._push_evaluate(node._expression, frame)
+
+    def _if_else(self, node, frame):
+        self._work.append((self._if_else_branch, node, frame))
+        self._push_evaluate(node._condition, frame)
+
+    def _if_else_branch(self, node, frame):
+        if self._values.pop():
+            self._push_evaluate(node._true, frame)
+        else:
+            self._push_evaluate(node._false, frame)
+
+    def _binary(self, node, frame):
+        self._work.append((self._apply_binary, node, frame))
+        self._push_evaluate(node.rhs, frame)
+        self._push_evaluate(node.lhs, frame)
+
+    def _apply_binary(self, node, frame):
+        rhs = self._values.pop()
+        lhs = self._values.pop()
+        operand_type = node.argument_type if isinstance(node, ast.Comparison) else node.type
+        self._values.append(operand_type.binary_operator(node.op, lhs, rhs))
+
+    def _negate(self, node, frame):
+        self._work.append((self._apply_negate, node, frame))
+        self._push_evaluate(node.expression, frame)
+
+    def _apply_negate(self, node, frame):
+        self._values.append(node.type.unary_operator(Operator.negate, self._values.pop()))
+
+    def _common(self, node, frame):
+        value = frame[node.slot]
+        if value is not None:
+            self._values.append(value)
+            return
+        self._work.append((self._remember_common, node, frame))
+        self._push_evaluate(node.expression, frame)
+
+    def _remember_common(self, node, frame):
+        frame[node.slot] = self._values[-1]
+
+    def _function(self, node, frame):
+        self._values.append(ast.BoundFunction(node, [frame[slot] for slot in node.captures]))
+
+    def _function_call(self, node, frame):
+        self._work.append((self._call, node, frame))
+        for argument in reversed(node._arguments):
+            self._push_evaluate(argument, frame)
+        self._push_evaluate(node._function_expression, frame)
+
+    def _call(self, node, frame):
+        count = len(node._arguments)
+        arguments = self._values[len(self._values) - count:]
+        del self._values[len(self._values) - count:]
+        bound_function = self._values.pop()
+        assert isinstance(bound_function, ast.BoundFunction)
+        if type(bound_function) is not ast.BoundFunction:
+            self._values.append(bound_function.call(arguments))
+            return
+        cache = bound_function.function.cache
+        if cache is not None:
+            key = bound_function.cache_key(arguments)
+            if key is not None:
+                result = cache.get(key)
+                if result is not None:
+                    self._values.append(result)
+                    return
+                self._work.append((self._remember, cache, key))
+        self._try_piece(_Call(bound_function, arguments), None)
+
+    def _remember(self, cache, key):
+        cache.put(key, self._values[-1])
+
+    def _try_piece(self, call, frame):
+        """Check the next piece with guards that comes before the piece found by lookup, or call that one."""
+        guarded = call.function.dispatch.guarded
+        if call.guard < len(guarded) and (call.best is None or guarded[call.guard] < call.best):
+            piece = call.function.pieces[guarded[call.guard]]
+            # Pattern values are evaluated first, then _check_piece runs.
+            self._work.append((self._check_piece, call, None))
+            for arg in reversed(_patterns(piece)):
+                self._push_evaluate(arg.expression, call.frame)
+            return
+        if call.best is None:
+            raise Exception('No matching function implementation for arguments=%r in %r' %
+                            (call.arguments, call.function.pieces))
+        self._push_evaluate(call.function.pieces[call.best].expression, call.frame)
+
+    def _check_piece(self, call, frame):
+        piece = call.function.pieces[call.function.dispatch.guarded[call.guard]]
+        patterns = _patterns(piece)
+        values = self._values[-len(patterns):]
+        del self._values[-len(patterns):]
+        if not all(call.frame[arg.slot] == value for arg, value in zip(patterns, values)):
+            call.guard += 1
+            self._try_piece(call, None)
+            return
+        self._push_evaluate(piece.expression, call.frame)
+
+
+def _patterns(piece: ast.FunctionPiece) -> typing.List[ast.ComparisonPatternMatch]:
+    return [arg for arg in piece.arguments if isinstance(arg, ast.ComparisonPatternMatch)]
+
+
+class _Call:
+    def __init__(self, bound_function: ast.BoundFunction, arguments: typing.List[ast.Expression]):
+        self.function = bound_function.function
+        self.arguments = arguments
+        self.frame = bound_function.frame(arguments)
+        # The piece found by a lookup on constant patterns, and the next guarded piece to check.
+        self.best = self.function.dispatch.lookup(arguments)
+        self.guard = 0
+
+
+_evaluators = {
+    ast.literals.Value: Machine._value,
+    ast.Reference: Machine._reference,
+    ast.Let: Machine._let,
+    ast.Block: Machine._block,
+    ast.IfElse: Machine._if_else,
+    ast.ArithmeticOperator: Machine._binary,
+    ast.Comparison: Machine._binary,
+    ast.Negate: Machine._negate,
+    ast.Function: Machine._function,
+    ast.FunctionCall: Machine._function_call,
+    ast.Common: Machine._common,
+}
+
+
+def evaluate(tree: ast.Expression, scope: ast.base.EvaluationScope) -> ast.Expression:
+    return Machine().run(tree, tree.frame(scope))
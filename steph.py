@@ -1,16 +1,29 @@
+import argparse
 import sys
 
 from parser import parse
 import ast.number
+import python_backend
 
-if len(sys.argv) == 2:
-    tree = parse(open(sys.argv[1]).read())
-elif len(sys.argv) == 1:
-    tree = parse(sys.stdin.read())
+argument_parser = argparse.ArgumentParser(description='Run a Steph program with x=42.')
+argument_parser.add_argument('source', nargs='?', help='source file, defaults to stdin')
+argument_parser.add_argument('--emit-python', metavar='OUT',
+                             help='write the program as an importable Python module instead of running it')
+arguments = argument_parser.parse_args()
+
+if arguments.source:
+    source = open(arguments.source).read()
 else:
-    raise Exception('Expected zero or one arguments')
+    source = sys.stdin.read()
+
+tree = parse(source, {'x': ast.number.NumberType()})
+
+if arguments.emit_python:
+    with open(arguments.emit_python, 'w') as output:
+        output.write(python_backend.emit_python(tree))
+    sys.exit()
 
 print('tree: %r' % tree)
 print('names: %r' % tree.names)
-print('type: %r' % tree.type({'x': ast.number.NumberType()}))
+print('type: %r' % tree.type)
 print('value: %r' % tree.evaluate({'x': ast.number.NumberValue(42)}))
@@ -5,17 +5,24 @@ from ast.boolean import BooleanValue
 from ast.literals import Value
 from ast.number import NumberValue
 from ast.string import StringValue
-from parser import parse
 import ast
+import parser
 import typesystem
 
 __all__ = ['StephTest', 'parse', 'ast', 'typesystem']
 
+# Extra keyword arguments for every parse() in the tests, set by mode_variants().
+parse_options = {}
+
+
+def parse(source: str, scope: dict = None, **kwargs) -> ast.Expression:
+    return parser.parse(source, scope, **dict(parse_options, **kwargs))
+
 
 def value_for_python_value(value):
     if isinstance(value, bool):
         return BooleanValue(value)
-    elif isinstance(value, int):
+    elif isinstance(value, (int, float)):
         return NumberValue(value)
     elif isinstance(value, str):
         return StringValue(value)
@@ -44,3 +51,22 @@ class StephTest(unittest.TestCase):
         parsed = parse(source)
         with self.assertRaises(exception):
             parsed.evaluate(scope or {})
+
+
+def mode_variants(prefix: str, options: dict, *modules) -> dict:
+    """Make a copy of every StephTest in modules that parses with extra options."""
+    class Mode:
+        def setUp(self):
+            super().setUp()
+            parse_options.update(options)
+
+        def tearDown(self):
+            parse_options.clear()
+            super().tearDown()
+
+    variants = {}
+    for module in modules:
+        for name, case in vars(module).items():
+            if isinstance(case, type) and issubclass(case, StephTest) and case.__module__ == module.__name__:
+                variants[prefix + name] = type(prefix + name, (Mode, case), {})
+    return variants
@@ -0,0 +1,59 @@
+import itertools
+
+from ast.number import *
+from batch import evaluate_many
+from tests.base import *
+from tests.test_memoization import fib_source
+
+
+class EvaluateManyTests(StephTest):
+    def setUp(self):
+        super().setUp()
+        self.tree = parse(fib_source, {'x': NumberType()})
+        self.expected = [NumberValue(n) for n in (0, 1, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)]
+
+    def scopes(self, count: int = 12):
+        return ({'x': NumberValue(i)} for i in range(count))
+
+    def test_in_this_thread(self):
+        self.assertEqual(list(evaluate_many(self.tree, self.scopes())), self.expected)
+
+    def test_threads(self):
+        results = evaluate_many(self.tree, self.scopes(), executor='thread', workers=3, chunk_size=2)
+        self.assertEqual(list(results), self.expected)
+
+    def test_processes(self):
+        for evaluator in ('tree', 'compiled'):
+            results = evaluate_many(self.tree, self.scopes(), executor='process', workers=2, chunk_size=5,
+                                    evaluator=evaluator)
+            self.assertEqual(list(results), self.expected, evaluator)
+
+    def test_streams(self):
+        # Scopes that never end, only as many as needed are read.
+        read = []
+
+        def scopes():
+            for i in itertools.count():
+                read.append(i)
+                yield {'x': NumberValue(i % 12)}
+
+        results = evaluate_many(self.tree, scopes(), executor='thread', workers=2, chunk_size=10)
+        self.assertEqual(list(itertools.islice(results, 12)), self.expected)
+        results.close()
+        self.assertLessEqual(len(read), 2 * 2 * 10 + 10)
+
+    def test_errors(self):
+        tree = parse('10 / x', {'x': NumberType()})
+        results = evaluate_many(tree, ({'x': NumberValue(i)} for i in (5, 2, 0, 1)), executor='thread', chunk_size=1)
+        self.assertEqual(next(results), NumberValue(2))
+        self.assertEqual(next(results), NumberValue(5))
+        with self.assertRaises(ZeroDivisionError):
+            next(results)
+
+    def test_bad_arguments(self):
+        with self.assertRaisesRegex(Exception, 'Unknown executor'):
+            next(evaluate_many(self.tree, self.scopes(), executor='fibers'))
+        with self.assertRaisesRegex(Exception, 'Unknown evaluator'):
+            next(evaluate_many(self.tree, self.scopes(), executor='process', evaluator='abacus'))
+        with self.assertRaisesRegex(Exception, 'chunk_size'):
+            next(evaluate_many(self.tree, self.scopes(), executor='thread', chunk_size=0))
@@ -37,3 +37,52 @@ class BlockTests(StephTest):
             return 0;
         }'''
         self.assertRaises(Exception, lambda: parse(source))
+
+    def test_many_lets(self):
+        lets = ''.join('let v%d = %d;' % (i, i) for i in range(5000))
+        self.assertEqual(parse('{ %s return v4999 - v1; }' % lets).evaluate({}), NumberValue(4998))
+        self.assertRaisesParseException('{ %s let v1 = 0; return 0; }' % lets)
+
+    def test_let_evaluated_once(self):
+        calls = []
+
+        class CountingFunction(ast.BoundFunction):
+            def call(self, arguments):
+                calls.append(arguments)
+                return super().call(arguments)
+
+        square = parse('(n:NumberType) => n*n').evaluate({})
+        p = parse('''{
+            let a = square(x);
+            return a + a;
+        }''', {'square': square.function.type, 'x': NumberType()})
+        self.assertIsInstance(p._expression.lhs, ast.Reference)
+        v = p.evaluate({'square': CountingFunction(square.function, square.closure), 'x': NumberValue(3)})
+        self.assertEqual(v, NumberValue(18))
+        self.assertEqual(len(calls), 1)
+
+    def test_let_recursion(self):
+        # The function that recurses is made inside the let's value, not the value itself.
+        p = parse('''{
+            let count : (NumberType)=>NumberType = {
+                let step = (m:NumberType) => if (m == 0) 0 else count(m - 1) + 1;
+                return (n:NumberType) => step(n);
+            };
+            return count(5);
+        }''')
+        self.assertEqual(p.evaluate({}), NumberValue(5))
+
+    def test_let_refers_to_itself(self):
+        self.assertRaisesParseException('''{
+            let x : NumberType = x + 1;
+            return x;
+        }''')
+        self.assertRaisesParseException('''{
+            let x : NumberType = { let y = 2; return x + y; };
+            return x;
+        }''')
+        p = parse('''{
+            let x : NumberType = { let x = 2; return x + 1; };
+            return x;
+        }''')
+        self.assertEqual(p.evaluate({}), NumberValue(3))
@@ -0,0 +1,126 @@
+import hashlib
+import os
+import tempfile
+from unittest import mock
+
+from ast.boolean import *
+from ast.number import *
+from tests import test_blocks, test_end_to_end, test_flow_control, test_functions, test_lists, test_numbers, \
+    test_operators, test_strings
+from tests.base import *
+from tests.base import mode_variants
+import c_backend
+
+# The whole suite again, running natively where possible.
+globals().update(mode_variants('Native', {'evaluator': 'native'}, test_blocks, test_end_to_end,
+                               test_flow_control, test_functions, test_lists, test_numbers, test_operators,
+                               test_strings))
+
+FACTORIAL = '''
+{
+  let fac : (NumberType)=>NumberType =
+    (n == 1) => 1,
+    (n : NumberType) => n * fac(n-1);
+  return fac(x);
+}
+'''
+
+
+class NativeTests(StephTest):
+    def native(self, source: str, scope: dict = None) -> c_backend.NativeProgram:
+        program = c_backend.NativeProgram(parse(source, scope))
+        self.assertTrue(program.native, program.reason)
+        return program
+
+    def test_factorial(self):
+        program = self.native(FACTORIAL, {'x': NumberType()})
+        self.assertEqual(program.evaluate({'x': NumberValue(10)}), NumberValue(3628800))
+
+    def test_overflow_falls_back(self):
+        program = self.native(FACTORIAL, {'x': NumberType()})
+        self.assertEqual(program.evaluate({'x': NumberValue(30)}), NumberValue(265252859812191058636308480000000))
+
+    def test_float_falls_back(self):
+        # Like the result of x / 2 from another program.
+        program = self.native('x * 2', {'x': NumberType()})
+        self.assertEqual(program.evaluate({'x': NumberValue(2.5)}), NumberValue(5))
+
+    def test_captured_names(self):
+        program = self.native('''
+        {
+            let scale = x * 2;
+            return {
+                let f = (n : NumberType) => {
+                    let g : (NumberType)=>NumberType = (m : NumberType) => if (m < 1) scale else g(m - 1) + scale;
+                    return g(n);
+                };
+                return f(3);
+            };
+        }
+        ''', {'x': NumberType()})
+        self.assertEqual(program.evaluate({'x': NumberValue(5)}), NumberValue(40))
+
+    def test_boolean_result(self):
+        program = self.native('{ let limit = 10; return x < limit; }', {'x': NumberType()})
+        self.assertEqual(program.evaluate({'x': NumberValue(3)}), BooleanValue(True))
+        self.assertEqual(program.evaluate({'x': NumberValue(30)}), BooleanValue(False))
+
+    def test_unsupported_falls_back(self):
+        for source in ('"hello, " + "world"', '10 / 4', '{ let f = (n : NumberType) => n; return f; }(2)'):
+            program = c_backend.NativeProgram(parse(source))
+            self.assertFalse(program.native)
+            self.assertIsNotNone(program.reason)
+            self.assertEqual(program.evaluate({}), parse(source).evaluate({}))
+
+    def test_no_matching_piece(self):
+        program = self.native('{ let f = (n == 1) => 1; return f(2); }')
+        with self.assertRaises(Exception):
+            program.evaluate({})
+
+
+class BuildDirectoryTests(StephTest):
+    def setUp(self):
+        super().setUp()
+        self._temporary = tempfile.TemporaryDirectory()
+        patcher = mock.patch('tempfile.gettempdir', return_value=self._temporary.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.directory = os.path.join(self._temporary.name, 'steph-native-%d' % os.getuid())
+
+    def tearDown(self):
+        self._temporary.cleanup()
+        super().tearDown()
+
+    def test_private(self):
+        program = c_backend.NativeProgram(parse(FACTORIAL, {'x': NumberType()}))
+        self.assertTrue(program.native, program.reason)
+        self.assertEqual(os.stat(self.directory).st_mode & 0o077, 0)
+        self.assertEqual(len([name for name in os.listdir(self.directory) if name.endswith('.so')]), 1)
+
+    def test_shared_directory_not_used(self):
+        # Someone else could have put a library in it.
+        os.mkdir(self.directory)
+        os.chmod(self.directory, 0o777)
+        source, _ = c_backend.translate(parse(FACTORIAL, {'x': NumberType()}))
+        planted = os.path.join(self.directory, hashlib.sha256(source.encode()).hexdigest() + '.so')
+        with open(planted, 'w') as f:
+            f.write('not a library')
+        program = c_backend.NativeProgram(parse(FACTORIAL, {'x': NumberType()}))
+        self.assertTrue(program.native, program.reason)
+        self.assertEqual(program.evaluate({'x': NumberValue(5)}), NumberValue(120))
+        with open(planted) as f:
+            self.assertEqual(f.read(), 'not a library')
+        # The library was built somewhere else, and removed once it was loaded.
+        self.assertEqual(os.listdir(self._temporary.name), [os.path.basename(self.directory)])
+
+    def test_writable_library_rebuilt(self):
+        c_backend.NativeProgram(parse(FACTORIAL, {'x': NumberType()}))
+        library = os.path.join(self.directory, os.listdir(self.directory)[0])
+        # Replaced rather than written to, the library is loaded.
+        with open(library + '.new', 'w') as f:
+            f.write('not a library')
+        os.chmod(library + '.new', 0o666)
+        os.replace(library + '.new', library)
+        program = c_backend.NativeProgram(parse(FACTORIAL, {'x': NumberType()}))
+        self.assertTrue(program.native, program.reason)
+        self.assertEqual(os.stat(library).st_mode & 0o022, 0)
@@ -0,0 +1,46 @@
+from ast.number import *
+from tests import test_blocks, test_end_to_end, test_flow_control, test_functions, test_lists, test_numbers, \
+    test_operators, test_strings
+from tests.base import *
+from tests.base import mode_variants
+
+# The whole suite again, evaluating through compiled closures.
+globals().update(mode_variants('Compiled', {'evaluator': 'compiled'}, test_blocks, test_end_to_end,
+                               test_flow_control, test_functions, test_lists, test_numbers, test_operators,
+                               test_strings))
+
+
+class CompileTests(StephTest):
+    def test_compiled_evaluate(self):
+        p = parse('1 + 2 * 3', evaluator='compiled')
+        self.assertIsInstance(p, ast.ArithmeticOperator)
+        self.assertEqual(p.evaluate({}), NumberValue(7))
+
+    def test_compile_is_reusable(self):
+        p = parse('''
+        {
+            let a = x + 1;
+            return a * x;
+        }
+        ''', {'x': NumberType()})
+        evaluate = p.compile()
+        for x in range(10):
+            self.assertEqual(evaluate({'x': NumberValue(x)}), p.evaluate({'x': NumberValue(x)}))
+
+    def test_compiled_function(self):
+        p = parse('(x:NumberType) => x*x', evaluator='compiled')
+        f = p.evaluate({})
+        self.assertIsInstance(f, ast.CompiledFunction)
+        self.assertEqual(f.call([NumberValue(7)]), NumberValue(49))
+
+    def test_compiled_recursion(self):
+        p = parse('''
+        {
+          let fib : (NumberType)=>NumberType =
+            (n == 0) => 0,
+            (n == 1) => 1,
+            (n : NumberType) => fib(n-1) + fib(n-2);
+          return fib(x);
+        }
+        ''', {'x': NumberType()}, evaluator='compiled')
+        self.assertEqual(p.evaluate({'x': NumberValue(15)}), NumberValue(610))
@@ -45,3 +45,18 @@ class EndToEnd(StephTest):
               return fac(10);
             }
             ''')
+
+    def test_compact_nodes(self):
+        tree = parse('''
+        {
+          let fib : (NumberType)=>NumberType =
+            (n == 0) => 0,
+            (n : NumberType) => if (n < 2) n else fib(n-1) + fib(n-2);
+          return fib(x) + -x;
+        }
+        ''', {'x': NumberType()})
+        for node in tree.walk():
+            self.assertFalse(hasattr(node, '__dict__'), node)
+        # -x has the same names as x.
+        negate = tree._expression.rhs
+        self.assertIs(negate.names, negate.expression.names)
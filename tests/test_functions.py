@@ -116,3 +116,114 @@ class PatternMatchingTest(StephTest):
     #     ''')
     #     result = p.evaluate({'bar': ast.NumberValue(20)})
     #     self.assertEqual(result, 20)
+
+
+class ScopeTest(StephTest):
+    def test_lexical_scope(self):
+        # Functions see the names where they're defined, not where they're called.
+        p = parse('''
+        {
+            let f = (n : NumberType) => n + y;
+            return {
+                let y = 10;
+                return f(0);
+            };
+        }
+        ''', {'y': NumberType()})
+        self.assertEqual(p.evaluate({'y': NumberValue(1)}), NumberValue(1))
+
+    def test_flat_closures(self):
+        p = parse('''
+        {
+            let a = 1;
+            let b = 2;
+            return {
+                let f : (NumberType)=>NumberType = (n : NumberType) => if (n == 0) b else f(n - 1);
+                return f(3);
+            };
+        }
+        ''')
+        let = p._expression._lets[0]
+        # Only the free names are captured: b and f itself.
+        self.assertEqual(let.expression.captures, [p._lets[1].slot, let.slot])
+        self.assertEqual(p.evaluate({}), NumberValue(2))
+
+    def test_addresses(self):
+        p = parse('''
+        {
+            let x = 1;
+            return {
+                let y = x;
+                let x = 2;
+                return x + y;
+            };
+        }
+        ''')
+        inner = p._expression
+        self.assertEqual(inner._lets[0].expression.slot, p._lets[0].slot)
+        self.assertEqual(inner._expression.lhs.slot, inner._lets[1].slot)
+        self.assertEqual(inner._expression.rhs.slot, inner._lets[0].slot)
+        self.assertEqual(p.evaluate({}), NumberValue(3))
+
+
+class TailCallTest(StephTest):
+    def test_accumulator_loop(self):
+        p = parse('''
+        {
+          let sum : (NumberType, NumberType)=>NumberType =
+            (n == 0, total : NumberType) => total,
+            (n : NumberType, total : NumberType) => sum(n - 1, total + n);
+          return sum(x, 0);
+        }
+        ''', {'x': NumberType()})
+        self.assertEqual(p.evaluate({'x': NumberValue(20000)}), NumberValue(200010000))
+
+    def test_tail_call_through_if_else_and_block(self):
+        p = parse('''
+        {
+          let count : (NumberType, NumberType)=>NumberType = (n : NumberType, total : NumberType) =>
+            if (n == 0)
+              total
+            else {
+              let next = n - 1;
+              return count(next, total + 2);
+            };
+          return count(x, 0);
+        }
+        ''', {'x': NumberType()})
+        self.assertEqual(p.evaluate({'x': NumberValue(10000)}), NumberValue(20000))
+
+
+class DispatchTest(StephTest):
+    def test_literal_cases(self):
+        cases = ',\n'.join('(n == %d) => %d' % (i, i * i) for i in range(-20, 30))
+        p = parse('''
+        {
+          let square : (NumberType)=>NumberType = %s, (n : NumberType) => 0;
+          return square(x);
+        }
+        ''' % cases, {'x': NumberType()})
+        function = p._lets[0].expression
+        self.assertEqual(function.dispatch.guarded, [])
+        self.assertEqual(function.dispatch.lookup([NumberValue(7)]), 27)
+        for x in (-20, -1, 0, 7, 29):
+            self.assertEqual(p.evaluate({'x': NumberValue(x)}), NumberValue(x * x))
+        self.assertEqual(p.evaluate({'x': NumberValue(30)}), NumberValue(0))
+
+    def test_guards_keep_their_order(self):
+        p = parse('''
+        {
+          let f : (NumberType, NumberType)=>NumberType =
+            (a == 1, b == 1) => 11,
+            (a == y, b : NumberType) => 20,
+            (a : NumberType, b == 2) => 2,
+            (a == 3, b : NumberType) => 3,
+            (a : NumberType, b : NumberType) => 0;
+          return f(x, 2);
+        }
+        ''', {'x': NumberType(), 'y': NumberType()})
+        function = p._lets[0].expression
+        self.assertEqual(function.dispatch.guarded, [1])
+        self.assertEqual(p.evaluate({'x': NumberValue(3), 'y': NumberValue(3)}), NumberValue(20))
+        self.assertEqual(p.evaluate({'x': NumberValue(3), 'y': NumberValue(4)}), NumberValue(2))
+        self.assertEqual(p.evaluate({'x': NumberValue(5), 'y': NumberValue(4)}), NumberValue(2))
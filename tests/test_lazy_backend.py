@@ -0,0 +1,84 @@
+from ast.number import *
+from tests import test_blocks, test_end_to_end, test_flow_control, test_functions, test_lists, test_numbers, \
+    test_operators, test_strings
+from tests.base import *
+from tests.base import mode_variants
+
+# The whole suite again, evaluating lets and arguments only when they're needed.
+globals().update(mode_variants('Lazy', {'evaluator': 'lazy'}, test_blocks, test_end_to_end,
+                               test_flow_control, test_functions, test_lists, test_numbers, test_operators,
+                               test_strings))
+
+
+class Counter(ast.BoundFunction):
+    """A function from outside the program that counts its calls."""
+    __slots__ = ('calls',)
+
+    def __init__(self):
+        self.calls = 0
+
+    def call(self, arguments):
+        self.calls += 1
+        return NumberValue(arguments[0].value + 1)
+
+
+class LazyTests(StephTest):
+    scope_types = {'x': NumberType(), 'inc': typesystem.Function([NumberType()], NumberType())}
+
+    def calls(self, source: str, evaluator: str = 'lazy') -> (ast.Expression, int):
+        counter = Counter()
+        result = parse(source, self.scope_types, evaluator=evaluator).evaluate({'x': NumberValue(1), 'inc': counter})
+        return result, counter.calls
+
+    def test_unused_let(self):
+        self.assertEqual(self.calls('{ let a = inc(x); return x; }'), (NumberValue(1), 0))
+        self.assertEqual(self.calls('{ let a = inc(x); return x; }', 'tree'), (NumberValue(1), 1))
+        self.assertEqual(self.eval_lazy('{ let boom = 1 / 0; return 2; }'), NumberValue(2))
+
+    def test_untaken_branch(self):
+        source = '{ let a = inc(x); let b = inc(x + 1); return if (x > 0) a else b; }'
+        self.assertEqual(self.calls(source), (NumberValue(2), 1))
+        self.assertEqual(self.calls(source, 'tree'), (NumberValue(2), 2))
+
+    def test_evaluated_once(self):
+        self.assertEqual(self.calls('{ let a = inc(x); return a + a + a; }'), (NumberValue(6), 1))
+        # Passing it on doesn't evaluate it again either.
+        source = '{ let a = inc(x); let twice = (n : NumberType) => n + n; return twice(a) + twice(a); }'
+        self.assertEqual(self.calls(source), (NumberValue(8), 1))
+
+    def test_unused_argument(self):
+        source = '{ let first = (a : NumberType, b : NumberType) => a; return first(x, inc(x)); }'
+        self.assertEqual(self.calls(source), (NumberValue(1), 0))
+        self.assertEqual(self.eval_lazy('{ let first = (a : NumberType, b : NumberType) => a; return first(1, 1 / 0); }'),
+                         NumberValue(1))
+
+    def test_patterns_force_arguments(self):
+        source = '''
+        {
+          let pick : (NumberType, NumberType)=>NumberType =
+            (n == 2, m : NumberType) => 0,
+            (n : NumberType, m : NumberType) => n;
+          return pick(inc(x), inc(x));
+        }
+        '''
+        self.assertEqual(self.calls(source), (NumberValue(0), 1))
+
+    def test_tail_calls(self):
+        p = parse('''
+        {
+          let count : (NumberType, NumberType)=>NumberType =
+            (n == 0, total : NumberType) => total,
+            (n : NumberType, total : NumberType) => if (n > 0) count(n - 1, total + 1) else total;
+          return count(x, 0);
+        }
+        ''', {'x': NumberType()}, evaluator='lazy')
+        self.assertEqual(p.evaluate({'x': NumberValue(5000)}), NumberValue(5000))
+
+    def test_functions_called_from_outside(self):
+        function = parse('{ let k = 3; return (a : NumberType, b : NumberType) => a * k; }',
+                         evaluator='lazy').evaluate({})
+        self.assertEqual(function.call([NumberValue(5), NumberValue(7)]), NumberValue(15))
+
+    @staticmethod
+    def eval_lazy(source: str) -> ast.Expression:
+        return parse(source, evaluator='lazy').evaluate({})
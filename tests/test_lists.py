@@ -19,6 +19,11 @@ class ListTests(StephTest):
         self.assertIsInstance(p, ast.ListValue)
         self.assertEqual(p.type, ast.lists.ListType(NumberType()))
 
+    def test_long_list(self):
+        p = parse('[%s]' % ', '.join(str(i) for i in range(20000)))
+        self.assertEqual(len(p.items), 20000)
+        self.assertEqual(p.items[12345], NumberValue(12345))
+
     def test_identity_function(self):
         p = parse('''
         (l:ListValue(NumberType)) => l
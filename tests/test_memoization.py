@@ -0,0 +1,112 @@
+import sys
+import threading
+
+from ast.boolean import BooleanValue
+from ast.number import *
+from ast.string import StringValue
+from memoization import FunctionCache
+from tests import test_blocks, test_end_to_end, test_flow_control, test_functions, test_lists, test_numbers, \
+    test_operators, test_strings
+from tests.base import *
+from tests.base import mode_variants
+import batch
+
+# The whole suite again, memoizing every function call.
+globals().update(mode_variants('Memoized', {'memoize': FunctionCache(max_entries=1000)}, test_blocks,
+                               test_end_to_end, test_flow_control, test_functions, test_lists, test_numbers,
+                               test_operators, test_strings))
+
+fib_source = '''
+{
+  let fib : (NumberType)=>NumberType =
+    (n == 0) => 0,
+    (n == 1) => 1,
+    (n : NumberType) => fib(n-1) + fib(n-2);
+  return fib(x);
+}
+'''
+
+
+class MemoizationTests(StephTest):
+    def test_value_hashing(self):
+        self.assertEqual(hash(NumberValue(42)), hash(NumberValue(42)))
+        self.assertEqual(hash(BooleanValue(True)), hash(BooleanValue(True)))
+        self.assertEqual(hash(StringValue('hello')), hash(StringValue('hello')))
+        self.assertEqual(len({NumberValue(1), NumberValue(1), NumberValue(2)}), 2)
+
+    def test_fibonacci(self):
+        cache = FunctionCache()
+        p = parse(fib_source, {'x': NumberType()}, memoize=cache)
+        self.assertEqual(p.evaluate({'x': NumberValue(100)}), NumberValue(354224848179261915075))
+        # Each of fib(0) to fib(100) is computed once.
+        self.assertEqual(cache.misses, 101)
+        self.assertEqual(cache.hits, 98)
+        self.assertEqual(cache.evictions, 0)
+
+        # Results are shared between evaluations.
+        self.assertEqual(p.evaluate({'x': NumberValue(50)}), NumberValue(12586269025))
+        self.assertEqual(cache.misses, 101)
+        self.assertEqual(cache.hits, 99)
+
+    def test_evaluators(self):
+        for evaluator in ('compiled', 'stack'):
+            cache = FunctionCache()
+            p = parse(fib_source, {'x': NumberType()}, evaluator=evaluator, memoize=cache)
+            self.assertEqual(p.evaluate({'x': NumberValue(100)}), NumberValue(354224848179261915075))
+            self.assertEqual(cache.misses, 101)
+
+    def test_max_entries(self):
+        cache = FunctionCache(max_entries=10)
+        p = parse(fib_source, {'x': NumberType()}, memoize=cache)
+        self.assertEqual(p.evaluate({'x': NumberValue(30)}), NumberValue(832040))
+        self.assertEqual(len(cache), 10)
+        self.assertEqual(cache.evictions, cache.misses - 10)
+
+    def test_threads(self):
+        # Small enough to evict all the time, from every thread at once.
+        cache = FunctionCache(max_entries=8)
+        interval = sys.getswitchinterval()
+        # Switch threads often, so they're in the cache together.
+        sys.setswitchinterval(1e-6)
+        try:
+            def run(offset):
+                for i in range(2000):
+                    key = ((i + offset) % 12,)
+                    if cache.get(key) is None:
+                        cache.put(key, NumberValue(key[0]))
+
+            threads = [threading.Thread(target=run, args=(offset,)) for offset in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            p = parse(fib_source, {'x': NumberType()}, memoize=FunctionCache(max_entries=8))
+            scopes = [{'x': NumberValue(i % 15)} for i in range(500)]
+            results = list(batch.evaluate_many(p, scopes, executor='thread', workers=8, chunk_size=16))
+        finally:
+            sys.setswitchinterval(interval)
+        self.assertEqual(cache.hits + cache.misses, 8 * 2000)
+        self.assertEqual(len(cache), 8)
+        self.assertEqual(cache.bytes, sum(size for _, size in cache._entries.values()))
+        self.assertEqual(results, [parse(fib_source, {'x': NumberType()}).evaluate(scope) for scope in scopes])
+
+    def test_max_bytes(self):
+        cache = FunctionCache(max_bytes=2000)
+        p = parse(fib_source, {'x': NumberType()}, memoize=cache)
+        self.assertEqual(p.evaluate({'x': NumberValue(30)}), NumberValue(832040))
+        self.assertLessEqual(cache.bytes, 2000)
+        self.assertGreater(cache.evictions, 0)
+        self.assertEqual(cache.stats()['entries'], len(cache))
+
+    def test_closures(self):
+        # Functions made by different calls capture different values, so they don't share results.
+        cache = FunctionCache()
+        p = parse('''
+        {
+            let adder = (m : NumberType) => (n : NumberType) => m + n;
+            return (adder(1))(10) + (adder(2))(10);
+        }
+        ''', memoize=cache)
+        self.assertEqual(p.evaluate({}), NumberValue(23))
+        self.assertEqual(cache.hits, 0)
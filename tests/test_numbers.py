@@ -1,3 +1,4 @@
+from ast.boolean import TRUE, FALSE
 from ast.number import *
 from tests.base import *
 
@@ -44,3 +45,21 @@ class NumberTests(StephTest):
 
         self.assertEvaluation('1 >= 1', True)
         self.assertEvaluation('1 >= 2', False)
+
+
+class InternedValueTests(StephTest):
+    def test_small_numbers(self):
+        p = parse('x * 2 + 1', {'x': NumberType()})
+        self.assertIs(p.evaluate({'x': NumberValue(20)}), NumberValue.of(41))
+        self.assertIs(parse('-10').evaluate({}), NumberValue.of(-10))
+        # Big numbers are made as needed.
+        self.assertEqual(p.evaluate({'x': NumberValue(10 ** 20)}), NumberValue(2 * 10 ** 20 + 1))
+        self.assertIsNot(NumberValue.of(10 ** 20), NumberValue.of(10 ** 20))
+
+    def test_booleans(self):
+        self.assertIs(parse('1 < 2').evaluate({}), TRUE)
+        self.assertIs(parse('1 > 2').evaluate({}), FALSE)
+
+    def test_constructor_makes_new_values(self):
+        self.assertIsNot(NumberValue(1), NumberValue(1))
+        self.assertEqual(NumberValue(1), NumberValue.of(1))
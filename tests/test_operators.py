@@ -57,3 +57,19 @@ class ComparisonTest(StephTest):
         v = p.evaluate({})
         self.assertFalse(v)
 
+
+class QuickeningTest(StephTest):
+    def test_specialized_nodes(self):
+        p = parse('(1 + x) * 2 < -x', {'x': NumberType()})
+        self.assertEqual(type(p).__name__, 'NumberLessThan')
+        self.assertIsInstance(p, ast.Comparison)
+        self.assertEqual(type(p.lhs).__name__, 'NumberMultiply')
+        self.assertEqual(type(p.lhs.lhs).__name__, 'NumberAdd')
+        self.assertEqual(type(p.rhs).__name__, 'NumberNegate')
+        self.assertEqual(p.evaluate({'x': NumberValue(-3)}), BooleanValue(True))
+        self.assertEqual(p.evaluate({'x': NumberValue(3)}), BooleanValue(False))
+
+    def test_string_concat(self):
+        p = parse('"hello, " + "world"')
+        self.assertEqual(type(p).__name__, 'StringConcat')
+        self.assertEvaluation('"hello, " + "world"', 'hello, world')
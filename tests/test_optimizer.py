@@ -0,0 +1,206 @@
+import contextlib
+import io
+
+import ast.literals
+
+from ast.boolean import BooleanValue
+from ast.number import *
+from optimizer import Optimizer
+from tests.base import *
+from tests.test_pratt import _collect_sources
+
+
+def optimized(source: str, scope: dict = None, inline: int = 0) -> (ast.Expression, Optimizer):
+    optimizer = Optimizer(inline)
+    return parse(source, scope, optimize=optimizer), optimizer
+
+
+class OptimizerTests(StephTest):
+    def test_test_sources(self):
+        # The tests check the shapes of trees, so rather than running them all optimized compare the results.
+        optimizer = Optimizer(inline=20)
+        count = 0
+        for source in _collect_sources():
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    expected = parse(source).evaluate({})
+            except Exception:
+                continue
+            if isinstance(expected, ast.literals.Value):
+                self.assertEqual(parse(source, optimize=optimizer).evaluate({}), expected, source)
+                count += 1
+        self.assertGreater(count, 50)
+        self.assertGreater(optimizer.removed, 100)
+        self.assertGreater(optimizer.inlined, 0)
+
+    def test_fold(self):
+        p, optimizer = optimized('1 + 2 * 3 - -4')
+        self.assertIsInstance(p, NumberValue)
+        self.assertEqual(p, NumberValue(11))
+        self.assertEqual((optimizer.folded, optimizer.removed), (4, 7))
+
+    def test_fold_around_names(self):
+        p, optimizer = optimized('x + (2 * 3) < 10 * (1 + 1)', {'x': NumberType()})
+        self.assertEqual(p.source(''), '(x + 6) < 20')
+        self.assertEqual(p.evaluate({'x': NumberValue(3)}), BooleanValue(True))
+        self.assertEqual(optimizer.folded, 3)
+
+    def test_prune(self):
+        p, optimizer = optimized('if (1 > 2) x else x * (2 + 2)', {'x': NumberType()})
+        self.assertEqual(p.source(''), 'x * 4')
+        self.assertEqual(optimizer.pruned, 1)
+        # Conditions with names stay.
+        p, optimizer = optimized('if (x > 2) 1 else 2', {'x': NumberType()})
+        self.assertIsInstance(p, ast.IfElse)
+        self.assertEqual(optimizer.pruned, 0)
+
+    def test_dead_lets(self):
+        p, optimizer = optimized('''
+        {
+          let unused = x * 100;
+          let also_unused = (n : NumberType) => n;
+          let a = x + 1;
+          return a * 2;
+        }
+        ''', {'x': NumberType()})
+        self.assertIsInstance(p, ast.Block)
+        self.assertEqual([let.name for let in p._lets], ['a'])
+        self.assertEqual(p.evaluate({'x': NumberValue(4)}), NumberValue(10))
+        self.assertEqual(optimizer.dropped, 2)
+        self.assertEqual(optimizer.removed, 9)
+
+        p, optimizer = optimized('{ let a = x; return 3; }', {'x': NumberType()})
+        self.assertEqual(p, NumberValue(3))
+        self.assertSetEqual(p.names, set())
+
+    def test_closed_blocks(self):
+        p, optimizer = optimized('{ let a = 2; let b = 3; return a * b; }')
+        self.assertEqual(p, NumberValue(6))
+
+    def test_hoist_from_function_bodies(self):
+        p, optimizer = optimized('''
+        {
+          let f = (n : NumberType) => n + { let k = 6; return k * 7; };
+          return f(x);
+        }
+        ''', {'x': NumberType()})
+        self.assertEqual(p._lets[0].source(''), 'let f = (n : NumberType) => n + 42;')
+        self.assertEqual(p.evaluate({'x': NumberValue(1)}), NumberValue(43))
+
+    def test_calls_stay(self):
+        source = '''
+        {
+          let loop : (NumberType)=>NumberType = (n : NumberType) => loop(n);
+          return if (x > 0) loop(1) else 2;
+        }
+        '''
+        p, optimizer = optimized(source, {'x': NumberType()})
+        self.assertEqual(optimizer.folded, 0)
+        self.assertEqual(p.evaluate({'x': NumberValue(0)}), NumberValue(2))
+
+    def test_errors_stay(self):
+        p, optimizer = optimized('{ let a = 1 / 0; return a + x; }', {'x': NumberType()})
+        with self.assertRaises(ZeroDivisionError):
+            p.evaluate({'x': NumberValue(1)})
+
+    def test_names_shrink(self):
+        p, optimizer = optimized('if (true) 1 else x', {'x': NumberType()})
+        self.assertEqual(p, NumberValue(1))
+        p, optimizer = optimized('[if (false) y else 1, {let a = x; return 2;}]', {'x': NumberType(), 'y': NumberType()})
+        self.assertSetEqual(p.names, set())
+
+    def test_inline(self):
+        p, optimizer = optimized('''
+        {
+          let square = (n : NumberType) => n * n;
+          return square(x) + square(x + 1) + square(3);
+        }
+        ''', {'x': NumberType()}, inline=10)
+        # The same as inlining it by hand.
+        by_hand = parse('(x * x) + { let n = x + 1; return n * n; } + 9', {'x': NumberType()})
+        self.assertEqual(p.source(''), by_hand.source(''))
+        self.assertEqual(p.evaluate({'x': NumberValue(2)}), NumberValue(4 + 9 + 9))
+        self.assertEqual((optimizer.inlined, optimizer.dropped), (3, 1))
+
+    def test_inline_nested(self):
+        p, optimizer = optimized('''
+        {
+          let square = (n : NumberType) => n * n;
+          return {
+            let cube = (n : NumberType) => n * square(n);
+            return cube(x) + cube(2);
+          };
+        }
+        ''', {'x': NumberType()}, inline=10)
+        self.assertFalse(any(isinstance(node, ast.FunctionCall) for node in p.walk()))
+        self.assertEqual(p.evaluate({'x': NumberValue(3)}), NumberValue(27 + 8))
+
+    def test_inline_budget(self):
+        source = '{ let f = (n : NumberType) => n * n + n * n; return f(x); }'
+        self.assertEqual(optimized(source, {'x': NumberType()}, inline=6)[1].inlined, 0)
+        self.assertEqual(optimized(source, {'x': NumberType()}, inline=7)[1].inlined, 1)
+        self.assertEqual(optimized(source, {'x': NumberType()})[1].inlined, 0)
+
+    def test_inline_only_simple_functions(self):
+        p, optimizer = optimized('''
+        {
+          let loop : (NumberType)=>NumberType = (n : NumberType) => if (n > 0) loop(n - 1) else n;
+          let pieces = (n == 0) => 1, (n : NumberType) => n;
+          return loop(x) + pieces(x);
+        }
+        ''', {'x': NumberType()}, inline=100)
+        self.assertEqual(optimizer.inlined, 0)
+        self.assertEqual(p.evaluate({'x': NumberValue(0)}), NumberValue(1))
+
+    def test_inline_shadowing(self):
+        # k in f is the outer k, not the k where it's called.
+        p, optimizer = optimized('''
+        {
+          let k = x;
+          return {
+            let f = (n : NumberType) => n + k;
+            return { let k = 1; return f(k); };
+          };
+        }
+        ''', {'x': NumberType()}, inline=10)
+        self.assertEqual(optimizer.inlined, 0)
+        self.assertEqual(p.evaluate({'x': NumberValue(10)}), NumberValue(11))
+        # Names in arguments aren't hidden by lets in the body.
+        p, optimizer = optimized('''
+        {
+          let f = (n : NumberType) => { let x = 2; return n * x; };
+          return f(x);
+        }
+        ''', {'x': NumberType()}, inline=10)
+        self.assertEqual(optimizer.inlined, 1)
+        self.assertEqual(p.evaluate({'x': NumberValue(5)}), NumberValue(10))
+        # Nor by the parameters.
+        p, optimizer = optimized('''
+        {
+          let f = (n : NumberType) => n * n;
+          return { let n = x; return f(n - 1); };
+        }
+        ''', {'x': NumberType()}, inline=10)
+        self.assertEqual(optimizer.inlined, 1)
+        self.assertEqual(p.evaluate({'x': NumberValue(5)}), NumberValue(16))
+        # Arguments that go straight into the body aren't hidden by the lets for the others.
+        p, optimizer = optimized('''
+        {
+          let b = x;
+          return {
+            let f = (a : NumberType, b : NumberType) => a * b * b;
+            return f(b + 1, x + 2);
+          };
+        }
+        ''', {'x': NumberType()}, inline=10)
+        self.assertEqual(optimizer.inlined, 1)
+        self.assertEqual(p.evaluate({'x': NumberValue(1)}), NumberValue(2 * 3 * 3))
+
+    def test_inline_arguments_used_once(self):
+        p, optimizer = optimized('''
+        {
+          let add = (a : NumberType, b : NumberType) => a + b;
+          return add(x * 2, x * 3);
+        }
+        ''', {'x': NumberType()}, inline=10)
+        self.assertEqual(p.source(''), '(x * 2) + (x * 3)')
@@ -0,0 +1,139 @@
+import typing
+from unittest import mock
+
+from ast.number import *
+from tests import test_blocks, test_end_to_end, test_flow_control, test_functions, test_lists, test_numbers, \
+    test_operators, test_strings
+from tests.base import *
+from tests.base import mode_variants
+import parallel_backend
+
+# The whole suite again, evaluating expensive lets in worker processes.
+globals().update(mode_variants('Parallel', {'evaluator': 'parallel'}, test_blocks, test_end_to_end,
+                               test_flow_control, test_functions, test_lists, test_numbers, test_operators,
+                               test_strings))
+
+fib_source = '''
+{
+  let fib : (NumberType)=>NumberType =
+    (n == 0) => 0,
+    (n == 1) => 1,
+    (n : NumberType) => fib(n-1) + fib(n-2);
+  return {
+    let a = fib(x);
+    let b = fib(x + 1);
+    let c = x * 2;
+    return a + b + c;
+  };
+}
+'''
+
+
+def parallel_blocks(tree: ast.Expression) -> int:
+    return sum(1 for node in tree.walk() if type(node).__name__.startswith('Parallel'))
+
+
+def parallel(source: str, threshold: int) -> typing.Tuple[ast.Expression, parallel_backend.Evaluator]:
+    tree = parse(source, {'x': NumberType()})
+    evaluator = parallel_backend.Evaluator(tree, threshold)
+    tree.use_evaluator(evaluator)
+    return tree, evaluator
+
+
+class ParallelTests(StephTest):
+    def test_independent_lets(self):
+        p, evaluator = parallel(fib_source, parallel_backend._THRESHOLD)
+        self.assertEqual(parallel_blocks(p), 1)
+        # What fib costs depends on x, so the lets are timed inline first.
+        self.assertEqual(p.evaluate({'x': NumberValue(20)}), NumberValue(6765 + 10946 + 40))
+        self.assertEqual(evaluator.sent, 0)
+        self.assertEqual(p.evaluate({'x': NumberValue(15)}), NumberValue(610 + 987 + 30))
+        self.assertEqual(evaluator.sent, 2)
+        self.assertEqual(p.evaluate({'x': NumberValue(1)}), NumberValue(1 + 1 + 2))
+
+    def test_threshold(self):
+        # Only one let that calls a function isn't worth sending anywhere.
+        p = parse('{ let f = (n : NumberType) => n + 1; return { let a = f(x); let b = x; return a + b; }; }',
+                  {'x': NumberType()}, evaluator='parallel')
+        self.assertEqual(parallel_blocks(p), 0)
+        self.assertEqual(p.evaluate({'x': NumberValue(1)}), NumberValue(3))
+
+    def test_cheap_calls(self):
+        # The cost of a call is the cost of the function's body.
+        source = '{ let f = (n : NumberType) => n + 1; return { let a = f(x); let b = f(x + 1); return a + b; }; }'
+        p, evaluator = parallel(source, parallel_backend._THRESHOLD)
+        self.assertEqual(parallel_blocks(p), 0)
+        self.assertEqual(p.evaluate({'x': NumberValue(1)}), NumberValue(5))
+        self.assertLess(parallel_backend.cost(p), 100)
+        self.assertIsNone(parallel_backend.cost(parse(fib_source, {'x': NumberType()})))
+        p, evaluator = parallel(source, 10)
+        self.assertEqual(parallel_blocks(p), 1)
+        self.assertEqual(p.evaluate({'x': NumberValue(1)}), NumberValue(5))
+        self.assertEqual(evaluator.sent, 2)
+
+    def test_cheap_unknown_calls(self):
+        # Recursive, but only ever called with small numbers.
+        p, evaluator = parallel(fib_source, parallel_backend._THRESHOLD)
+        for x in range(5):
+            p.evaluate({'x': NumberValue(x)})
+        self.assertEqual(evaluator.sent, 0)
+
+    def test_cheap_again(self):
+        p, evaluator = parallel(fib_source, parallel_backend._THRESHOLD)
+        p.evaluate({'x': NumberValue(20)})
+        self.assertEqual(evaluator.sent, 0)
+        # Timed by the workers, so it's evaluated inline again once it's cheap.
+        self.assertEqual(p.evaluate({'x': NumberValue(1)}), NumberValue(4))
+        self.assertEqual(evaluator.sent, 2)
+        for x in range(5):
+            p.evaluate({'x': NumberValue(1)})
+        self.assertEqual(evaluator.sent, 2)
+
+    def test_tree_sent_once(self):
+        p, evaluator = parallel('{ let a = x * 2; let b = x + 1; return a + b; }', 1)
+        let = next(node for node in p.walk() if isinstance(node, ast.Let) and node.name == 'a')
+        codec = evaluator._codec
+        arguments = (codec.indices[id(let.expression)], p._root.size, [0], codec.encode([NumberValue(10)]))
+        # Workers ask for the tree the first time they see it, and keep it.
+        self.assertIsNone(parallel_backend._run_let(evaluator._key, None, *arguments))
+        elapsed, result = parallel_backend._run_let(evaluator._key, evaluator._data, *arguments)
+        self.assertEqual(codec.decode(result), [NumberValue(20)])
+        self.assertEqual(parallel_backend._run_let(evaluator._key, None, *arguments)[1], result)
+
+    @mock.patch.object(parallel_backend, '_SLOW', 0)
+    def test_functions_from_workers(self):
+        p, evaluator = parallel('''
+        {
+          let adder = (m : NumberType) => (n : NumberType) => m + n;
+          return {
+            let add : (NumberType)=>NumberType = adder(x);
+            let twice : (NumberType)=>NumberType = adder(adder(x)(x));
+            return add(1) + twice(1);
+          };
+        }
+        ''', 1)
+        self.assertEqual(parallel_blocks(p), 1)
+        self.assertEqual(p.evaluate({'x': NumberValue(10)}), NumberValue(11 + 21))
+        self.assertEqual(evaluator.sent, 2)
+
+    def test_recursive_lets(self):
+        # The functions the workers make capture the lets they're bound to.
+        p = parse('''
+        {
+          let f = (n : NumberType) => n;
+          return {
+            let down : (NumberType)=>NumberType = (n == 0) => f(0), (n : NumberType) => down(n - 1);
+            let up : (NumberType)=>NumberType = (n == 10) => f(n), (n : NumberType) => up(n + 1);
+            return down(x) + up(x);
+          };
+        }
+        ''', {'x': NumberType()}, evaluator='parallel')
+        self.assertEqual(p.evaluate({'x': NumberValue(5)}), NumberValue(10))
+
+    def test_errors(self):
+        p, evaluator = parallel(
+            '{ let f = (n : NumberType) => 10 / n; return { let a = f(x); let b = f(x - 1); return a + b; }; }', 1)
+        self.assertEqual(parallel_blocks(p), 1)
+        self.assertEqual(p.evaluate({'x': NumberValue(2)}), NumberValue(15))
+        with self.assertRaises(ZeroDivisionError):
+            p.evaluate({'x': NumberValue(1)})
@@ -0,0 +1,116 @@
+import os
+import tempfile
+from unittest import mock
+
+import ast.literals
+
+from ast.number import *
+from parse_cache import ParseCache
+from tests.base import *
+from tests.test_memoization import fib_source
+from tests.test_pratt import _collect_sources
+import parser
+
+
+class ParseCacheTests(StephTest):
+    def setUp(self):
+        super().setUp()
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = self._directory.name
+
+    def tearDown(self):
+        self._directory.cleanup()
+        super().tearDown()
+
+    def test_hit(self):
+        cache = ParseCache(self.directory)
+        scope = {'x': NumberType()}
+        first = parse(fib_source, scope, cache=cache)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (0, 1, 1))
+        second = parse(fib_source, scope, cache=cache)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 1, 1))
+        self.assertIsNot(first, second)
+        self.assertEqual(second.type, NumberType())
+        self.assertEqual(second.evaluate({'x': NumberValue(20)}), NumberValue(6765))
+
+    def test_hit_skips_parser(self):
+        cache = ParseCache(self.directory)
+        parser.Parser().parse('1 + 2', cache=cache)
+        p = parser.Parser()
+        self.assertEqual(p.parse('1 + 2', cache=cache).evaluate({}), NumberValue(3))
+        self.assertIsNone(p._syntax)
+
+    def test_shared_between_caches(self):
+        # Like another process with the same directory.
+        parse(fib_source, {'x': NumberType()}, cache=ParseCache(self.directory))
+        cache = ParseCache(self.directory)
+        p = parse(fib_source, {'x': NumberType()}, cache=cache, evaluator='compiled')
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(p.evaluate({'x': NumberValue(10)}), NumberValue(55))
+
+    def test_key(self):
+        cache = ParseCache(self.directory)
+        parse('x + 1', {'x': NumberType()}, cache=cache)
+        parse('x + 2', {'x': NumberType()}, cache=cache)
+        parse('x + 1', {'x': NumberType(), 'y': NumberType()}, cache=cache)
+        parse('x + 1', {'x': NumberType()}, cache=ParseCache(self.directory, stamp='another interpreter'))
+        self.assertEqual(cache.misses, 3)
+        self.assertEqual(len(cache), 4)
+
+    def test_eviction(self):
+        cache = ParseCache(self.directory, max_entries=2)
+        for i in range(5):
+            parse('%d + 1' % i, cache=cache)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.evictions, 3)
+        parse('4 + 1', cache=cache)
+        self.assertEqual(cache.hits, 1)
+
+        cache = ParseCache(self.directory, max_bytes=cache.bytes())
+        parse('"a much longer program" + "than the others"', cache=cache)
+        self.assertLessEqual(cache.bytes(), cache.max_bytes)
+        self.assertGreater(cache.evictions, 0)
+
+    def test_corrupt_entry(self):
+        cache = ParseCache(self.directory)
+        parse('1 + 2', cache=cache)
+        with open(os.path.join(self.directory, os.listdir(self.directory)[0]), 'wb') as f:
+            f.write(b'not a tree')
+        self.assertEqual(parse('1 + 2', cache=cache).evaluate({}), NumberValue(3))
+        self.assertEqual(cache.misses, 2)
+        self.assertEqual(parse('1 + 2', cache=cache).evaluate({}), NumberValue(3))
+        self.assertEqual(cache.hits, 1)
+
+    def test_read_only(self):
+        cache = ParseCache(self.directory, max_entries=1)
+        parse('1 + 2', cache=cache)
+        os.chmod(self.directory, 0o500)
+        # Root can write to read-only directories, so make sure writing fails like it would for anyone else.
+        denied = mock.Mock(side_effect=PermissionError('read-only'))
+        try:
+            with mock.patch('os.utime', denied), mock.patch('tempfile.mkstemp', denied), \
+                    mock.patch('os.remove', denied):
+                self.assertEqual(parse('1 + 2', cache=cache).evaluate({}), NumberValue(3))
+                self.assertEqual(parse('3 + 4', cache=cache).evaluate({}), NumberValue(7))
+                self.assertEqual(parse('3 + 4', cache=cache).evaluate({}), NumberValue(7))
+        finally:
+            os.chmod(self.directory, 0o700)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 3, 1))
+        # Nor does a directory that can't be made.
+        open(os.path.join(self.directory, 'file'), 'w').close()
+        cache = ParseCache(os.path.join(self.directory, 'file', 'cache'))
+        self.assertEqual(parse('1 + 2', cache=cache).evaluate({}), NumberValue(3))
+        self.assertEqual((cache.misses, len(cache)), (1, 0))
+
+    def test_test_sources(self):
+        cache = ParseCache(self.directory)
+        for source in _collect_sources():
+            try:
+                expected = parse(source).evaluate({})
+            except Exception:
+                continue
+            if not isinstance(expected, ast.literals.Value):
+                continue
+            parse(source, cache=cache)
+            self.assertEqual(parse(source, cache=cache).evaluate({}), expected, source)
+        self.assertGreater(cache.hits, 50)
@@ -0,0 +1,69 @@
+import concurrent.futures
+import os
+
+import ply.yacc as yacc
+
+from ast.number import NumberValue
+from ast.string import StringValue
+from tests.base import *
+import parser
+import parser_tables
+
+
+class ParserTablesTest(StephTest):
+    def test_tables_are_current(self):
+        # If this fails, regenerate the tables with: python parser.py
+        grammar = yacc.ParserReflect(dict(vars(parser), start='expression'))
+        grammar.get_all()
+        self.assertEqual(parser_tables._lr_signature, grammar.signature())
+
+    def test_build_writes_nothing(self):
+        directory = os.path.dirname(os.path.abspath(parser.__file__))
+        before = sorted(os.listdir(directory))
+        parser._build_parser()
+        self.assertEqual(sorted(os.listdir(directory)), before)
+
+    def test_tables_are_shared(self):
+        first = parser.Parser()
+        second = parser.Parser()
+        first.parse('1')
+        second.parse('2')
+        self.assertIs(first._syntax.parser.action, second._syntax.parser.action)
+
+
+class ParserTest(StephTest):
+    def test_parsers_are_independent(self):
+        first = parser.Parser()
+        second = parser.Parser()
+        self.assertEqual(first.parse('1 + 2').evaluate({}), NumberValue(3))
+        self.assertEqual(second.parse('"a" + "b"').evaluate({}), StringValue('ab'))
+        self.assertIsNot(first._syntax.lexer, second._syntax.lexer)
+
+    def test_line_numbers(self):
+        p = parser.Parser()
+        for _ in range(2):
+            p.parse('{\n let a = 1;\n return\n a; }')
+            self.assertEqual(p._syntax.lexer.lineno, 4)
+
+    def test_pool_reuses_parsers(self):
+        pool = parser.ParserPool(max_idle=1)
+        with pool.parser() as first:
+            with pool.parser() as second:
+                self.assertIsNot(first, second)
+        with pool.parser() as third:
+            self.assertIn(third, (first, second))
+        self.assertEqual(len(pool._idle['ply']), 1)
+
+    def test_threads(self):
+        pool = parser.ParserPool()
+        sources = ['{ %s return %s; }' % (' '.join('let v%d = %d;' % (j, j * i) for j in range(20)),
+                                           ' + '.join('v%d' % j for j in range(20)))
+                   for i in range(40)]
+
+        def run(source):
+            return pool.parse(source).evaluate({})
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(run, sources * 5))
+        for i, result in enumerate(results):
+            self.assertEqual(result, parse(sources[i % len(sources)]).evaluate({}))
@@ -0,0 +1,101 @@
+import contextlib
+import glob
+import io
+import os
+import tokenize
+
+from ast.base import ParseException
+from tests import test_blocks, test_end_to_end, test_flow_control, test_functions, test_lists, test_numbers, \
+    test_operators, test_strings
+from tests.base import *
+from tests.base import mode_variants
+import parser
+import pratt
+
+# The whole suite again, parsing with the hand-written parser.
+globals().update(mode_variants('Pratt', {'backend': 'pratt'}, test_blocks, test_end_to_end, test_flow_control,
+                               test_functions, test_lists, test_numbers, test_operators, test_strings))
+
+
+def shape(node: ast.Node):
+    """Everything about a tree that the parser decides."""
+    attributes = []
+    for cls in type(node).__mro__:
+        for name in getattr(cls, '__slots__', ()):
+            if name != '_children' and hasattr(node, name):
+                attributes.append((name, getattr(node, name)))
+    return type(node), attributes, [shape(child) for child in node._children]
+
+
+def read(backend: str, source: str):
+    """The shape of the tree for source, or None if it's rejected."""
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        try:
+            tree = parser.Parser(backend).syntax_tree(source)
+        except (ParseException, AssertionError):
+            return None
+    # PLY reports syntax errors and then tries to carry on.
+    if 'Syntax error' in output.getvalue():
+        return None
+    return shape(tree)
+
+
+def _collect_sources():
+    """Every string in the tests, most of them are Steph source."""
+    sources = set()
+    for path in glob.glob(os.path.join(os.path.dirname(__file__), 'test_*.py')):
+        with open(path, 'rb') as f:
+            for token in tokenize.tokenize(f.readline):
+                if token.type == tokenize.STRING:
+                    sources.add(eval(token.string))
+    return sorted(source for source in sources if isinstance(source, str))
+
+
+class ConformanceTest(StephTest):
+    def assertConforms(self, source: str):
+        self.assertEqual(read('pratt', source), read('ply', source), source)
+
+    def test_test_sources(self):
+        sources = _collect_sources()
+        self.assertGreater(len(sources), 150)
+        accepted = 0
+        for source in sources:
+            self.assertConforms(source)
+            if read('ply', source) is not None:
+                accepted += 1
+        self.assertGreater(accepted, 100)
+
+    def test_precedence(self):
+        for source in ('1 - 2 - 3', '1 + 2 * 3 - 4 / 5', '1 * 2 + 3 * 4', '8 / 4 / 2', 'a < b < c',
+                       'a + b < c * d', 'a < b + c', 'a == b != c', '-a * b', '-a + b', '-f(x)', '- -a',
+                       'a - -b * c', 'f(1)(2)', 'f(a, b + 1)(c)', '(f)(1)', '(a + b) * c', '{ return 1; }(2)',
+                       'a * -b + c', '-a < b'):
+            self.assertConforms(source)
+
+    def test_greedy_constructs(self):
+        for source in ('if (a) 1 else 2 + 3', 'a + if (a) 1 else 2 * 3', 'if (a) f else g(1)',
+                       '(n : NumberType) => n + 1', '(n == 1) => 1, (n : NumberType) => n',
+                       '(a : NumberType) => (b : NumberType) => 1, (c : NumberType) => 2',
+                       'f((a : NumberType) => 1, (b : NumberType) => 2)', '(n == a == b) => 1',
+                       '(n == 1 + 2, m : NumberType) => m', '() => 1', '-(a : NumberType) => a + 1'):
+            self.assertConforms(source)
+
+    def test_types(self):
+        for source in ('(f : (NumberType, NumberType)=>NumberType) => f', '(l : ListValue(NumberType)) => l',
+                       '(f : ()=>(NumberType)=>NumberType) => f', '{ let x : NumberType = 1; return x; }'):
+            self.assertConforms(source)
+
+    def test_syntax_errors(self):
+        for source in ('', '1 +', '(x) => x', '(x == 1)', '[(a : NumberType) => 1, 2]', '{ let a = 1; }',
+                       'if (a) 1', '(a : NumberType, 1) => 1', 'f(1, )', '[1, ]', '{ return 1 }', '1 2'):
+            self.assertIsNone(read('pratt', source), source)
+            self.assertIsNone(read('ply', source), source)
+
+    def test_lexing(self):
+        self.assertEqual(pratt.tokenize('let x=>y <= 10 "a b" !=\n Foo if_1'), [
+            ('LET', 'let'), ('ID', 'x'), ('ARROW', '=>'), ('ID', 'y'), ('LE', '<='), ('NUMBER', 10),
+            ('STRING', '"a b"'), ('NEQ', '!='), ('TYPENAME', 'Foo'), ('ID', 'if_1'), ('$end', None)])
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            self.assertEqual(pratt.tokenize('a ! b  '), [('ID', 'a'), ('ID', 'b'), ('$end', None)])
+        self.assertEqual(output.getvalue(), "Illegal character '!'\n")
+        self.assertConforms('1 + # 2')
@@ -0,0 +1,166 @@
+import contextlib
+import io
+
+from ast.number import *
+from tests.base import *
+from tests.base import value_for_python_value
+from tests.test_pratt import _collect_sources
+import python_backend
+
+
+class PythonBackendTests(StephTest):
+    def emit(self, source: str, scope: dict = None):
+        tree = parse(source, scope)
+        return tree, python_backend.load(python_backend.emit_python(tree))
+
+    def assertSameValue(self, source: str, type_scope: dict = None, scope: dict = None):
+        tree, module = self.emit(source, type_scope)
+        scope = scope or {}
+        result = module.evaluate({name: value.value for name, value in scope.items()})
+        self.assertEqual(value_for_python_value(result), tree.evaluate(scope))
+
+    def test_values(self):
+        self.assertSameValue('  42 ')
+        self.assertSameValue('-10')
+        self.assertSameValue('"hello, world"')
+        self.assertSameValue('"hello, " + "world"')
+
+    def test_operators(self):
+        self.assertSameValue('23 + 19')
+        self.assertSameValue('1 + 2 * 3 + 4')
+        self.assertSameValue('1 * 2 + 3 * 4')
+        for op in ('==', '!=', '<', '>', '<=', '>='):
+            self.assertSameValue('1 %s 1' % op)
+            self.assertSameValue('1 %s 2' % op)
+
+    def test_if_else(self):
+        self.assertSameValue('if (1==1) 23 else 42')
+
+    def test_blocks(self):
+        self.assertSameValue('{ let foo = 32; return foo + 10; }')
+        self.assertSameValue('''{
+            let foo = 32;
+            let bar = (n:NumberType) => n+10;
+            return foo + (bar(12)) + 10;
+        }''')
+        self.assertSameValue('''
+        {
+            let f = () => 1;
+            return 1 + f();
+        }
+        ''')
+
+    def test_nested_blocks(self):
+        self.assertSameValue('''
+        {
+            let x = 1;
+            return {
+                let y = x;
+                let x = 2;
+                return x + y + { let x = 10; return x; };
+            };
+        }
+        ''')
+
+    def test_simple_program(self):
+        source = '''
+        {
+            let a=x+1;
+            let b= (i:NumberType,j:NumberType) => {
+                return i+j;
+            };
+            return 1+2+a+x+b(10, 20);
+        }
+        '''
+        self.assertSameValue(source, {'x': NumberType()}, {'x': NumberValue(42)})
+        self.assertSameValue(source, {'x': NumberType()}, {'x': NumberValue(0)})
+
+    def test_recursive(self):
+        self.assertSameValue('''
+        {
+          let fac : (NumberType)=>NumberType = (n : NumberType) =>
+            if (n == 1)
+              1
+            else
+              n * fac(n-1);
+          return fac(10);
+        }
+        ''')
+
+    def test_pattern_matching(self):
+        self.assertSameValue('''
+        {
+          let fac : (NumberType)=>NumberType =
+            (n == 1) => 1,
+            (n : NumberType) => n * fac(n-1);
+          return fac(10);
+        }
+        ''')
+
+    def test_match_name(self):
+        source = '''
+        {
+            let equals = (value : NumberType) => {
+                return (arg == value) => true, (arg : NumberType) => false;
+            };
+            return {
+                let equals10 = equals(10);
+                return equals10(x);
+            };
+        }
+        '''
+        self.assertSameValue(source, {'x': NumberType()}, {'x': NumberValue(10)})
+        self.assertSameValue(source, {'x': NumberType()}, {'x': NumberValue(20)})
+
+    def test_functions(self):
+        tree, module = self.emit('(x:NumberType) => x*x')
+        self.assertEqual(module.evaluate({})(12), 144)
+
+        func_tree, func_module = self.emit('(n:NumberType) => n+10')
+        tree, module = self.emit('func(10)', {'func': func_tree.type})
+        self.assertEqual(module.evaluate({'func': func_module.evaluate({})}), 20)
+
+    def test_keyword_names(self):
+        self.assertSameValue('{ let lambda = 2; let list = 3; return lambda * list; }')
+
+    def test_no_matching_piece(self):
+        tree, module = self.emit('(n == 1) => 1')
+        with self.assertRaises(Exception):
+            module.evaluate({})(2)
+
+    def test_tail_calls(self):
+        source = '''
+        {
+          let count : (NumberType, NumberType)=>NumberType =
+            (n == 0, total : NumberType) => total,
+            (n : NumberType, total : NumberType) =>
+              if (n > 10) count(n - 1, total + 1) else { let next = n - 1; return count(next, total + 2); };
+          return count(x, 0);
+        }
+        '''
+        self.assertSameValue(source, {'x': NumberType()}, {'x': NumberValue(20000)})
+
+    def test_tail_calls_with_closures(self):
+        self.assertSameValue('''
+        {
+          let apply : (NumberType, NumberType)=>NumberType = (n : NumberType, total : NumberType) =>
+            if (n == 0) total else { let add = (m : NumberType) => m + n; return apply(n - 1, add(total)); };
+          return apply(100, 0);
+        }
+        ''')
+
+    def test_test_sources(self):
+        # Every program in the tests that needs nothing in scope.
+        count = 0
+        for source in _collect_sources():
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    tree = parse(source)
+                    expected = tree.evaluate({})
+            except Exception:
+                continue
+            if isinstance(expected, ast.literals.Value):
+                module = python_backend.load(python_backend.emit_python(tree))
+                self.assertEqual(value_for_python_value(module.evaluate({})), expected, source)
+                count += 1
+        self.assertGreater(count, 50)
@@ -0,0 +1,76 @@
+import contextlib
+import io
+import os
+import struct
+import tempfile
+
+import ast.literals
+
+from ast.number import *
+from tests.base import *
+from tests.test_memoization import fib_source
+from tests.test_pratt import _collect_sources
+import parser
+import serialization
+
+
+class SerializationTests(StephTest):
+    def test_test_sources(self):
+        count = 0
+        for source in _collect_sources():
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    tree = parse(source)
+            except Exception:
+                continue
+            loaded = serialization.loads(serialization.dumps(tree))
+            self.assertEqual(loaded.source(''), tree.source(''), source)
+            self.assertEqual(loaded.type, tree.type, source)
+            # The source it prints means the same thing.
+            self.assertEqual(parse(tree.source('')).source(''), tree.source(''), source)
+            try:
+                expected = tree.evaluate({})
+            except Exception:
+                continue
+            if isinstance(expected, ast.literals.Value):
+                self.assertEqual(loaded.evaluate({}), expected, source)
+                count += 1
+        self.assertGreater(count, 50)
+
+    def test_file(self):
+        tree = parse(fib_source, {'x': NumberType()})
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'fib.tree')
+            serialization.dump(tree, path)
+            loaded = serialization.load(path)
+        self.assertEqual(loaded.evaluate({'x': NumberValue(20)}), NumberValue(6765))
+        self.assertEqual(loaded.source(''), tree.source(''))
+
+    def test_evaluators(self):
+        data = serialization.dumps(parse(fib_source, {'x': NumberType()}))
+        for evaluator in ('compiled', 'stack'):
+            loaded = serialization.loads(data)
+            loaded.use_evaluator(parser.evaluators[evaluator](loaded))
+            self.assertEqual(loaded.evaluate({'x': NumberValue(15)}), NumberValue(610), evaluator)
+
+    def test_sharing(self):
+        one = NumberValue(1)
+        tree = ast.ListValue([ast.ArithmeticOperator(one, '+', one), one])
+        tree.initialize_type({})
+        loaded = serialization.loads(serialization.dumps(tree))
+        addition, element = loaded._children
+        self.assertIs(addition.lhs, addition.rhs)
+        self.assertIs(addition.lhs, element)
+        self.assertIs(loaded.type.item, addition.type)
+
+    def test_not_a_tree(self):
+        data = serialization.dumps(parse('1 + 2'))
+        with self.assertRaises(Exception):
+            serialization.loads(b'PK' + data[2:])
+        with self.assertRaises(Exception):
+            serialization.loads(data[:2] + struct.pack('<H', 99) + data[4:])
+
+    def test_unknown_class(self):
+        data = serialization.dumps(parse('1 + 2'))
+        with self.assertRaisesRegex(Exception, 'Unknown class'):
+            serialization.loads(data.replace(b'ast.number:NumberValue', b'subprocess:Popen\0\0\0\0\0\0'))
@@ -0,0 +1,107 @@
+from ast.number import *
+from tests import test_blocks, test_end_to_end, test_flow_control, test_functions, test_lists, test_numbers, \
+    test_operators, test_strings
+from tests.base import *
+from tests.base import mode_variants
+from tests.test_lazy_backend import Counter
+import serialization
+import sharing
+
+# The whole suite again, with repeated subtrees shared.
+globals().update(mode_variants('Shared', {'share': True}, test_blocks, test_end_to_end,
+                               test_flow_control, test_functions, test_lists, test_numbers, test_operators,
+                               test_strings))
+
+repeated_source = '''
+{
+  let f = (n : NumberType) => n * (n - 1) + (n - 1);
+  let g = (n : NumberType) => (n - 1) * 2;
+  return f(x) + g(x - 1) + (x - 1);
+}
+'''
+
+
+def count_nodes(tree: ast.Node) -> int:
+    return sum(1 for _ in tree.walk())
+
+
+class ShareTests(StephTest):
+    def test_share(self):
+        unshared = parse(repeated_source, {'x': NumberType()})
+        shared = parse(repeated_source, {'x': NumberType()})
+        saved = sharing.share(shared)
+        self.assertEqual(count_nodes(unshared) - count_nodes(shared), saved)
+        self.assertGreater(saved, 0)
+        for x in range(5):
+            self.assertEqual(shared.evaluate({'x': NumberValue(x)}), unshared.evaluate({'x': NumberValue(x)}))
+        f_body = shared._lets[0].expression.pieces[0].expression
+        # The two n - 1s in f are one node.
+        self.assertIs(f_body.lhs.rhs, f_body.rhs)
+
+    def test_shadowing(self):
+        # The same source, different bindings.
+        p = parse('''
+        {
+          let f = (n : NumberType) => n - 1;
+          return f({ let n = 10; return n - 1; }) + (x - 1);
+        }
+        ''', {'x': NumberType()}, share=True)
+        self.assertEqual(p.evaluate({'x': NumberValue(100)}), NumberValue(8 + 99))
+
+    def test_serialize(self):
+        p = parse(repeated_source, {'x': NumberType()}, share=True)
+        data = serialization.dumps(p)
+        self.assertLess(len(data), len(serialization.dumps(parse(repeated_source, {'x': NumberType()}))))
+        loaded = serialization.loads(data)
+        self.assertEqual(loaded.evaluate({'x': NumberValue(7)}), p.evaluate({'x': NumberValue(7)}))
+
+
+class CommonSubexpressionTests(StephTest):
+    scope_types = {'x': NumberType(), 'inc': typesystem.Function([NumberType()], NumberType())}
+    source = '''
+    {
+      let twice = (n : NumberType) => inc(n) + inc(n);
+      return if (x > 0) inc(x) * inc(x) + twice(x) else inc(x);
+    }
+    '''
+
+    def calls(self, evaluator: str, share: bool = True) -> (ast.Expression, int):
+        counter = Counter()
+        p = parse(self.source, self.scope_types, evaluator=evaluator, share=share)
+        return p.evaluate({'x': NumberValue(3), 'inc': counter}), counter.calls
+
+    def test_evaluated_once(self):
+        self.assertEqual(self.calls('tree', share=False), (NumberValue(16 + 8), 4))
+        for evaluator in ('tree', 'compiled', 'stack', 'lazy'):
+            self.assertEqual(self.calls(evaluator), (NumberValue(16 + 8), 2), evaluator)
+
+    def test_count(self):
+        p = parse(self.source, self.scope_types)
+        # inc(n) once in twice, and inc(x) twice at the top, which isn't a function body so has no tail calls.
+        self.assertEqual(sharing.common_subexpressions(p), 3)
+        p.resolve_root()
+        self.assertEqual(sum(1 for node in p.walk() if isinstance(node, ast.Common)), 2)
+
+    def test_tail_calls(self):
+        p = parse('''
+        {
+          let loop : (NumberType)=>NumberType =
+            (n == 0) => 0,
+            (n : NumberType) => if (n > 5) loop(n - 1) else loop(n - 1);
+          return loop(x);
+        }
+        ''', {'x': NumberType()}, share=True)
+        self.assertFalse(any(isinstance(node, ast.Common) for node in p.walk()))
+        self.assertEqual(p.evaluate({'x': NumberValue(5000)}), NumberValue(0))
+
+    def test_recursion(self):
+        p = parse('''
+        {
+          let slow : (NumberType)=>NumberType =
+            (n == 0) => 1,
+            (n : NumberType) => slow(n - 1) + slow(n - 1);
+          return slow(x);
+        }
+        ''', {'x': NumberType()}, share=True)
+        # 2 ** 60 calls without sharing.
+        self.assertEqual(p.evaluate({'x': NumberValue(60)}), NumberValue(2 ** 60))
@@ -0,0 +1,107 @@
+import contextlib
+import io
+
+from ast.number import *
+from optimizer import Optimizer
+from parser import specialize
+from tests.base import *
+from tests.test_lazy_backend import Counter
+from tests.test_pratt import _collect_sources
+
+source = '''
+{
+  let power : (NumberType, NumberType)=>NumberType =
+    (b : NumberType, e == 0) => 1,
+    (b : NumberType, e : NumberType) => b * power(b, e - 1);
+  let fib : (NumberType)=>NumberType =
+    (n == 0) => 0,
+    (n == 1) => 1,
+    (n : NumberType) => fib(n - 1) + fib(n - 2);
+  return power(x, exponent) + fib(size) + (if (debug > 0) x * 1000 else 0);
+}
+'''
+scope_types = {'x': NumberType(), 'exponent': NumberType(), 'size': NumberType(), 'debug': NumberType()}
+
+
+def numbers(**values: int) -> dict:
+    return {name: NumberValue(value) for name, value in values.items()}
+
+
+class SpecializeTests(StephTest):
+    def test_specialize(self):
+        tree = parse(source, scope_types)
+        optimizer = Optimizer(inline=100, unfold=100, calls=True)
+        residual = specialize(tree, numbers(exponent=3, size=10, debug=0), optimize=optimizer)
+        self.assertSetEqual(residual.names, {'x'})
+        # power is unfolded for the known exponent, fib(10) is evaluated and the if is gone.
+        self.assertEqual(residual.source(''), '((x * (x * (x * 1))) + 55) + 0')
+        self.assertEqual(optimizer.pruned, 1)
+        for x in range(-3, 4):
+            self.assertEqual(residual.evaluate(numbers(x=x)), NumberValue(x ** 3 + 55))
+            # The tree that was specialized still works.
+            self.assertEqual(tree.evaluate(numbers(x=x, exponent=2, size=3, debug=1)), NumberValue(x ** 2 + 2 + x * 1000))
+
+    def test_unknown_arguments(self):
+        tree = parse(source, scope_types)
+        residual = specialize(tree, numbers(x=2, size=6, debug=1))
+        self.assertSetEqual(residual.names, {'exponent'})
+        # Which piece of power to call depends on the exponent.
+        self.assertTrue(any(isinstance(node, ast.FunctionCall) for node in residual.walk()))
+        for exponent in range(5):
+            self.assertEqual(residual.evaluate(numbers(exponent=exponent)), NumberValue(2 ** exponent + 8 + 2000))
+
+    def test_evaluators(self):
+        tree = parse(source, scope_types)
+        known = numbers(exponent=4, size=7, debug=1)
+        for evaluator in ('tree', 'compiled', 'stack', 'lazy'):
+            residual = specialize(tree, known, evaluator=evaluator)
+            self.assertEqual(residual.evaluate(numbers(x=3)), NumberValue(81 + 13 + 3000), evaluator)
+
+    def test_everything_known(self):
+        residual = specialize(parse(source, scope_types), numbers(x=2, exponent=10, size=12, debug=0))
+        self.assertEqual(residual, NumberValue(1024 + 144))
+
+    def test_shadowing(self):
+        tree = parse('''
+        {
+          let f = (x : NumberType) => x * 2;
+          return f(3) + { let x = 1; return x; } + x;
+        }
+        ''', {'x': NumberType()})
+        self.assertEqual(specialize(tree, numbers(x=10)), NumberValue(6 + 1 + 10))
+
+    def test_functions_stay_names(self):
+        tree = parse('inc(x) + inc(y)', {'x': NumberType(), 'y': NumberType(),
+                                         'inc': typesystem.Function([NumberType()], NumberType())})
+        counter = Counter()
+        residual = specialize(tree, {'x': NumberValue(1), 'inc': counter})
+        self.assertSetEqual(residual.names, {'inc', 'y'})
+        self.assertEqual(residual.evaluate({'y': NumberValue(5), 'inc': counter}), NumberValue(2 + 6))
+        self.assertEqual(counter.calls, 2)
+
+    def test_unfold_limit(self):
+        tree = parse('''
+        {
+          let up : (NumberType, NumberType)=>NumberType = (n : NumberType, step : NumberType) => up(n + step, step);
+          return if (x > 0) up(x, 1) else x;
+        }
+        ''', {'x': NumberType()})
+        optimizer = Optimizer(inline=100, unfold=5, calls=True)
+        residual = specialize(tree, {}, optimize=optimizer)
+        self.assertEqual(optimizer.inlined, 5)
+        self.assertEqual(residual.evaluate(numbers(x=-1)), NumberValue(-1))
+
+    def test_test_sources(self):
+        # With nothing known, specializing evaluates everything it can.
+        count = 0
+        for test_source in _collect_sources():
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    tree = parse(test_source)
+                    expected = tree.evaluate({})
+            except Exception:
+                continue
+            if isinstance(expected, ast.literals.Value):
+                self.assertEqual(specialize(tree, {}).evaluate({}), expected, test_source)
+                count += 1
+        self.assertGreater(count, 50)
@@ -0,0 +1,49 @@
+from ast.number import *
+from tests import test_blocks, test_end_to_end, test_flow_control, test_functions, test_lists, test_numbers, \
+    test_operators, test_strings
+from tests.base import *
+from tests.base import mode_variants
+import stack_backend
+
+# The whole suite again, evaluating with an explicit stack.
+globals().update(mode_variants('Stack', {'evaluator': 'stack'}, test_blocks, test_end_to_end,
+                               test_flow_control, test_functions, test_lists, test_numbers, test_operators,
+                               test_strings))
+
+
+class StackTests(StephTest):
+    def test_deep_recursion(self):
+        p = parse('''
+        {
+          let sum : (NumberType)=>NumberType =
+            (n == 0) => 0,
+            (n : NumberType) => n + sum(n - 1);
+          return sum(x);
+        }
+        ''', {'x': NumberType()}, evaluator='stack')
+        self.assertEqual(p.evaluate({'x': NumberValue(20000)}), NumberValue(200010000))
+        with self.assertRaises(RecursionError):
+            parse('''
+            {
+              let sum : (NumberType)=>NumberType =
+                (n == 0) => 0,
+                (n : NumberType) => n + sum(n - 1);
+              return sum(x);
+            }
+            ''', {'x': NumberType()}).evaluate({'x': NumberValue(20000)})
+
+    def test_functions_work_with_the_interpreter(self):
+        square = parse('(x:NumberType) => x*x', evaluator='stack').evaluate({})
+        self.assertIsInstance(square, ast.BoundFunction)
+        self.assertEqual(square.call([NumberValue(12)]), NumberValue(144))
+        p = parse('f(3) + 1', {'f': parse('(x:NumberType) => x*x').type}, evaluator='stack')
+        self.assertEqual(p.evaluate({'f': square}), NumberValue(10))
+
+    def test_compiled_functions(self):
+        square = parse('(x:NumberType) => x*x', evaluator='compiled').evaluate({})
+        p = parse('f(3) + 1', {'f': parse('(x:NumberType) => x*x').type})
+        self.assertEqual(stack_backend.evaluate(p, {'f': square}), NumberValue(10))
+
+    def test_no_matching_piece(self):
+        with self.assertRaises(Exception):
+            parse('{ let f = (n == 1) => 1; return f(2); }', evaluator='stack').evaluate({})
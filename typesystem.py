@@ -58,6 +58,18 @@ class Type:
     def unary_operator(self, operator: Operator, a):
         raise TypeException('unary_operator() not implemented in %s' % self.__class__.__name__)
 
+    def binary_operator_function(self, operator: Operator) -> typing.Callable:
+        """Return a function of (a, b) that applies operator, looked up once rather than per evaluation."""
+        return lambda a, b: self.binary_operator(operator, a, b)
+
+    def unary_operator_function(self, operator: Operator) -> typing.Callable:
+        """Return a function of (a) that applies operator, looked up once rather than per evaluation."""
+        return lambda a: self.unary_operator(operator, a)
+
+    def specialized_node(self, node_class: type, operator: Operator) -> typing.Optional[type]:
+        """Return a subclass of node_class that applies operator to values of this type directly, if there is one."""
+        return None
+
 
 class Unknown(Type):
     def __eq__(self, other):